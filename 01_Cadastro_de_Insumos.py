@@ -5,6 +5,13 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 import os, json, random
+from utils import storage, propagacao
+from utils.cache import tabelas as cache_tabelas
+from utils.busca import insumos as indice_busca
+from utils import nfe, planilha
+from utils.calculos import colunas_derivadas
+from utils.unidades import conversor as conversor_unidades
+from utils.precos import COLUNA_METODO, METODOS_CUSTO
 
 # =========================================================
 # FUNÇÃO PRINCIPAL DE EXECUÇÃO DA PÁGINA
@@ -52,74 +59,33 @@ def run_page():
         except Exception:
             pass
 
-    DATA_DIR = "data"
-    os.makedirs(DATA_DIR, exist_ok=True)
+    # Tabelas do banco (utils/storage.py) - substituem os antigos CSVs em data/
+    COMPRAS = "compras_insumos"
+    GRUPOS  = "grupos_insumos"
+    UNIDS   = "unidades_medida"
+    INSUMOS_ATIVOS = "insumos_ativos"
 
-    COMPRAS_CSV = os.path.join(DATA_DIR, "compras_insumos.csv")
-    GRUPOS_CSV  = os.path.join(DATA_DIR, "grupos_insumos.csv")
-    UNIDS_CSV   = os.path.join(DATA_DIR, "unidades_medida.csv")
-    INSUMOS_ATIVOS_CSV = os.path.join(DATA_DIR, "insumos_ativos.csv")
-
-    COMPRAS_DTYPE = {
-        "quantidade_compra": float, "qtde_para_custos": float,
-        "valor_total_compra": float, "valor_frete": float, "percentual_perda": float,
-        "valor_unit_bruto": float, "custo_total_com_frete": float, "quantidade_liquida": float,
-        "custo_real_unitario": float, "valor_unit_para_custos": float,
-    }
-    
-    compras_cols = list(COMPRAS_DTYPE.keys()) + ["data_compra","grupo","insumo_resumo","insumo_completo","marca","tipo","un_med","fornecedor","fone_fornecedor","representante","documento","observacao","atualizado_em"]
-    
-    if (not os.path.exists(COMPRAS_CSV)) or os.stat(COMPRAS_CSV).st_size == 0:
-        pd.DataFrame(columns=compras_cols).to_csv(COMPRAS_CSV, index=False)
-
-    grupos_padrao = ["Embalagem","Peixe","Carne","Hortifruti","Bebida","Frios","Molhos e Temperos","Grãos e Cereais","Higiene","Limpeza","Outros"]
-    if (not os.path.exists(GRUPOS_CSV)) or os.stat(GRUPOS_CSV).st_size == 0:
-        pd.DataFrame({"grupo": grupos_padrao}).to_csv(GRUPOS_CSV, index=False)
-
-    unidades_padrao = [("KG","Quilograma", 1.0), ("G","Grama", 1000.0), ("L","Litro", 1.0), ("ML","Mililitro", 1000.0), ("UN","Unidade", 1.0), ("DZ","Dúzia", 12.0), ("MIL","Milheiro", 1000.0), ("CT","Cento", 100.0), ("CX","Caixa", 1.0), ("FD","Fardo", 1.0), ("PAC","Pacote", 1.0), ("BAN","Bandeja", 1.0), ("PAR","Par", 2.0), ("POR","Porção", 1.0),]
-    if (not os.path.exists(UNIDS_CSV)) or os.stat(UNIDS_CSV).st_size == 0:
-        pd.DataFrame(unidades_padrao, columns=["codigo","descricao","qtde_padrao"]).to_csv(UNIDS_CSV, index=False)
-    
-    insumos_ativos_cols = ["insumo_resumo", "grupo", "un_med", "custo_unit_ativo", "data_ultima_compra"]
-    if (not os.path.exists(INSUMOS_ATIVOS_CSV)) or os.stat(INSUMOS_ATIVOS_CSV).st_size == 0:
-        pd.DataFrame(columns=insumos_ativos_cols).to_csv(INSUMOS_ATIVOS_CSV, index=False)
+    grupos_padrao = storage.GRUPOS_PADRAO
+    unidades_padrao = storage.UNIDADES_PADRAO
 
     # =========================================================
     # Helpers (Mantidos)
     # =========================================================
-    @st.cache_data
-    def carregar_tabela(path: str, force_dtype=None) -> pd.DataFrame:
+    # Cache por tabela: uma escrita invalida apenas a tabela que ela tocou
+    def carregar_tabela(tabela: str) -> pd.DataFrame:
         try:
-            if path == COMPRAS_CSV:
-                return pd.read_csv(path, dtype=COMPRAS_DTYPE)
-            elif force_dtype:
-                 return pd.read_csv(path, dtype=force_dtype)
-            else:
-                 return pd.read_csv(path)
+            return cache_tabelas.ler(tabela)
         except Exception: 
             return pd.DataFrame()
 
-    def salvar_tabela(df: pd.DataFrame, path: str):
-        if path == COMPRAS_CSV:
-            missing_cols = set(compras_cols) - set(df.columns)
-            for col in missing_cols:
-                if col in COMPRAS_DTYPE:
-                    df[col] = 0.0
-                else:
-                    df[col] = ''
-            df = df[compras_cols] 
-            
-        df.to_csv(path, index=False)
-        st.cache_data.clear()
-
     def lista_grupos() -> list[str]:
-        gdf = carregar_tabela(GRUPOS_CSV)
+        gdf = carregar_tabela(GRUPOS)
         if "grupo" in gdf.columns:
             return sorted(gdf["grupo"].dropna().astype(str).unique().tolist())
         return grupos_padrao
 
     def lista_unidades() -> pd.DataFrame:
-        udf = carregar_tabela(UNIDS_CSV)
+        udf = carregar_tabela(UNIDS)
         cols = {"codigo","descricao","qtde_padrao"}
         if set(udf.columns) >= cols:
             return udf
@@ -128,29 +94,13 @@ def run_page():
     def label_unidade(row):
         return f"{row['codigo']} – {row['descricao']}"
         
-    def salvar_insumo_ativo(df_compras: pd.DataFrame):
-        if df_compras.empty:
-            salvar_tabela(pd.DataFrame(columns=insumos_ativos_cols), INSUMOS_ATIVOS_CSV)
-            return
-
-        df_compras["data_compra_obj"] = pd.to_datetime(df_compras["data_compra"], format="%d/%m/%Y", errors='coerce')
-        idx = df_compras.dropna(subset=["data_compra_obj"]).groupby(["insumo_resumo"])["data_compra_obj"].idxmax()
-        
-        if idx.empty:
-             salvar_tabela(pd.DataFrame(columns=insumos_ativos_cols), INSUMOS_ATIVOS_CSV)
-             return
-
-        df_ativo = df_compras.loc[idx].copy()
-        
-        df_ativo = df_ativo[[
-            "insumo_resumo", "grupo", "un_med", "valor_unit_para_custos", "data_compra"
-        ]]
-        
-        df_ativo.columns = ["insumo_resumo", "grupo", "un_med", "custo_unit_ativo", "data_ultima_compra"]
-        
-        df_ativo['custo_unit_ativo'] = pd.to_numeric(df_ativo['custo_unit_ativo'], errors='coerce').fillna(0.0)
-        
-        salvar_tabela(df_ativo, INSUMOS_ATIVOS_CSV)
+    def salvar_insumo_ativo(compra: dict):
+        # Grava a compra e faz o upsert incremental apenas da linha deste insumo
+        ativo_mudou = storage.registrar_compra(compra)
+        indice_busca.adicionar(compra)
+        if ativo_mudou:
+            # Custo ativo mudou: recalcula só as fichas que usam este insumo
+            propagacao.propagar_insumos([compra["insumo_resumo"]])
 
     # =========================================================
     # Estado da UI & Funções de Edição/Reset
@@ -204,7 +154,7 @@ def run_page():
             st.session_state[k] = v
 
     def load_insumo_data(insumo_resumo):
-        df_compras = carregar_tabela(COMPRAS_CSV)
+        df_compras = carregar_tabela(COMPRAS)
         # FIX V8.9: A variável unidades_df é carregada localmente para resolver o erro de escopo
         unidades_df_local = lista_unidades() 
         
@@ -241,17 +191,9 @@ def run_page():
 
         st.rerun()
         
-    # Função que faz o cálculo automático de qtde_para_custos
+    # Função que faz o cálculo automático de qtde_para_custos (conversor pré-calculado da tabela de unidades)
     def calculate_qtde_custos_auto(un_med_code, qtde_compra):
-        unidades_df_calc = lista_unidades() 
-        fator_por_codigo_calc = dict(zip(unidades_df_calc["codigo"], unidades_df_calc["qtde_padrao"]))
-        fator = fator_por_codigo_calc.get(un_med_code, 1.0)
-        fator = 1.0 if (pd.isna(fator) or fator is None or fator<=0) else float(fator)
-        
-        if un_med_code in ["G", "ML", "DZ", "MIL", "CT", "PAR"]:
-            return qtde_compra * fator
-        else:
-            return qtde_compra
+        return conversor_unidades().qtde_para_custos(un_med_code, qtde_compra)
 
     # =========================================================
     # INICIALIZAÇÃO E CÁLCULO (Executado em todo rerun)
@@ -300,13 +242,13 @@ def run_page():
     percentual_perda = st.session_state.percentual_perda_key
     un_med_final = st.session_state.un_med_select_key
     
-    # Cálculos automáticos para Pré-visualização
-    valor_unit_bruto = (valor_total_compra / qtde_compra_final) if qtde_compra_final > 0 else 0.0
-    custo_total_com_frete = valor_total_compra + valor_frete
-    quantidade_liquida = qtde_compra_final * (1 - percentual_perda/100.0) if qtde_compra_final > 0 else 0.0
-    custo_real_unitario = (custo_total_com_frete / quantidade_liquida) if quantidade_liquida > 0 else 0.0
-    qtde_para_custos_ajustada_por_perda = qtde_custos_final * (1 - percentual_perda/100.0)
-    valor_unit_para_custos = (custo_total_com_frete / qtde_para_custos_ajustada_por_perda) if qtde_para_custos_ajustada_por_perda > 0 else 0.0
+    # Cálculos automáticos para Pré-visualização (os mesmos valores são gravados)
+    derivadas = colunas_derivadas(qtde_compra_final, qtde_custos_final, valor_total_compra, valor_frete, percentual_perda)
+    valor_unit_bruto = derivadas["valor_unit_bruto"]
+    custo_total_com_frete = derivadas["custo_total_com_frete"]
+    quantidade_liquida = derivadas["quantidade_liquida"]
+    custo_real_unitario = derivadas["custo_real_unitario"]
+    valor_unit_para_custos = derivadas["valor_unit_para_custos"]
     
     # =========================================================
     # Cabeçalho da Página
@@ -315,7 +257,8 @@ def run_page():
     
     # --- RADIO BUTTON (Estrutura de 2 Abas) ---
     
-    index_acao = 0 if st.session_state.current_page_action in ["Cadastro", "Edição"] else 1
+    acoes_radio = ["➕ Cadastrar novo insumo", "📋 Visualizar insumos (e Editar)", "📥 Importar NF-e (XML)", "📄 Importar planilha"]
+    index_acao = {"Cadastro": 0, "Edição": 0, "ImportarNFe": 2, "ImportarPlanilha": 3}.get(st.session_state.current_page_action, 1)
     
     def set_page_action_and_reset(new_action):
         st.session_state.current_edit_insumo = None 
@@ -324,7 +267,7 @@ def run_page():
              reset_session_state()
              st.session_state.current_page_action = "Cadastro"
         else:
-            st.session_state.current_page_action = "Visualizar"
+            st.session_state.current_page_action = new_action
         # Não usamos st.rerun() dentro do callback, o Streamlit lida com o re-run
 
     def handle_radio_change():
@@ -332,8 +275,12 @@ def run_page():
             set_page_action_and_reset("Cadastro")
         elif st.session_state.acao_radio_key == "📋 Visualizar insumos (e Editar)":
             set_page_action_and_reset("Visualizar")
+        elif st.session_state.acao_radio_key == "📥 Importar NF-e (XML)":
+            set_page_action_and_reset("ImportarNFe")
+        elif st.session_state.acao_radio_key == "📄 Importar planilha":
+            set_page_action_and_reset("ImportarPlanilha")
 
-    acao = st.radio("Ação:", ["➕ Cadastrar novo insumo", "📋 Visualizar insumos (e Editar)"], 
+    acao = st.radio("Ação:", acoes_radio, 
                     index=index_acao,
                     key="acao_radio_key", 
                     on_change=handle_radio_change)
@@ -380,10 +327,11 @@ def run_page():
         st.markdown("---")
         
         # --- PRÉ-VISUALIZAÇÃO (Recalcula com os inputs de Edição) ---
-        edit_valor_unit_bruto = (st.session_state.edit_valor_total_compra / st.session_state.edit_quantidade_compra) if st.session_state.edit_quantidade_compra > 0 else 0.0
-        edit_custo_total_com_frete = st.session_state.edit_valor_total_compra + st.session_state.edit_valor_frete
-        edit_qtde_para_custos_ajustada_perda = st.session_state.edit_qtde_para_custos * (1 - st.session_state.edit_percentual_perda/100.0)
-        edit_valor_unit_para_custos = (edit_custo_total_com_frete / edit_qtde_para_custos_ajustada_perda) if edit_qtde_para_custos_ajustada_perda > 0 else 0.0
+        edit_derivadas = colunas_derivadas(st.session_state.edit_quantidade_compra, st.session_state.edit_qtde_para_custos,
+                                           st.session_state.edit_valor_total_compra, st.session_state.edit_valor_frete,
+                                           st.session_state.edit_percentual_perda)
+        edit_custo_total_com_frete = edit_derivadas["custo_total_com_frete"]
+        edit_valor_unit_para_custos = edit_derivadas["valor_unit_para_custos"]
         
         st.markdown("### 💰 Pré-visualização dos cálculos")
         left, right = st.columns(2)
@@ -507,12 +455,11 @@ def run_page():
                 add_un = st.button("Adicionar unidade", key="add_un_btn_cad") 
                 if add_un:
                     if nova_abrev.strip() and nova_desc.strip():
-                        udf = carregar_tabela(UNIDS_CSV)
+                        udf = carregar_tabela(UNIDS)
                         if set(udf.columns) != {"codigo","descricao","qtde_padrao"}:
                             udf = pd.DataFrame(columns=["codigo","descricao","qtde_padrao"])
                         if nova_abrev.strip().upper() not in udf["codigo"].values:
-                            udf.loc[len(udf)] = [nova_abrev.strip().upper(), nova_desc.strip(), (nova_qtd_padrao or 1.0)]
-                            salvar_tabela(udf, UNIDS_CSV)
+                            storage.inserir_linha(UNIDS, {"codigo": nova_abrev.strip().upper(), "descricao": nova_desc.strip(), "qtde_padrao": (nova_qtd_padrao or 1.0)})
                             st.success(f"Unidade “{nova_abrev.upper()} – {nova_desc}” adicionada. Ele já aparece na lista.")
                             st.rerun() 
                     else:
@@ -573,25 +520,19 @@ def run_page():
                  st.session_state.current_page_action = "Cadastro"
                  st.stop() # Finaliza a execução para evitar comandos desnecessários.
             else:
-                # 1. Salva a compra histórica
-                df_compras = carregar_tabela(COMPRAS_CSV)
+                # 1. Monta a compra histórica
                 novo = {
                     "data_compra": data_compra.strftime("%d/%m/%Y"), "grupo": grupo, "insumo_resumo": st.session_state["nome_resumo"],
                     "insumo_completo": st.session_state["nome_completo"] or st.session_state["nome_resumo"], "marca": marca, "tipo": tipo,
                     "un_med": un_med_final, "quantidade_compra": qtde_compra_final, "qtde_para_custos": qtde_custos_final,
                     "valor_total_compra": valor_total_compra_input, "valor_frete": valor_frete_input, "percentual_perda": percentual_perda_input,
-                    "valor_unit_bruto": round(valor_unit_bruto,4), "custo_total_com_frete": round(custo_total_com_frete,2),
-                    "quantidade_liquida": round(quantidade_liquida,4), "custo_real_unitario": round(custo_real_unitario,6),
-                    "valor_unit_para_custos": round(valor_unit_para_custos,6), "fornecedor": fornecedor, "fone_fornecedor": fone_fornecedor,
+                    **derivadas, "fornecedor": fornecedor, "fone_fornecedor": fone_fornecedor,
                     "representante": representante, "documento": documento, "observacao": observacao,
                     "atualizado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
                 
-                df_compras = pd.concat([df_compras, pd.DataFrame([novo])], ignore_index=True)
-                salvar_tabela(df_compras, COMPRAS_CSV)
-
-                # 2. Salva ou atualiza a Tabela Mestra Ativa
-                salvar_insumo_ativo(df_compras)
+                # 2. Salva a compra e atualiza a Tabela Mestra Ativa (um INSERT + um upsert)
+                salvar_insumo_ativo(novo)
 
                 st.success(f"Insumo **{novo['insumo_resumo']}** salvo com sucesso! Indo para Relatório.")
                 
@@ -605,56 +546,59 @@ def run_page():
     elif st.session_state.current_page_action in ["Visualizar", "Edição"]:
         st.markdown("### 📋 Relatório de Insumos Ativos")
         
-        # Carrega as tabelas para busca e relatório
-        df_ativos = carregar_tabela(INSUMOS_ATIVOS_CSV, force_dtype={"custo_unit_ativo": float})
-        df_compras_full = carregar_tabela(COMPRAS_CSV) 
-        
-        if df_ativos.empty:
+        # Filtros, ordenação e paginação são feitos no banco: só a página visível é carregada
+        grupos_ativos, fornecedores_compras = storage.opcoes_filtros_ativos()
+
+        if storage.contar_ativos() == 0:
             st.info("Nenhum insumo ativo encontrado. Cadastre um novo primeiro.")
         else:
             # === FILTROS AVANÇADOS ===
             col_grupo, col_forn, col_busca = st.columns([1, 1, 1])
             
             # Filtro 1: Grupo
-            grupos_disponiveis = ["Todos"] + sorted(df_ativos["grupo"].unique().tolist())
-            grupo_filtro = col_grupo.selectbox("Filtrar por Grupo:", grupos_disponiveis, index=0)
+            grupo_filtro = col_grupo.selectbox("Filtrar por Grupo:", ["Todos"] + grupos_ativos, index=0)
             
             # Filtro 2: Fornecedor
-            fornecedores = ["Todos"] + sorted(df_compras_full["fornecedor"].dropna().astype(str).unique().tolist())
-            fornecedor_filtro = col_forn.selectbox("Filtrar por Fornecedor:", fornecedores, index=0)
-            
-            # Filtro 3: Busca (Nome ou Representante)
-            termo_busca = col_busca.text_input("Buscar (Insumo ou Representante):", value="").strip().lower()
-
-            df_filtrado = df_ativos.copy()
-            
-            # Aplica os Filtros
-            if grupo_filtro != "Todos":
-                df_filtrado = df_filtrado[df_filtrado["grupo"] == grupo_filtro]
-            
-            if fornecedor_filtro != "Todos":
-                insumos_por_fornecedor = df_compras_full[df_compras_full["fornecedor"] == fornecedor_filtro]["insumo_resumo"].unique()
-                df_filtrado = df_filtrado[df_filtrado["insumo_resumo"].isin(insumos_por_fornecedor)]
-            
-            if termo_busca:
-                df_compras_busca = df_compras_full[['insumo_resumo', 'insumo_completo', 'representante']].drop_duplicates(subset=['insumo_resumo'])
-                
-                insumos_por_busca = df_compras_busca[
-                    df_compras_busca["insumo_resumo"].str.lower().str.contains(termo_busca, na=False) |
-                    df_compras_busca["insumo_completo"].str.lower().str.contains(termo_busca, na=False) |
-                    df_compras_busca["representante"].str.lower().str.contains(termo_busca, na=False)
-                ]["insumo_resumo"].unique()
-                
-                df_filtrado = df_filtrado[df_filtrado["insumo_resumo"].isin(insumos_por_busca)]
+            fornecedor_filtro = col_forn.selectbox("Filtrar por Fornecedor:", ["Todos"] + fornecedores_compras, index=0)
             
+            # Filtro 3: Busca (Nome, Representante ou Fornecedor)
+            termo_busca = col_busca.text_input("Buscar (Insumo, Representante ou Fornecedor):", value="").strip()
+
+            # Ordenação e tamanho da página
+            ordens = {"insumo_resumo": "Insumo", "grupo": "Grupo", "custo_unit_ativo": "Custo Unitário Ativo", "data_ultima_compra": "Última Compra"}
+            col_ordem, col_sentido, col_tamanho = st.columns([1, 1, 1])
+            ordenar_por = col_ordem.selectbox("Ordenar por:", list(ordens), format_func=ordens.get, index=0)
+            decrescente = col_sentido.selectbox("Sentido:", ["Crescente", "Decrescente"], index=0) == "Decrescente"
+            tamanho_pagina = col_tamanho.selectbox("Linhas por página:", [25, 50, 100, 200], index=1)
+
+            filtros = {
+                "grupo": None if grupo_filtro == "Todos" else grupo_filtro,
+                "fornecedor": None if fornecedor_filtro == "Todos" else fornecedor_filtro,
+                # Índice pré-construído (sem acentos, por n-gramas), atualizado a cada compra
+                "insumos": indice_busca.buscar(termo_busca) if termo_busca else None,
+            }
+            # Filtros novos voltam para a primeira página
+            assinatura_filtros = (grupo_filtro, fornecedor_filtro, termo_busca, ordenar_por, decrescente, tamanho_pagina)
+            if st.session_state.get("relatorio_filtros") != assinatura_filtros:
+                st.session_state.relatorio_filtros = assinatura_filtros
+                st.session_state.relatorio_pagina = 1
+
+            total_linhas = storage.contar_ativos(**filtros)
+            total_paginas = max((total_linhas + tamanho_pagina - 1) // tamanho_pagina, 1)
+            st.session_state.relatorio_pagina = min(st.session_state.get("relatorio_pagina", 1), total_paginas)
             
             # --- INTEGRAÇÃO COM EDIÇÃO ---
             st.markdown("---")
             st.caption("A tabela abaixo mostra o custo ativo de cada insumo. Use o seletor abaixo para editar a última compra.")
 
+            pagina_atual = st.number_input(f"Página (de {total_paginas}):", min_value=1, max_value=total_paginas, step=1, key="relatorio_pagina")
+            df_pagina = storage.consultar_ativos(
+                **filtros, ordenar_por=ordenar_por, decrescente=decrescente,
+                limite=tamanho_pagina, deslocamento=(pagina_atual - 1) * tamanho_pagina,
+            )
+
             # Adiciona a coluna de Ações (Apenas como label visual)
-            df_display = df_filtrado.copy()
-            df_display['Ações'] = 'Editar'
+            df_pagina['Ações'] = 'Editar'
             
             cols_map = {
                 "insumo_resumo": "Insumo", "grupo": "Grupo", "un_med": "Unidade Base",
@@ -662,11 +606,12 @@ def run_page():
                 "Ações": "Ações"
             }
             
-            insumos_com_acao = df_filtrado['insumo_resumo'].tolist()
+            insumos_com_acao = df_pagina['insumo_resumo'].tolist()
 
             st.dataframe(
-                df_display.rename(columns=cols_map)[list(cols_map.values())],
+                df_pagina.rename(columns=cols_map)[list(cols_map.values())],
                 use_container_width=True,
+                hide_index=True,
                 column_config={
                     "Custo Unitário Ativo (R$)": st.column_config.NumberColumn(
                         format="R$ %0.6f"
@@ -675,14 +620,37 @@ def run_page():
                 }
             )
             
-            st.caption(f"Total de insumos ativos: {len(df_filtrado)}")
+            inicio = (pagina_atual - 1) * tamanho_pagina
+            st.caption(f"Total de insumos ativos: {total_linhas} • exibindo {inicio + 1 if insumos_com_acao else 0}–{inicio + len(insumos_com_acao)}")
             
             # --- SELETOR PARA EDIÇÃO ---
             st.markdown("---")
-            st.markdown("Selecione o insumo para editar a última compra:")
+            st.markdown("Selecione o insumo (da página exibida) para editar a última compra:")
             
             if insumos_com_acao:
                 insumo_selecionado = st.selectbox("Insumo:", insumos_com_acao, index=0, key="selectbox_edicao_insumo")
+
+                # Onde é usado (consulta indexada em ficha_ingredientes)
+                usos = storage.fichas_que_usam(insumo_selecionado)
+                if usos.empty:
+                    st.caption("Este insumo ainda não é usado em nenhuma ficha técnica.")
+                else:
+                    pratos = (usos["codigo_interno"].astype(str) + " " + usos["nome_prato"].astype(str)).drop_duplicates().tolist()
+                    st.caption(f"Usado em {len(pratos)} ficha(s): " + ", ".join(pratos))
+
+                # Histórico de preços (custo unitário p/ custos de cada compra) + valor de cada método de custo
+                with st.expander("📈 Histórico de preços"):
+                    serie = storage.historico_precos(insumo_selecionado)
+                    if len(serie) > 1:
+                        st.line_chart(serie.set_index("data")["preco"])
+                    estatisticas = carregar_tabela("precos_insumos")
+                    linha = estatisticas[estatisticas["insumo_resumo"] == insumo_selecionado] if not estatisticas.empty else estatisticas
+                    if not linha.empty:
+                        metodo_atual = storage.metodo_custo()
+                        colunas_metodos = st.columns(len(METODOS_CUSTO))
+                        for col, (metodo, rotulo) in zip(colunas_metodos, METODOS_CUSTO.items()):
+                            valor = linha.iloc[0][COLUNA_METODO[metodo]]
+                            col.metric(rotulo + (" ✅" if metodo == metodo_atual else ""), "—" if pd.isna(valor) else f"R$ {valor:.4f}")
                 
                 if st.button(f"✏️ Editar última compra de: {insumo_selecionado}", key="trigger_edit_btn"):
                     st.session_state.edit_insumo_trigger = insumo_selecionado
@@ -690,6 +658,112 @@ def run_page():
             else:
                 st.info("Nenhum insumo corresponde aos filtros para edição.")
 
+        # --- MANUTENÇÃO (reconstrução completa, apenas para reparos) ---
+        with st.expander("🔧 Manutenção da tabela de insumos ativos"):
+            st.caption("A tabela é atualizada automaticamente a cada compra. Use a reconstrução apenas se os custos ativos parecerem inconsistentes com o histórico.")
+            est = cache_tabelas.estatisticas()
+            st.caption(f"Cache de tabelas — acertos: {est['acertos']} • faltas: {est['faltas']} • descartes: {est['descartes']}")
+            if st.button("Reconstruir a partir do histórico de compras", key="reconstruir_ativos_btn"):
+                total = storage.reconstruir_insumos_ativos()
+                propagacao.recalcular_todas()
+                st.success(f"Tabela reconstruída: {total} insumos ativos.")
+                st.rerun()
+            st.caption("Recalcula valor unitário, custo com frete, quantidade líquida e custos unitários de todas as compras com as fórmulas atuais.")
+            if st.button("Recalcular colunas derivadas do histórico", key="recalcular_derivadas_btn"):
+                resultado = storage.recalcular_derivadas()
+                if resultado["insumos_alterados"]:
+                    propagacao.propagar_insumos(resultado["insumos_alterados"])
+                st.success(f"{resultado['corrigidas']} de {resultado['compras']} compras corrigidas; "
+                           f"{len(resultado['insumos_alterados'])} insumo(s) com custo ativo alterado.")
+
+
+    # =========================================================
+    # MODO IMPORTAR NF-e (LOTE DE XMLs)
+    # =========================================================
+    elif st.session_state.current_page_action == "ImportarNFe":
+        st.markdown("### 📥 Importar NF-e (XML)")
+        st.caption("Envie os XMLs das notas dos fornecedores (ou um .zip com eles). Cada item vira uma compra no histórico; "
+                   "itens já importados são ignorados.")
+
+        arquivos_nfe = st.file_uploader("XMLs ou .zip das notas", type=["xml", "zip"], accept_multiple_files=True)
+        pasta_nfe = st.text_input("…ou caminho de uma pasta no servidor com as notas", value="")
+
+        if st.button("📥 Importar notas", key="importar_nfe_btn"):
+            origens = list(arquivos_nfe or []) + ([pasta_nfe.strip()] if pasta_nfe.strip() else [])
+            if not origens:
+                st.error("Selecione ao menos um arquivo ou informe uma pasta.")
+            else:
+                resumo = nfe.importar_nfe(*origens)
+                if resumo["insumos_alterados"]:
+                    # Um recálculo por lote, apenas das fichas que usam os insumos alterados
+                    propagacao.propagar_insumos(resumo["insumos_alterados"])
+                st.session_state.nfe_pendentes = resumo["pendentes"]
+                st.success(f"{resumo['importados']} item(ns) importado(s) de {resumo['itens']} lido(s); "
+                           f"{resumo['ja_importados']} já estavam no histórico.")
+                for erro in resumo["erros"]:
+                    st.error(f"{erro['arquivo']}: {erro['erro']}")
+
+        pendentes = st.session_state.get("nfe_pendentes")
+        if pendentes is not None and not pendentes.empty:
+            st.markdown("#### 🔗 Itens sem insumo correspondente")
+            st.caption("Informe o nome resumido do insumo para cada produto. O vínculo fica salvo para as próximas notas do mesmo fornecedor; "
+                       "depois clique em Importar notas novamente.")
+            mapeados = st.data_editor(
+                pendentes.drop_duplicates(subset=["cnpj_emitente", "codigo_produto"]).assign(insumo_resumo=""),
+                hide_index=True, use_container_width=True,
+                disabled=[c for c in pendentes.columns],
+                column_config={"insumo_resumo": st.column_config.TextColumn(
+                    "Insumo (nome resumido)", help="Use o mesmo nome de um insumo já cadastrado ou um nome novo.")},
+                key="nfe_mapeamento_editor",
+            )
+            if st.button("💾 Salvar vínculos", key="salvar_mapeamento_nfe_btn"):
+                nfe.salvar_mapeamentos(mapeados)
+                st.success("Vínculos salvos. Importe as notas novamente para incluir estes itens.")
+
+    # =========================================================
+    # MODO IMPORTAR PLANILHA (CSV/XLSX)
+    # =========================================================
+    elif st.session_state.current_page_action == "ImportarPlanilha":
+        st.markdown("### 📄 Importar compras por planilha")
+        st.caption("Uma compra por linha. Colunas obrigatórias: nome resumido, unidade (código cadastrado), quantidade e valor total. "
+                   "Opcionais: data (dd/mm/aaaa), grupo, nome completo, marca, frete, % de perda, quantidade para custos, fornecedor, representante, documento, observação.")
+
+        resultado_planilha = st.session_state.pop("planilha_resultado", None)
+        if resultado_planilha:
+            st.success(f"{resultado_planilha['gravadas']} compra(s) gravada(s); "
+                       f"{len(resultado_planilha['insumos_alterados'])} insumo(s) com custo ativo atualizado.")
+            if resultado_planilha["ja_importadas"]:
+                st.warning(f"{resultado_planilha['ja_importadas']} linha(s) já tinham sido importadas e foram ignoradas.")
+
+        # A chave muda após gravar, o que limpa o arquivo enviado
+        arquivo_planilha = st.file_uploader("Planilha (.csv ou .xlsx)", type=["csv", "xlsx"],
+                                            key=f"planilha_upload_{st.session_state.get('planilha_envio', 0)}")
+        if arquivo_planilha is not None:
+            try:
+                bruto = planilha.ler_planilha(arquivo_planilha, arquivo_planilha.name)
+            except ValueError as e:
+                st.error(str(e)); st.stop()
+            validas, erros = planilha.validar(bruto, lista_unidades())
+
+            c_ok, c_erro = st.columns(2)
+            c_ok.metric("Linhas válidas", len(validas))
+            c_erro.metric("Linhas com erro", len(erros))
+            if not erros.empty:
+                st.markdown("#### ❌ Linhas com erro (não serão gravadas)")
+                st.dataframe(erros.rename(columns={"linha": "Linha", "insumo_resumo": "Insumo", "erros": "Erros"}),
+                             use_container_width=True, hide_index=True)
+            if not validas.empty:
+                with st.expander("👀 Pré-visualização das linhas válidas"):
+                    st.dataframe(validas[["data_compra", "insumo_resumo", "un_med", "quantidade_compra", "qtde_para_custos",
+                                          "valor_total_compra", "custo_total_com_frete", "valor_unit_para_custos"]],
+                                 use_container_width=True, hide_index=True)
+                if st.button(f"💾 Gravar {len(validas)} compra(s) válida(s)", key="gravar_planilha_btn"):
+                    resultado = planilha.importar_compras(validas)
+                    if resultado["insumos_alterados"]:
+                        propagacao.propagar_insumos(resultado["insumos_alterados"])
+                    st.session_state.planilha_resultado = resultado
+                    st.session_state.planilha_envio = st.session_state.get("planilha_envio", 0) + 1
+                    st.rerun()
 
     # =========================================================
     # Rodapé com versão + versículo (Mantido)
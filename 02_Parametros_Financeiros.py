@@ -3,9 +3,14 @@
 
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
-import os, json, random
+from datetime import datetime, date, timedelta
 from utils.nav import sidebar_menu # Mantemos a importação para consistência
+from utils import storage, vendas, propagacao
+from utils.custos import custo_unitario_venda
+from utils.precificacao import PARAMETROS_PRECO, LUCRO, ler_parametros, preco_sugerido
+from utils.simulacao import faixa, grade_cenarios, simular
+from utils.canais import PARAMETROS_CANAL
+from utils.precos import METODOS_CUSTO
 
 # =========================================================
 # FUNÇÃO PRINCIPAL DE EXECUÇÃO DA PÁGINA
@@ -29,38 +34,23 @@ def run_page():
     </style>
     """, unsafe_allow_html=True)
 
-    DATA_DIR = "data"
-    os.makedirs(DATA_DIR, exist_ok=True)
-    PARAMS_CSV = os.path.join(DATA_DIR, "parametros_financeiros.csv")
-
     # =========================================================
-    # CAMPOS PADRÃO
+    # CAMPOS PADRÃO (semeados pelo banco na primeira execução)
     # =========================================================
-    parametros_iniciais = [
-        {"parametro": "Margem de Contribuição", "valor": 50.43, "observacao": "Cálculo: Faturamento - Custo Produção - Taxa Cartão - Simples - Comissão"},
-        {"parametro": "Lucro Desejado", "valor": 20.0, "observacao": "Percentual de lucro desejado sobre o custo final."},
-        {"parametro": "Comissão APP", "valor": 0.0, "observacao": "Percentual de comissão do aplicativo de delivery."},
-        {"parametro": "Simples", "valor": 5.0, "observacao": "Percentual de imposto Simples Nacional."},
-        {"parametro": "Cashback Menudino", "valor": 1.0, "observacao": "Percentual destinado a cashback em campanhas do Menudino."},
-        {"parametro": "Comissão Atendente", "valor": 1.0, "observacao": "Percentual de comissão repassado ao atendente."},
-        {"parametro": "Taxa Cartão", "valor": 5.0, "observacao": "Taxa média cobrada pelas operadoras de cartão."},
-        {"parametro": "Outros (1)", "valor": 1.0, "observacao": "Outros custos eventuais."},
-        {"parametro": "Outros (2)", "valor": 1.0, "observacao": "Outros custos adicionais."}
-    ]
+    parametros_iniciais = storage.PARAMETROS_PADRAO
 
     # =========================================================
     # FUNÇÕES AUXILIARES
     # =========================================================
     def carregar_parametros():
-        if os.path.exists(PARAMS_CSV):
-            return pd.read_csv(PARAMS_CSV)
-        else:
+        df = storage.ler_tabela("parametros_financeiros")
+        if df.empty:
             df = pd.DataFrame(parametros_iniciais)
-            df.to_csv(PARAMS_CSV, index=False)
-            return df
+            storage.salvar_parametros(df)
+        return df
 
     def salvar_parametros(df):
-        df.to_csv(PARAMS_CSV, index=False)
+        storage.salvar_parametros(df)
 
     # =========================================================
     # INTERFACE
@@ -68,7 +58,7 @@ def run_page():
     st.title("💰 Parâmetros Financeiros")
     st.caption("Defina percentuais e valores base que serão utilizados futuramente nos cálculos de custo e precificação.")
 
-    acao = st.radio("Ação:", ["➕ Cadastrar / Atualizar parâmetros", "📋 Visualizar parâmetros"], index=0)
+    acao = st.radio("Ação:", ["➕ Cadastrar / Atualizar parâmetros", "📋 Visualizar parâmetros", "🛵 Canais de venda", "🧪 Simular cenários", "📦 Método de custo dos insumos"], index=0)
 
     # =========================================================
     # CADASTRAR / ATUALIZAR
@@ -102,6 +92,108 @@ def run_page():
         else:
             st.dataframe(df, use_container_width=True)
 
+    # =========================================================
+    # CANAIS DE VENDA
+    # =========================================================
+    elif acao == "🛵 Canais de venda":
+        st.caption("Cada canal tem as suas próprias taxas; Lucro Desejado, Simples e Outros continuam vindo dos parâmetros gerais.")
+        perfis = storage.ler_tabela("perfis_canais")
+        tabela = (perfis.pivot_table(index="canal", columns="parametro", values="valor", aggfunc="last")
+                  .reindex(columns=PARAMETROS_CANAL).fillna(0.0) if not perfis.empty
+                  else pd.DataFrame(columns=PARAMETROS_CANAL, index=pd.Index([], name="canal")))
+        editado = st.data_editor(
+            tabela.reset_index(), num_rows="dynamic", use_container_width=True, hide_index=True,
+            column_config={"canal": st.column_config.TextColumn("Canal", required=True),
+                           **{c: st.column_config.NumberColumn(f"{c} (%)", min_value=0.0, max_value=100.0, step=0.1) for c in PARAMETROS_CANAL}},
+            key="editor_canais",
+        )
+        if st.button("💾 Salvar canais"):
+            editado = editado.dropna(subset=["canal"])
+            editado["canal"] = editado["canal"].astype(str).str.strip()
+            editado = editado[editado["canal"] != ""].drop_duplicates(subset=["canal"], keep="last")
+            longo = editado.melt(id_vars="canal", value_vars=PARAMETROS_CANAL, var_name="parametro", value_name="valor").fillna({"valor": 0.0})
+            removidos = sorted(set(tabela.index) - set(editado["canal"]))
+            storage.salvar_perfis_canais(longo, remover=removidos)
+            st.success("✅ Canais de venda atualizados!")
+
+    # =========================================================
+    # SIMULAR CENÁRIOS
+    # =========================================================
+    elif acao == "🧪 Simular cenários":
+        st.caption("Varie um ou mais parâmetros e veja como as margens de todo o cardápio mudam, mantendo os preços atuais. "
+                   "Preço atual = preço médio vendido nos últimos 90 dias (ou o preço sugerido, para pratos sem vendas).")
+        base = ler_parametros(carregar_parametros())
+        custos = propagacao.custos_atuais()
+        if custos.empty:
+            st.info("Nenhuma ficha técnica cadastrada ainda.")
+        else:
+            escolhidos = st.multiselect("Parâmetros a variar", [p for p in PARAMETROS_PRECO if p != LUCRO], default=["Taxa Cartão"])
+            faixas = {}
+            for nome in escolhidos:
+                c1, c2, c3 = st.columns(3)
+                minimo = c1.number_input(f"{nome} — mínimo (%)", 0.0, 100.0, max(float(base[nome]) - 2.0, 0.0), 0.5, key=f"sim_min_{nome}")
+                maximo = c2.number_input(f"{nome} — máximo (%)", 0.0, 100.0, float(base[nome]) + 10.0, 0.5, key=f"sim_max_{nome}")
+                passo = c3.number_input(f"{nome} — passo (%)", 0.01, 100.0, 0.5, 0.01, key=f"sim_passo_{nome}")
+                faixas[nome] = faixa(minimo, maximo, passo)
+
+            total = int(pd.Series([len(v) for v in faixas.values()]).prod()) if faixas else 0
+            st.write(f"**{total}** cenário(s) × **{len(custos)}** prato(s)")
+
+            if faixas and st.button("▶️ Simular"):
+                hoje = date.today()
+                vendidos = vendas.vendas_periodo(hoje - timedelta(days=90), hoje).set_index("ficha_id")
+                quantidade = custos["id"].map(vendidos["quantidade"]).fillna(0.0).to_numpy(dtype=float)
+                receita = custos["id"].map(vendidos["receita"]).fillna(0.0).to_numpy(dtype=float)
+                custo = custo_unitario_venda(custos)
+                preco = preco_sugerido(custo, base.sum())
+                preco[quantidade > 0] = receita[quantidade > 0] / quantidade[quantidade > 0]
+                try:
+                    cenarios = grade_cenarios(base, faixas)
+                except ValueError as e:
+                    st.error(str(e)); st.stop()
+                resumo, pratos = simular(cenarios, custo, preco, base, quantidade if quantidade.sum() > 0 else None)
+
+                st.markdown("#### 📈 Margens por cenário")
+                if len(escolhidos) == 1:
+                    st.line_chart(resumo.set_index(escolhidos[0])[["margem_p10_pct", "margem_mediana_pct", "margem_p90_pct"]])
+                st.dataframe(
+                    resumo[escolhidos + [c for c in resumo.columns if c not in base.index]].rename(columns={
+                        "margem_media_pct": "Margem média (%)", "margem_p10_pct": "P10 (%)", "margem_mediana_pct": "Mediana (%)",
+                        "margem_p90_pct": "P90 (%)", "pratos_margem_negativa": "Pratos c/ margem negativa",
+                        "pratos_mudam_categoria": "Pratos que mudam de categoria",
+                    }),
+                    use_container_width=True, hide_index=True,
+                )
+
+                st.markdown("#### 🔀 Pratos sensíveis")
+                pratos.insert(0, "Prato", custos["codigo_interno"].astype(str).to_numpy() + " — " + custos["nome_prato"].astype(str).to_numpy())
+                if "cenarios_com_mudanca" in pratos.columns:
+                    pratos = pratos.sort_values("cenarios_com_mudanca", ascending=False)
+                else:
+                    st.info("Sem vendas importadas nos últimos 90 dias: a mudança de categoria não pode ser avaliada.")
+                st.dataframe(
+                    pratos.rename(columns={
+                        "margem_min": "Margem mín. (R$)", "margem_max": "Margem máx. (R$)", "categoria_atual": "Categoria atual",
+                        "cenarios_com_mudanca": "Cenários c/ mudança", "pct_cenarios_com_mudanca": "% dos cenários",
+                    }),
+                    use_container_width=True, hide_index=True,
+                )
+
+    # =========================================================
+    # MÉTODO DE CUSTO DOS INSUMOS
+    # =========================================================
+    elif acao == "📦 Método de custo dos insumos":
+        st.caption("Define qual preço de cada insumo entra no custo das fichas. Todos os métodos são mantidos atualizados a cada compra "
+                   "(médias ponderadas pela quantidade); trocar de método só recalcula as fichas afetadas.")
+        metodos = list(METODOS_CUSTO)
+        atual = storage.metodo_custo()
+        escolhido = st.radio("Método de custo", metodos, index=metodos.index(atual), format_func=METODOS_CUSTO.get)
+        if st.button("💾 Aplicar método", disabled=escolhido == atual):
+            alterados = storage.definir_metodo_custo(escolhido)
+            if alterados:
+                propagacao.propagar_insumos(alterados)
+            st.success(f"✅ Método aplicado: {METODOS_CUSTO[escolhido]}. {len(alterados)} insumo(s) com custo alterado.")
+
     # =========================================================
     # RODAPÉ
     # =========================================================
@@ -2,7 +2,11 @@
 # Código completo e formatado para ser executado via streamlit_app.py
 
 import streamlit as st
+from datetime import date, timedelta
 from utils.nav import sidebar_menu # Mantemos a importação para consistência
+from utils import vendas, custo_historico, propagacao
+from utils.cache import tabelas as cache_tabelas
+from utils.precificacao import LUCRO, ler_parametros
 
 # =========================================================
 # FUNÇÃO PRINCIPAL DE EXECUÇÃO DA PÁGINA
@@ -58,14 +62,87 @@ def run_page():
     st.divider()
 
     # ==============================
-    # MENSAGEM FINAL
+    # IMPORTAÇÃO DE VENDAS (PDV)
     # ==============================
-    st.info(
-        """
-    💡 *Em breve este módulo permitirá importar dados de vendas do seu sistema (como o Consumer ou outro controle),
-    realizando automaticamente os cálculos de popularidade e margem de contribuição de cada item.*
-        """
-    )
+    st.subheader("📥 Importar vendas do PDV")
+    st.caption("Arquivo CSV exportado do sistema de vendas (Consumer ou outro), com código do produto, quantidade, valor total e data. "
+               "Os itens são ligados às fichas pelo Código PDV (ou Código Sistema).")
+    arquivo = st.file_uploader("Exportação de vendas (.csv)", type=["csv"])
+    if arquivo is not None and st.button("📥 Importar vendas"):
+        try:
+            resumo = vendas.importar_vendas(arquivo, nome_arquivo=arquivo.name)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            if resumo["ja_importado"]:
+                st.warning("Este arquivo já foi importado anteriormente.")
+            else:
+                st.success(f"{resumo['linhas']} linhas lidas; {resumo['linhas'] - resumo['linhas_sem_ficha']} ligadas a fichas técnicas.")
+                if resumo["codigos_sem_ficha"]:
+                    st.warning("Códigos sem ficha técnica: " + ", ".join(sorted(resumo["codigos_sem_ficha"])[:30]))
+
+    st.divider()
+
+    # ==============================
+    # CLASSIFICAÇÃO DO PERÍODO
+    # ==============================
+    st.subheader("🧮 Classificação do cardápio")
+    hoje = date.today()
+    periodo = st.date_input("Período de análise", value=(hoje - timedelta(days=90), hoje), format="DD/MM/YYYY")
+    if isinstance(periodo, (tuple, list)) and len(periodo) == 2:
+        vendidos = vendas.vendas_periodo(periodo[0], periodo[1])
+        if vendidos.empty:
+            st.info("Nenhuma venda importada no período selecionado.")
+        else:
+            # Mesma margem do simulador de cenários: preço − taxas variáveis − custo
+            variaveis = ler_parametros(cache_tabelas.ler("parametros_financeiros")).drop(LUCRO).sum()
+            resultado = vendas.classificar_cardapio(vendidos, propagacao.custos_atuais(), variaveis)
+            contagem = resultado["categoria"].value_counts()
+            cols = st.columns(len(vendas.CATEGORIAS))
+            for col, cat in zip(cols, vendas.CATEGORIAS):
+                col.metric(cat, int(contagem.get(cat, 0)))
+            st.dataframe(
+                resultado.rename(columns={
+                    "codigo_interno": "FT", "nome_prato": "Prato", "quantidade": "Qtd vendida", "receita": "Receita (R$)",
+                    "preco_medio": "Preço médio (R$)", "custo_unitario": "Custo (R$)", "margem_unitaria": "MC unit. (R$)",
+                    "margem_total": "MC total (R$)", "participacao": "Participação", "categoria": "Categoria",
+                }).drop(columns=["ficha_id"]),
+                use_container_width=True, hide_index=True,
+            )
+    else:
+        st.info("Selecione a data inicial e a data final.")
+
+    st.divider()
+
+    # ==============================
+    # CUSTOS E CMV HISTÓRICOS
+    # ==============================
+    st.subheader("📅 Custos e CMV históricos")
+    st.caption("Custo de cada prato em cada dia com os preços vigentes naquela data (pelo método de custo em uso) "
+               "e CMV das vendas importadas, mês a mês.")
+    periodo_cmv = st.date_input("Período do CMV", value=(hoje - timedelta(days=365), hoje), format="DD/MM/YYYY", key="periodo_cmv")
+    if isinstance(periodo_cmv, (tuple, list)) and len(periodo_cmv) == 2:
+        mensal = custo_historico.cmv_periodo(periodo_cmv[0], periodo_cmv[1], por="mes")
+        if mensal.empty:
+            st.info("Nenhuma venda importada no período selecionado.")
+        else:
+            st.line_chart(mensal.set_index("mes")[["cmv_percentual"]].rename(columns={"cmv_percentual": "CMV (%)"}))
+            st.dataframe(
+                mensal.rename(columns={
+                    "mes": "Mês", "quantidade": "Qtd vendida", "receita": "Receita (R$)", "cmv": "CMV (R$)",
+                    "linhas_sem_custo": "Vendas sem ficha", "cmv_percentual": "CMV (%)",
+                }),
+                use_container_width=True, hide_index=True,
+            )
+
+        fichas = cache_tabelas.ler("fichas_tecnicas")
+        nomes = dict(zip(fichas["id"], fichas["codigo_interno"].astype(str) + " — " + fichas["nome_prato"].astype(str)))
+        escolhidos = st.multiselect("Custo por porção ao longo do período", list(nomes), format_func=nomes.get, key="pratos_historico")
+        if escolhidos:
+            custos = custo_historico.custos_por_unidade_vendida(custo_historico.custos_historicos(periodo_cmv[0], periodo_cmv[1]), fichas)
+            st.line_chart(custos[escolhidos].rename(columns=nomes))
+    else:
+        st.info("Selecione a data inicial e a data final.")
 
     # Rodapé
     st.markdown(
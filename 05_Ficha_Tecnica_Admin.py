@@ -4,6 +4,10 @@
 import streamlit as st
 from datetime import date
 from utils.nav import sidebar_menu # Mantemos a importação para consistência
+from utils.cache import tabelas as cache_tabelas
+from utils.precificacao import ler_parametros, precificar_fichas
+from utils.canais import METRICAS, matriz as matriz_precos, percentuais_canais
+from utils.propagacao import custos_atuais, ultimas_variacoes
 
 # =========================================================
 # FUNÇÃO PRINCIPAL DE EXECUÇÃO DA PÁGINA
@@ -22,31 +26,116 @@ def run_page():
     st.warning("⚠️ **Atenção:** Este módulo calcula os custos indiretos (administrativos) do prato. Garanta que os **Parâmetros Financeiros** (custos fixos, taxas, etc.) estejam atualizados.")
 
     # =========================================
-    # DETALHES DA FICHA (Placeholder)
+    # CUSTO DE INSUMOS (todas as fichas em um único cálculo)
     # =========================================
     st.subheader("📋 Custo Indireto por Prato")
     st.write("Aqui, o custo do prato (custo de insumos) será combinado com os percentuais administrativos definidos nos parâmetros.")
 
-    col1, col2 = st.columns(2)
-    with col1:
-        st.metric(label="Custo de Insumos (da Ficha Cozinha)", value="R$ XX,XX", delta="Exemplo")
-    with col2:
-        st.metric(label="Custo Total (com Admnistrativo)", value="R$ YY,YY", delta="Exemplo")
+    custos = custos_atuais()
+    for ciclo in custos.attrs.get("ciclos", []):
+        st.error("Ciclo entre sub-receitas (ficam sem custo até ser corrigido): " + " → ".join(ciclo))
+
+    if custos.empty:
+        st.info("Nenhuma ficha técnica cadastrada ainda. Crie uma na Ficha Técnica - Cozinha.")
+    else:
+        rotulos = (custos["codigo_interno"].astype(str) + " — " + custos["nome_prato"].astype(str)).tolist()
+        escolha = st.selectbox("Prato:", options=range(len(rotulos)), format_func=lambda i: rotulos[i])
+        ficha = custos.iloc[escolha]
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric(label="Custo de Insumos (da Ficha Cozinha)", value=f"R$ {ficha['custo_total']:.2f}")
+        with col2:
+            porcao = ficha["custo_porcao"]
+            st.metric(label="Custo de Insumos por Porção", value=f"R$ {porcao:.2f}" if porcao == porcao else "—")
+        if ficha["insumos_sem_custo"] > 0:
+            st.warning(f"{ficha['insumos_sem_custo']} ingrediente(s) desta ficha não têm custo ativo no Cadastro de Insumos.")
+
+        with st.expander("📚 Custo de insumos de todo o cardápio"):
+            st.dataframe(
+                custos.drop(columns=["id"]).rename(columns={
+                    "codigo_interno": "Código", "nome_prato": "Prato", "categoria": "Categoria",
+                    "custo_total": "Custo Total (R$)", "insumos_sem_custo": "Insumos sem custo",
+                    "custo_porcao": "Custo por Porção (R$)",
+                }),
+                use_container_width=True,
+                column_config={
+                    "Custo Total (R$)": st.column_config.NumberColumn(format="R$ %0.2f"),
+                    "Custo por Porção (R$)": st.column_config.NumberColumn(format="R$ %0.2f"),
+                },
+            )
+
+        # Registro da propagação: fichas cujo custo mudou após compras
+        variacoes = ultimas_variacoes()
+        if not variacoes.empty:
+            with st.expander("🔄 Últimas variações de custo (por compra de insumo)"):
+                st.dataframe(
+                    variacoes.rename(columns={
+                        "registrado_em": "Quando", "codigo_interno": "Código", "nome_prato": "Prato",
+                        "insumo_origem": "Insumo alterado", "custo_anterior": "Custo Anterior (R$)",
+                        "custo_novo": "Custo Novo (R$)", "variacao": "Variação (R$)",
+                    }),
+                    use_container_width=True,
+                )
 
     st.markdown("---")
 
     # =========================================
-    # VISUALIZAÇÃO DO RATEIO (Placeholder)
+    # RATEIO E PREÇO SUGERIDO (todo o cardápio)
     # =========================================
     st.subheader("⚙️ Detalhamento do Rateio")
-    st.info("💡 Futuramente, o sistema fará aqui o cálculo automático, multiplicando o custo do prato pelos percentuais de Lucro Desejado, Taxas de Cartão, Simples Nacional, etc.")
-
-    # Tabela Simples de Rateio
-    st.dataframe({
-        'Parâmetro': ['Lucro Desejado', 'Taxa Cartão (Média)', 'Simples Nacional'],
-        'Percentual': ['20.00%', '5.00%', '5.00%'],
-        'Custo Rateado (Ex)': ['R$ 3.50', 'R$ 0.80', 'R$ 0.75']
-    }, use_container_width=True)
+    percentuais = ler_parametros(cache_tabelas.ler("parametros_financeiros"))
+    if percentuais.sum() >= 100:
+        st.error(f"A soma dos percentuais ({percentuais.sum():.2f}%) chega a 100%: não há preço viável. Revise os Parâmetros Financeiros.")
+
+    if not custos.empty:
+        precos = precificar_fichas(custos, percentuais)
+        linha = precos.iloc[escolha]
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Preço Sugerido", f"R$ {linha['preco_sugerido']:.2f}" if linha["preco_sugerido"] == linha["preco_sugerido"] else "—")
+        col2.metric("Margem de Contribuição", f"R$ {linha['margem_contribuicao']:.2f}" if linha["margem_contribuicao"] == linha["margem_contribuicao"] else "—")
+        col3.metric("Margem (%)", f"{linha['margem_percentual']:.2f}%" if linha["margem_percentual"] == linha["margem_percentual"] else "—")
+
+        st.dataframe({
+            "Parâmetro": list(percentuais.index),
+            "Percentual": [f"{v:.2f}%" for v in percentuais],
+            "Custo Rateado": [f"R$ {linha[nome]:.2f}" if linha[nome] == linha[nome] else "—" for nome in percentuais.index],
+        }, use_container_width=True)
+
+        with st.expander("💲 Preços sugeridos de todo o cardápio"):
+            st.dataframe(
+                precos.drop(columns=["id"]).rename(columns={
+                    "codigo_interno": "Código", "nome_prato": "Prato", "categoria": "Categoria",
+                    "custo_unitario": "Custo (R$)", "preco_sugerido": "Preço Sugerido (R$)",
+                    "margem_contribuicao": "Margem Contrib. (R$)", "margem_percentual": "Margem (%)",
+                }),
+                use_container_width=True,
+                column_config={
+                    **{c: st.column_config.NumberColumn(format="R$ %0.2f") for c in percentuais.index},
+                    "Custo (R$)": st.column_config.NumberColumn(format="R$ %0.2f"),
+                    "Preço Sugerido (R$)": st.column_config.NumberColumn(format="R$ %0.2f"),
+                    "Margem Contrib. (R$)": st.column_config.NumberColumn(format="R$ %0.2f"),
+                    "Margem (%)": st.column_config.NumberColumn(format="%0.2f%%"),
+                },
+            )
+
+    # =========================================
+    # PREÇOS POR CANAL (prato × canal)
+    # =========================================
+    canais = percentuais_canais(percentuais, cache_tabelas.ler("perfis_canais"))
+    if not custos.empty and not canais.empty:
+        st.markdown("---")
+        st.subheader("🛵 Preços por Canal de Venda")
+        st.caption("Taxas de cada canal em Parâmetros Financeiros → Canais de venda. Preço mínimo viável = cobre custo e taxas, sem lucro.")
+        matrizes = matriz_precos.calcular(custos, canais)
+        metrica = st.radio("Mostrar:", list(METRICAS), format_func=METRICAS.get, horizontal=True)
+        tabela = matrizes[metrica].reindex(custos["id"].to_numpy())
+        tabela.insert(0, "Prato", (custos["codigo_interno"].astype(str) + " — " + custos["nome_prato"].astype(str)).to_numpy())
+        st.dataframe(
+            tabela, use_container_width=True, hide_index=True,
+            column_config={c: st.column_config.NumberColumn(format="R$ %0.2f") for c in canais.index},
+        )
 
     # =========================================
     # RODAPÉ
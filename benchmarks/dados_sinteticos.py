@@ -0,0 +1,163 @@
+# benchmarks/dados_sinteticos.py - GERADOR DETERMINÍSTICO DE DADOS SINTÉTICOS
+
+# =========================================================
+# FichApp - CSVs no formato legado (data/*.csv) em qualquer escala
+# =========================================================
+# Os arquivos gerados são os mesmos que o app importa uma única vez ao abrir um
+# banco novo (storage.importar_csvs), então um diretório gerado aqui vira um
+# banco de teste com: storage.usar_banco(os.path.join(pasta, "fichapp.db")).
+#
+# Uso: python -m benchmarks.dados_sinteticos --saida /tmp/fichapp_50k --compras 50000
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import calculos, storage
+
+SEMENTE = 42
+
+# Palavras para nomes plausíveis de insumos, por grupo
+NOMES_GRUPO = {
+    "Embalagem": ["Pote", "Sacola", "Hashi", "Guardanapo", "Bandeja", "Tampa"],
+    "Peixe": ["Salmão", "Atum", "Tilápia", "Peixe Branco", "Kani", "Camarão"],
+    "Carne": ["Carne Moída", "Frango", "Bacon", "Costela", "Picanha", "Lombo"],
+    "Hortifruti": ["Cebolinha", "Pepino", "Manga", "Alface", "Tomate", "Limão"],
+    "Bebida": ["Refrigerante", "Suco", "Água", "Cerveja", "Chá Verde", "Saquê"],
+    "Frios": ["Cream Cheese", "Queijo", "Presunto", "Muçarela", "Requeijão", "Manteiga"],
+    "Molhos e Temperos": ["Shoyu", "Tarê", "Gergelim", "Wasabi", "Sal", "Missô"],
+    "Grãos e Cereais": ["Arroz Japonês", "Farinha Panko", "Trigo", "Feijão", "Aveia", "Milho"],
+    "Higiene": ["Luva", "Touca", "Sabonete", "Papel Toalha", "Álcool", "Máscara"],
+    "Limpeza": ["Detergente", "Desengordurante", "Esponja", "Água Sanitária", "Pano", "Saco de Lixo"],
+    "Outros": ["Gás", "Carvão", "Gelo", "Vela", "Fósforo", "Filme PVC"],
+}
+# Unidade de compra mais comum de cada grupo (as demais aparecem com menos peso)
+UNIDADES_GRUPO = {
+    "Embalagem": ["UN", "CT", "MIL", "PAC"], "Peixe": ["KG", "G"], "Carne": ["KG", "G"],
+    "Hortifruti": ["KG", "UN", "DZ"], "Bebida": ["UN", "L", "ML"], "Frios": ["KG", "G"],
+    "Molhos e Temperos": ["L", "ML", "KG"], "Grãos e Cereais": ["KG", "G"], "Higiene": ["UN", "CX"],
+    "Limpeza": ["UN", "L"], "Outros": ["UN", "KG"],
+}
+CATEGORIAS_FICHA = ["Hossomaki", "Uramaki", "Hot Roll", "Porção", "Burger", "Risoto", "Yakissoba", "Preparo Interno"]
+PREFIXOS_CATEGORIA = {"Hossomaki": 13, "Uramaki": 14, "Hot Roll": 15, "Porção": 21, "Burger": 31, "Risoto": 41,
+                      "Yakissoba": 51, "Preparo Interno": 91}
+
+
+def _insumos(rng: np.random.Generator, n: int) -> pd.DataFrame:
+    grupos = rng.choice(storage.GRUPOS_PADRAO, size=n)
+    nomes, unidades = [], []
+    for i, grupo in enumerate(grupos):
+        base = NOMES_GRUPO[grupo][rng.integers(len(NOMES_GRUPO[grupo]))]
+        nomes.append(f"{base} {i + 1:05d}")
+        opcoes = UNIDADES_GRUPO[grupo]
+        pesos = np.array([4.0] + [1.0] * (len(opcoes) - 1))
+        unidades.append(opcoes[rng.choice(len(opcoes), p=pesos / pesos.sum())])
+    return pd.DataFrame({
+        "insumo_resumo": nomes, "grupo": grupos, "un_med": unidades,
+        "preco_base": np.round(rng.lognormal(mean=2.5, sigma=1.0, size=n), 2),
+    })
+
+
+def _compras(rng: np.random.Generator, insumos: pd.DataFrame, n: int, dias: int) -> pd.DataFrame:
+    # Cada insumo recebe ao menos uma compra (enquanto houver compras); as demais se
+    # concentram em poucos insumos (distribuição de Zipf truncada)
+    cobertura = rng.permutation(len(insumos))[:n]
+    pesos = 1.0 / np.arange(1, len(insumos) + 1) ** 0.8
+    extras = rng.permutation(len(insumos))[rng.choice(len(insumos), size=n - len(cobertura), p=pesos / pesos.sum())]
+    escolhidos = rng.permutation(np.concatenate([cobertura, extras]))
+    linhas = insumos.iloc[escolhidos].reset_index(drop=True)
+
+    fatores = {codigo: float(qtde) for codigo, _, qtde in storage.UNIDADES_PADRAO}
+    quantidade = np.round(rng.uniform(1, 20, size=n), 0)
+    qtde_para_custos = quantidade * linhas["un_med"].map(fatores).fillna(1.0).to_numpy()
+    preco = linhas["preco_base"].to_numpy() * rng.lognormal(0.0, 0.12, size=n)  # oscilação de preço entre compras
+    valor_total = np.round(preco * quantidade, 2)
+    frete = np.round(np.where(rng.random(n) < 0.3, rng.uniform(5, 40, size=n), 0.0), 2)
+    perda = np.round(np.where(linhas["grupo"].isin(["Peixe", "Carne", "Hortifruti"]), rng.uniform(0, 25, size=n), 0.0), 1)
+
+    inicio = pd.Timestamp("2024-01-01")
+    datas = inicio + pd.to_timedelta(np.sort(rng.integers(0, dias, size=n)), unit="D")
+    fornecedores = np.array([f"Fornecedor {i:03d}" for i in range(1, 201)])
+    derivadas = calculos.colunas_derivadas(quantidade, qtde_para_custos, valor_total, frete, perda)
+
+    df = pd.DataFrame({
+        "quantidade_compra": quantidade, "qtde_para_custos": qtde_para_custos,
+        "valor_total_compra": valor_total, "valor_frete": frete, "percentual_perda": perda,
+        **derivadas,
+        "data_compra": datas.strftime("%d/%m/%Y"), "grupo": linhas["grupo"], "insumo_resumo": linhas["insumo_resumo"],
+        "insumo_completo": linhas["insumo_resumo"] + " - " + linhas["grupo"].str.lower(),
+        "marca": np.array(["Marca A", "Marca B", "Marca C", ""])[rng.integers(4, size=n)],
+        "tipo": "Comprado", "un_med": linhas["un_med"],
+        "fornecedor": fornecedores[rng.integers(len(fornecedores), size=n)],
+        "fone_fornecedor": "", "representante": "", "documento": [f"NF {i:07d}" for i in range(1, n + 1)],
+        "observacao": "", "atualizado_em": datas.strftime("%Y-%m-%d 10:00:00"),
+    })
+    return df[storage.COLUNAS["compras_insumos"]]
+
+
+def _ativos(compras: pd.DataFrame) -> pd.DataFrame:
+    """Última compra de cada insumo (o que storage mantém em insumos_ativos)."""
+    iso = pd.to_datetime(compras["data_compra"], format="%d/%m/%Y")
+    ultimas = compras.assign(_iso=iso).sort_values("_iso", kind="stable").drop_duplicates("insumo_resumo", keep="last")
+    return pd.DataFrame({
+        "insumo_resumo": ultimas["insumo_resumo"], "grupo": ultimas["grupo"], "un_med": ultimas["un_med"],
+        "custo_unit_ativo": ultimas["valor_unit_para_custos"], "data_ultima_compra": ultimas["data_compra"],
+    })
+
+
+def _fichas(rng: np.random.Generator, ativos: pd.DataFrame, n: int, ingredientes: tuple[int, int]) -> pd.DataFrame:
+    unidade_linha = {codigo: storage.UNIDADES_BASE[dimensao] for codigo, (dimensao, _) in storage.DIMENSOES_UNIDADES.items()}
+    nomes, uns = ativos["insumo_resumo"].to_numpy(), ativos["un_med"].to_numpy()
+    sequencia = {c: 0 for c in CATEGORIAS_FICHA}
+    registros = []
+    for i in range(1, n + 1):
+        categoria = CATEGORIAS_FICHA[rng.integers(len(CATEGORIAS_FICHA))]
+        sequencia[categoria] += 1
+        itens = []
+        for j in rng.choice(len(nomes), size=min(int(rng.integers(*ingredientes)), len(nomes)), replace=False):
+            unidade = unidade_linha.get(uns[j], uns[j])
+            quantidade = rng.uniform(5, 300) if unidade in ("G", "ML") else rng.integers(1, 4)
+            itens.append({"insumo": nomes[j], "quantidade": round(float(quantidade), 2), "unidade": unidade, "obs": ""})
+        registros.append({
+            "id": i, "nome_prato": f"{categoria} {i:05d}",
+            "codigo_interno": f"{PREFIXOS_CATEGORIA[categoria]}{sequencia[categoria]:02d}",
+            "codigo_sistema": str(100000 + i), "codigo_pdv": str(500000 + i), "categoria": categoria,
+            "rendimento_total": float(rng.integers(1, 5)), "peso_por_porcao": round(float(rng.uniform(100, 500)), 0),
+            "responsavel": "Benchmark", "atualizado_em": "2025-01-01 10:00:00",
+            "ingredientes_json": json.dumps(itens, ensure_ascii=False),
+        })
+    return pd.DataFrame(registros)
+
+
+def gerar(pasta: str, compras: int = 1000, insumos: int = 5000, fichas: int = 2000,
+          ingredientes: tuple[int, int] = (3, 12), dias: int = 730, semente: int = SEMENTE) -> dict:
+    """
+    Grava compras_insumos.csv, insumos_ativos.csv, unidades_medida.csv e
+    fichas_tecnicas.csv em 'pasta'. A mesma semente e os mesmos tamanhos geram
+    sempre os mesmos arquivos. Retorna quantas linhas cada arquivo recebeu.
+    """
+    rng = np.random.default_rng(semente)
+    os.makedirs(pasta, exist_ok=True)
+    base = _insumos(rng, insumos)
+    df_compras = _compras(rng, base, compras, dias)
+    df_ativos = _ativos(df_compras)
+    df_fichas = _fichas(rng, df_ativos, fichas, ingredientes)
+    df_unidades = pd.DataFrame(storage.UNIDADES_PADRAO, columns=storage.COLUNAS["unidades_medida"])
+
+    arquivos = {"compras_insumos": df_compras, "insumos_ativos": df_ativos, "unidades_medida": df_unidades, "fichas_tecnicas": df_fichas}
+    for tabela, df in arquivos.items():
+        storage.exportar_csv(df, os.path.join(pasta, storage.CSV_LEGADOS[tabela]))
+    return {tabela: len(df) for tabela, df in arquivos.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos (formato legado) para benchmarks do FichApp")
+    parser.add_argument("--saida", required=True, help="pasta de destino dos CSVs")
+    parser.add_argument("--compras", type=int, default=1000)
+    parser.add_argument("--insumos", type=int, default=5000)
+    parser.add_argument("--fichas", type=int, default=2000)
+    parser.add_argument("--semente", type=int, default=SEMENTE)
+    args = parser.parse_args()
+    print(json.dumps(gerar(args.saida, args.compras, args.insumos, args.fichas, semente=args.semente)))
@@ -0,0 +1,228 @@
+# benchmarks/executar.py - BENCHMARKS DOS CAMINHOS DE DADOS
+
+# =========================================================
+# FichApp - Tempo das operações reais sobre bancos sintéticos (saída em JSON)
+# =========================================================
+# Para cada cenário: gera os CSVs (benchmarks/dados_sinteticos.py), abre um
+# banco novo que os importa e mede as mesmas funções que as páginas chamam.
+#
+# Uso (na raiz do projeto):
+#   python -m benchmarks.executar --cenarios pequeno medio --saida atual.json
+#   python -m benchmarks.executar --cenarios medio --comparar atual.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+from benchmarks import dados_sinteticos
+from utils import calculos, propagacao, storage
+from utils.busca import insumos as indice_busca
+from utils.cache import tabelas as cache_tabelas
+from utils.nav import MENU_PAGES
+from utils.paginas import RegistroPaginas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CENARIOS = {
+    "pequeno": {"compras": 1_000, "insumos": 5_000, "fichas": 2_000},
+    "medio": {"compras": 50_000, "insumos": 5_000, "fichas": 2_000},
+    "grande": {"compras": 500_000, "insumos": 5_000, "fichas": 2_000},
+}
+TABELAS = ["compras_insumos", "insumos_ativos", "unidades_medida", "fichas_tecnicas"]
+FATORES_UNIDADES = {codigo: float(qtde) for codigo, _, qtde in storage.UNIDADES_PADRAO}
+
+# Mediana atual / mediana de referência acima disso é apontada como regressão
+LIMIAR_REGRESSAO = 1.25
+
+
+def medir(funcao, repeticoes: int, preparar=None) -> dict:
+    """Executa 'funcao' N vezes (chamando 'preparar' antes de cada uma, fora do tempo) e resume os tempos em ms."""
+    tempos = []
+    for i in range(repeticoes):
+        if preparar is not None:
+            preparar(i)
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append((time.perf_counter() - inicio) * 1000.0)
+    tempos = np.asarray(tempos)
+    return {
+        "repeticoes": repeticoes,
+        "min_ms": round(float(tempos.min()), 3),
+        "mediana_ms": round(float(np.median(tempos)), 3),
+        "p95_ms": round(float(np.percentile(tempos, 95)), 3),
+        "media_ms": round(float(tempos.mean()), 3),
+    }
+
+
+def _compra(insumo: dict, i: int) -> dict:
+    """Compra nova (datada de hoje) para um insumo existente, como o formulário da página 01 grava."""
+    quantidade, valor, frete, perda = 2.0, round(40.0 + i % 7, 2), 0.0, 5.0
+    qtde_para_custos = quantidade * FATORES_UNIDADES.get(insumo["un_med"], 1.0)
+    return {
+        "quantidade_compra": quantidade, "qtde_para_custos": qtde_para_custos, "valor_total_compra": valor,
+        "valor_frete": frete, "percentual_perda": perda,
+        **calculos.colunas_derivadas(quantidade, qtde_para_custos, valor, frete, perda),
+        "data_compra": date.today().strftime("%d/%m/%Y"), "grupo": insumo["grupo"], "insumo_resumo": insumo["insumo_resumo"],
+        "insumo_completo": insumo["insumo_resumo"], "marca": "", "tipo": "Comprado", "un_med": insumo["un_med"],
+        "fornecedor": "Fornecedor 001", "documento": f"BENCH {i:05d}",
+        "atualizado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def salvar_insumo_ativo(compra: dict):
+    """O que o botão de salvar da página 01 faz (lá é uma função interna de run_page)."""
+    ativo_mudou = storage.registrar_compra(compra)
+    indice_busca.adicionar(compra)
+    if ativo_mudou:
+        propagacao.propagar_insumos([compra["insumo_resumo"]])
+
+
+def executar_cenario(pasta: str, nome: str, compras: int, insumos: int, fichas: int, repeticoes: int = 20) -> dict:
+    """Gera os dados do cenário em 'pasta', abre um banco novo sobre eles e mede cada operação."""
+    resultados = {}
+    banco = os.path.join(pasta, "fichapp.db")
+    for arquivo in (banco, banco + "-wal", banco + "-shm"):
+        if os.path.exists(arquivo):
+            os.remove(arquivo)  # execução anterior com --pasta: a importação precisa partir do zero
+
+    inicio = time.perf_counter()
+    linhas = dados_sinteticos.gerar(pasta, compras=compras, insumos=insumos, fichas=fichas)
+    geracao_s = time.perf_counter() - inicio
+
+    # Banco novo: a primeira conexão importa os CSVs e roda as migrações
+    storage.usar_banco(banco)
+    cache_tabelas.invalidar()
+    resultados["importacao_inicial"] = medir(lambda _: storage.versao_tabela("compras_insumos"), 1)
+
+    pagina_fichas = RegistroPaginas(MENU_PAGES, pasta=RAIZ).modulo("04_Ficha_Tecnica_Cozinha.py")
+    carregar_tabela, proximo_codigo_interno = pagina_fichas.carregar_tabela, pagina_fichas.proximo_codigo_interno
+
+    # carregar_tabela: leitura completa (cache vazio) e leitura pelo cache com a versão inalterada
+    for tabela in TABELAS:
+        resultados[f"carregar_tabela[{tabela}]/frio"] = medir(
+            lambda _: carregar_tabela(tabela), max(3, repeticoes // 4), preparar=lambda _: cache_tabelas.invalidar(tabela))
+        resultados[f"carregar_tabela[{tabela}]/quente"] = medir(lambda _: carregar_tabela(tabela), repeticoes * 5)
+
+    # Filtros do relatório de insumos ativos (contagem + primeira página, como na página 01)
+    grupos, fornecedores = storage.opcoes_filtros_ativos()
+    resultados["relatorio/opcoes_filtros"] = medir(lambda _: storage.opcoes_filtros_ativos(), repeticoes)
+    filtros = {
+        "sem_filtro": {},
+        "grupo": {"grupo": grupos[0]} if grupos else {},
+        "fornecedor": {"fornecedor": fornecedores[0]} if fornecedores else {},
+    }
+    indice_busca.buscar("salmao")  # constrói o índice fora da medição
+    resultados["relatorio/busca_texto"] = medir(lambda _: indice_busca.buscar("salmao"), repeticoes)
+    filtros["busca_texto"] = {"insumos": indice_busca.buscar("salmao")}
+    for rotulo, filtro in filtros.items():
+        resultados[f"relatorio/{rotulo}"] = medir(
+            lambda _: (storage.contar_ativos(**filtro), storage.consultar_ativos(**filtro, ordenar_por="custo_unit_ativo", limite=50)),
+            repeticoes)
+
+    # proximo_codigo_interno: com o cache da tabela de fichas quente e logo após uma escrita
+    resultados["proximo_codigo_interno/quente"] = medir(lambda _: proximo_codigo_interno("Uramaki"), repeticoes * 5)
+    resultados["proximo_codigo_interno/frio"] = medir(
+        lambda _: proximo_codigo_interno("Uramaki"), max(3, repeticoes // 4), preparar=lambda _: cache_tabelas.invalidar("fichas_tecnicas"))
+
+    # salvar_insumo_ativo: compras novas para os insumos mais usados nas fichas (pior caso da propagação)
+    ativos = carregar_tabela("insumos_ativos").set_index("insumo_resumo", drop=False)
+    usados = carregar_tabela("ficha_ingredientes")["insumo"].value_counts().index
+    alvos = ativos.loc[usados[usados.isin(ativos.index)][:repeticoes]].to_dict("records")
+    resultados["registrar_compra"] = medir(lambda i: storage.registrar_compra(_compra(alvos[i % len(alvos)], i)), repeticoes)
+    resultados["salvar_insumo_ativo"] = medir(lambda i: salvar_insumo_ativo(_compra(alvos[i % len(alvos)], repeticoes + i)), repeticoes)
+
+    # Salvar ficha: cabeçalho + ingredientes + custo da ficha nova (como o botão da página 04)
+    ingredientes = [{"insumo": a["insumo_resumo"], "quantidade": 1.0, "unidade": a["un_med"], "obs": ""} for a in alvos[:8]]
+
+    def salvar_ficha(i):
+        ficha_id = storage.salvar_ficha({
+            "nome_prato": f"Bench {i:04d}", "codigo_interno": f"14{900 + i}", "categoria": "Uramaki",
+            "rendimento_total": 1.0, "responsavel": "Benchmark", "atualizado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }, ingredientes)
+        propagacao.atualizar_fichas([ficha_id])
+
+    resultados["salvar_ficha"] = medir(salvar_ficha, repeticoes)
+
+    return {
+        "nome": nome,
+        "tamanhos": {"compras": compras, "insumos": insumos, "fichas": fichas},
+        "linhas_geradas": linhas,
+        "geracao_s": round(geracao_s, 3),
+        "resultados": resultados,
+    }
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual: dict, referencia: dict, limiar: float = LIMIAR_REGRESSAO) -> list[dict]:
+    """Razão entre as medianas de cada operação presente nos dois relatórios (mesmo cenário)."""
+    base = {(c["nome"], op): r["mediana_ms"] for c in referencia["cenarios"] for op, r in c["resultados"].items()}
+    linhas = []
+    for cenario in atual["cenarios"]:
+        for op, r in cenario["resultados"].items():
+            anterior = base.get((cenario["nome"], op))
+            if anterior:
+                razao = r["mediana_ms"] / anterior
+                linhas.append({"cenario": cenario["nome"], "operacao": op, "referencia_ms": anterior,
+                               "atual_ms": r["mediana_ms"], "razao": round(razao, 3), "regressao": razao > limiar})
+    return linhas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos de dados do FichApp (resultado em JSON)")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=["pequeno"])
+    parser.add_argument("--compras", type=int, help="cenário personalizado: número de compras")
+    parser.add_argument("--insumos", type=int, default=5_000)
+    parser.add_argument("--fichas", type=int, default=2_000)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--pasta", help="mantém os CSVs e bancos gerados nesta pasta (padrão: pasta temporária apagada ao final)")
+    parser.add_argument("--saida", help="grava o JSON neste arquivo (padrão: saída padrão)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior; sai com código 1 se houver regressão")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_REGRESSAO, help="razão entre medianas considerada regressão")
+    args = parser.parse_args(argv)
+
+    cenarios = {"personalizado": {"compras": args.compras, "insumos": args.insumos, "fichas": args.fichas}} if args.compras \
+        else {n: CENARIOS[n] for n in args.cenarios}
+    with open(os.path.join(RAIZ, "version.json"), encoding="utf-8") as f:
+        versao = json.load(f).get("version")
+    relatorio = {
+        "versao": versao, "commit": _commit(), "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0], "plataforma": platform.platform(),
+        "cenarios": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="fichapp_bench_") as temporaria:
+        for nome, tamanhos in cenarios.items():
+            pasta = os.path.join(args.pasta or temporaria, nome)
+            relatorio["cenarios"].append(executar_cenario(pasta, nome, repeticoes=args.repeticoes, **tamanhos))
+
+    regressoes = []
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            relatorio["comparacao"] = comparar(relatorio, json.load(f), args.limiar)
+        regressoes = [c for c in relatorio["comparacao"] if c["regressao"]]
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    for c in regressoes:
+        print(f"REGRESSÃO {c['cenario']}/{c['operacao']}: {c['referencia_ms']} ms -> {c['atual_ms']} ms (x{c['razao']})", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# benchmarks/verificacoes.py - VERIFICAÇÕES DE REGRESSÃO DOS CAMINHOS DE DADOS
+
+# =========================================================
+# FichApp - Cenários pequenos em bancos temporários, conferidos contra a entrada
+# =========================================================
+# Cada verificação monta um banco novo numa pasta temporária, executa o caminho
+# real do app e compara o que ficou gravado com o que entrou. Falhas saem com
+# código 1 (útil antes de comparar benchmarks entre versões).
+#
+# Uso (na raiz do projeto): python -m benchmarks.verificacoes
+import io
+import os
+import sys
+import tempfile
+from datetime import date
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import dados_sinteticos
+from utils import historico_vendas, planilha, propagacao, storage, vendas
+from utils.precificacao import LUCRO, PARAMETROS_PRECO
+from utils.simulacao import simular
+
+
+def _banco_temporario(pasta: str):
+    storage.usar_banco(os.path.join(pasta, "fichapp.db"))
+
+
+def verificar_importacao_vendas_em_blocos():
+    """Vendas lidas em vários blocos: o total gravado é o total do arquivo."""
+    with tempfile.TemporaryDirectory() as pasta:
+        _banco_temporario(pasta)
+        ids = [storage.salvar_ficha({"nome_prato": f"Prato {i}", "codigo_interno": f"21{i:02d}", "codigo_pdv": str(700 + i),
+                                     "categoria": "Porção", "rendimento_total": 1.0}, []) for i in range(3)]
+        linhas = ["codigo;quantidade;valor_total;data"]
+        esperado = {fid: 0.0 for fid in ids}
+        for i in range(12):
+            codigo = 700 + i % 4  # o código 703 não tem ficha
+            linhas.append(f"{codigo};{1 + i % 2};{10 * (1 + i % 2)},00;{1 + i:02d}/01/2025")
+            if i % 4 < 3:
+                esperado[ids[i % 4]] += 1 + i % 2
+        resumo = vendas.importar_vendas(io.BytesIO("\n".join(linhas).encode()), nome_arquivo="blocos.csv", tamanho_bloco=4)
+        gravado = vendas.vendas_periodo(date(2025, 1, 1), date(2025, 1, 31)).set_index("ficha_id")["quantidade"].to_dict()
+        assert resumo["linhas"] == 12 and resumo["linhas_sem_ficha"] == 3, resumo
+        assert gravado == esperado, f"quantidades gravadas {gravado} != arquivo {esperado}"
+
+
+def verificar_planilha_reenviada():
+    """A mesma planilha gravada duas vezes: a segunda vez não grava nada; linhas iguais no arquivo valem cada uma."""
+    with tempfile.TemporaryDirectory() as pasta:
+        _banco_temporario(pasta)
+        texto = ("insumo;unidade;quantidade;valor total;data\n"
+                 "Arroz;KG;5;50,00;01/02/2025\nArroz;KG;5;50,00;01/02/2025\nSal;KG;1;3,50;01/02/2025\n")
+        validas, _ = planilha.validar(planilha.ler_planilha(io.BytesIO(texto.encode()), "compras.csv"), storage.ler_tabela("unidades_medida"))
+        primeira = planilha.importar_compras(validas)
+        segunda = planilha.importar_compras(validas)
+        with storage.conectar() as conn:
+            gravadas = conn.execute("SELECT COUNT(*) FROM compras_insumos").fetchone()[0]
+        assert primeira["gravadas"] == 3 and segunda == {"gravadas": 0, "ja_importadas": 3, "insumos_alterados": []}, (primeira, segunda)
+        assert gravadas == 3, f"{gravadas} compras no histórico, esperado 3"
+
+
+def verificar_reimportacao_csv_compactado():
+    """importar --forcar depois de compactar: o CSV exportado não duplica compras, fichas nem o resumo da home."""
+    with tempfile.TemporaryDirectory() as pasta:
+        dados_sinteticos.gerar(pasta, compras=300, insumos=50, fichas=10)
+        _banco_temporario(pasta)
+        storage.compactar()
+        with storage.conectar() as conn:
+            antes = conn.execute("SELECT (SELECT COUNT(*) FROM compras_insumos), (SELECT COUNT(*) FROM fichas_tecnicas)").fetchone()
+            importados = storage.importar_csvs(conn, pasta)
+            depois = conn.execute("SELECT (SELECT COUNT(*) FROM compras_insumos), (SELECT COUNT(*) FROM fichas_tecnicas)").fetchone()
+            ativos = conn.execute("SELECT COUNT(*), ROUND(SUM(custo_unit_ativo), 6) FROM insumos_ativos").fetchone()
+            resumo = conn.execute("SELECT insumos, ROUND(soma_custo, 6) FROM resumo_painel").fetchone()
+        assert antes == depois == (300, 10), f"antes {antes}, depois {depois} ({importados})"
+        assert ativos == resumo, f"resumo da home {resumo} != insumos ativos {ativos}"
+
+
+def verificar_categorias_simulador_e_cardapio():
+    """Categoria atual do simulador = categoria da Engenharia do Cardápio; pratos sem venda não contam."""
+    rng = np.random.default_rng(7)
+    n = 40
+    custos = pd.DataFrame({"id": np.arange(1, n + 1), "codigo_interno": "", "nome_prato": "",
+                           "custo_total": rng.uniform(5, 40, n), "custo_porcao": np.nan})
+    quantidade = np.where(rng.random(n) < 0.4, 0.0, rng.integers(1, 200, n)).astype(float)
+    preco = custos["custo_total"].to_numpy() * rng.uniform(1.5, 4.0, n)
+    base = pd.Series(rng.uniform(1, 8, len(PARAMETROS_PRECO)), index=PARAMETROS_PRECO)
+    vendidos = pd.DataFrame({"ficha_id": custos["id"], "quantidade": quantidade, "receita": preco * quantidade})
+
+    cardapio = vendas.classificar_cardapio(vendidos, custos, base.drop(LUCRO).sum()).set_index("ficha_id")["categoria"]
+    resumo, pratos = simular(pd.DataFrame([base]), custos["custo_total"].to_numpy(), preco, base, quantidade)
+    simulador = pd.Series(pratos["categoria_atual"].to_numpy(), index=custos["id"])[quantidade > 0]
+    assert simulador.sort_index().equals(cardapio.sort_index()), "categorias diferentes entre simulador e cardápio"
+    assert (pratos["categoria_atual"][quantidade == 0] == "Sem vendas").all()
+    assert resumo["pratos_mudam_categoria"].iloc[0] == 0, "o cenário igual aos parâmetros atuais mudou categorias"
+
+
+def verificar_custo_unidade_personalizada():
+    """O custo de uma linha de ficha é o da compra, para unidades com qtde_padrao 1, fracionadas e personalizadas."""
+    with tempfile.TemporaryDirectory() as pasta:
+        _banco_temporario(pasta)
+        storage.inserir_linha("unidades_medida", {"codigo": "CXA", "descricao": "Caixa com 12", "qtde_padrao": 12.0})
+        texto = ("insumo;unidade;quantidade;valor total;data\n"
+                 "Lata;CXA;2;240,00;01/02/2025\nOvo;DZ;2;24,00;01/02/2025\n"
+                 "Gergelim;G;500;10,00;01/02/2025\nArroz;KG;5;50,00;01/02/2025\n")
+        validas, erros = planilha.validar(planilha.ler_planilha(io.BytesIO(texto.encode()), "compras.csv"), storage.ler_tabela("unidades_medida"))
+        assert erros.empty, erros
+        planilha.importar_compras(validas)
+        esperado = {  # (insumo, quantidade, unidade da linha) -> custo
+            ("Lata", 1.0, "CXA"): 120.0, ("Ovo", 3.0, "UN"): 3.0, ("Ovo", 1.0, "DZ"): 12.0,
+            ("Gergelim", 100.0, "G"): 2.0, ("Gergelim", 0.1, "KG"): 2.0, ("Arroz", 250.0, "G"): 2.5,
+        }
+        ids = {chave: storage.salvar_ficha({"nome_prato": " ".join(map(str, chave)), "codigo_interno": f"91{i:02d}", "categoria": "Preparo Interno",
+                                            "rendimento_total": 1.0}, [{"insumo": chave[0], "quantidade": chave[1], "unidade": chave[2]}])
+               for i, chave in enumerate(esperado)}
+        custos = propagacao.custos_atuais().set_index("id")["custo_total"]
+        calculado = {chave: round(float(custos[fid]), 6) for chave, fid in ids.items()}
+        assert calculado == esperado, f"custos {calculado} != esperado {esperado}"
+
+
+def verificar_compactacao_interrompida():
+    """Uma compactação que cai depois de gravar o novo segmento não perde nem duplica vendas."""
+    with tempfile.TemporaryDirectory() as pasta:
+        hist = historico_vendas.HistoricoVendas(pasta)
+        for i in range(3):
+            hist.gravar({"ficha_id": [1, 2], "data": [f"2025-01-0{i + 1}"] * 2, "quantidade": [1.0, 2.0], "receita": [1.0, 2.0]}, f"i{i}")
+        total = lambda: float(hist.ler(colunas=("quantidade",))["quantidade"].sum())
+        remover = os.remove
+        chamadas = []
+
+        def cai_na_segunda(caminho):  # apaga um arquivo e o processo "cai" no seguinte
+            chamadas.append(caminho)
+            if len(chamadas) > 1:
+                raise OSError("queda")
+            remover(caminho)
+
+        with mock.patch.object(historico_vendas.os, "remove", side_effect=cai_na_segunda):
+            try:
+                hist.compactar()
+            except OSError:
+                pass
+        assert total() == 9.0, f"após a queda: {total()}"
+        hist.gravar({"ficha_id": [3], "data": ["2025-01-09"], "quantidade": [4.0], "receita": [4.0]}, "i9")
+        hist.compactar()
+        assert total() == 13.0 and len(hist.segmentos("2025-01")) == 1, (total(), hist.segmentos("2025-01"))
+
+
+VERIFICACOES = [
+    verificar_importacao_vendas_em_blocos,
+    verificar_planilha_reenviada,
+    verificar_reimportacao_csv_compactado,
+    verificar_categorias_simulador_e_cardapio,
+    verificar_custo_unidade_personalizada,
+    verificar_compactacao_interrompida,
+]
+
+
+def main() -> int:
+    falhas = 0
+    for verificacao in VERIFICACOES:
+        try:
+            verificacao()
+        except AssertionError as e:
+            falhas += 1
+            print(f"FALHOU {verificacao.__name__}: {e}")
+        else:
+            print(f"ok     {verificacao.__name__}")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,9 @@
 # FichApp - Sistema de controle de fichas técnicas e insumos
 # =========================================================
 import streamlit as st
-from utils.nav import sidebar_menu, MENU_PAGES 
+from utils.nav import sidebar_menu
+from utils import storage
+from utils.paginas import registro as registro_paginas
 import datetime
 import os
 
@@ -50,14 +52,30 @@ def load_page_content(page_key):
         # --- LINHA DE KPIs (INDICADORES CHAVE) ---
         st.subheader("🚀 Indicadores de Produção")
         
+        # Resumo pré-calculado a cada compra/ficha gravada (leitura constante, sem varrer as tabelas)
+        resumo = storage.resumo_painel()
+        moeda = lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        dias = storage.DIAS_TENDENCIA
+        
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric(label="Total de Fichas Criadas", value="24", delta="🚀 +2 Fichas")
+            variacao = resumo["fichas_variacao"]
+            st.metric(label="Total de Fichas Criadas", value=resumo["fichas"],
+                      delta=f"{variacao:+d} em {dias} dias" if variacao else None)
         with col2:
-            st.metric(label="Custo Médio dos Insumos", value="R$ 12,50", delta="🔻 -0.15 R$")
+            variacao, pct = resumo["custo_medio_variacao"], resumo["custo_medio_variacao_pct"]
+            tendencia = None
+            if variacao:
+                tendencia = ("+" if variacao > 0 else "-") + moeda(abs(variacao))
+                tendencia += (f" ({pct:+.1f}%)" if pct is not None else "") + f" em {dias} dias"
+            st.metric(label="Custo Médio dos Insumos", value=moeda(resumo["custo_medio"]), delta=tendencia, delta_color="inverse",
+                      help=f"Média do custo ativo dos {resumo['insumos']} insumo(s); a variação compara com {dias} dias atrás.")
         with col3:
-            st.metric(label="Próxima Reavaliação", value="30 dias", delta="📅 Urgente")
+            desatualizados = resumo["precos_desatualizados"]
+            st.metric(label="Preços Desatualizados", value=f"{desatualizados} insumo(s)",
+                      delta="📅 Reavaliar" if desatualizados else None, delta_color="off",
+                      help=f"Insumos sem compra há mais de {storage.DIAS_PRECO_DESATUALIZADO} dias.")
 
         st.markdown("<br>", unsafe_allow_html=True)
         
@@ -97,16 +115,13 @@ def load_page_content(page_key):
         )
         return
     
-    # === TENTATIVA DE CARREGAMENTO DO ARQUIVO DA PÁGINA (Lógica mantida) ===
-    if filename in MENU_PAGES.values():
+    # === EXECUÇÃO DA PÁGINA (módulo compilado uma vez, recarregado só se o arquivo mudar) ===
+    if filename in registro_paginas:
         try:
-            with open(filename, 'r', encoding='utf-8') as file:
-                code = file.read()
-            
-            exec(code, globals())
+            pagina = registro_paginas.modulo(filename)
             
-            if 'run_page' in globals():
-                globals()['run_page']()
+            if hasattr(pagina, 'run_page'):
+                pagina.run_page()
             else:
                 st.error("Erro: A função 'run_page()' não foi encontrada no arquivo da página.")
         except FileNotFoundError:
@@ -131,6 +146,7 @@ st.set_page_config(
 # =========================================================
 # EXECUÇÃO
 # =========================================================
+storage.iniciar_compactacao()
 sidebar_menu(ativo="home") 
 
 if 'current_page' in st.session_state:
@@ -0,0 +1,115 @@
+# utils/busca.py - ÍNDICE DE BUSCA DE INSUMOS (SEM ACENTOS, POR N-GRAMAS)
+
+# =========================================================
+# FichApp - Busca com custo constante, atualizada a cada compra
+# =========================================================
+import threading
+import unicodedata
+from collections import defaultdict
+
+from utils import storage
+from utils.cache import tabelas as cache_tabelas
+
+COMPRAS = "compras_insumos"
+CAMPOS_BUSCA = ("insumo_resumo", "insumo_completo", "representante", "fornecedor")
+
+
+def dobrar(texto) -> str:
+    """Minúsculas e sem acentos: 'Açúcar' -> 'acucar'."""
+    if texto is None or texto != texto:
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower().strip()
+
+
+def _gramas(texto: str) -> set[str]:
+    """Todos os pedaços de 1 a 3 caracteres do texto (termos curtos também são indexados)."""
+    return {texto[i:i + n] for n in (1, 2, 3) for i in range(len(texto) - n + 1)}
+
+
+class IndiceBusca:
+    """
+    Índice invertido de n-gramas (1 a 3 caracteres) sobre os campos de texto das
+    compras, agrupados por insumo_resumo. Cada termo da busca é resolvido pela
+    interseção das listas dos seus trigramas e confirmado por substring no texto
+    do insumo; todos os termos precisam casar.
+
+    O índice acompanha a versão da tabela de compras: uma compra gravada pelo
+    próprio app é incorporada com adicionar(); qualquer outra mudança faz o
+    índice ser reconstruído na próxima busca.
+    """
+
+    def __init__(self, carregar, versao, campos=CAMPOS_BUSCA, chave="insumo_resumo"):
+        self._carregar = carregar
+        self._versao = versao
+        self._campos = campos
+        self._chave = chave
+        self._textos = defaultdict(set)
+        self._nomes = {}
+        self._postings = defaultdict(set)
+        self._versao_indexada = None
+        self._lock = threading.Lock()
+
+    def _indexar(self, registro: dict):
+        chave = str(registro.get(self._chave) or "").strip()
+        if not chave:
+            return
+        self._nomes.setdefault(chave, dobrar(chave))
+        for campo in self._campos:
+            texto = dobrar(registro.get(campo))
+            if texto and texto not in self._textos[chave]:
+                self._textos[chave].add(texto)
+                for g in _gramas(texto):
+                    self._postings[g].add(chave)
+
+    def _reconstruir(self):
+        self._textos.clear()
+        self._nomes.clear()
+        self._postings.clear()
+        df = self._carregar()
+        if not df.empty:
+            colunas = [c for c in dict.fromkeys((self._chave, *self._campos)) if c in df.columns]
+            for registro in df[colunas].drop_duplicates().to_dict("records"):
+                self._indexar(registro)
+
+    def _sincronizar(self):
+        versao = self._versao()
+        if versao != self._versao_indexada:
+            self._reconstruir()
+            self._versao_indexada = versao
+
+    def adicionar(self, registro: dict):
+        """Incorpora uma compra recém-gravada sem reconstruir o índice."""
+        with self._lock:
+            antiga, nova = self._versao_indexada, self._versao()
+            if antiga is not None and nova[0] == antiga[0] and nova[1] == antiga[1] + 1:
+                self._indexar(registro)
+                self._versao_indexada = nova
+
+    def buscar(self, termo: str) -> list[str]:
+        """
+        Insumos cujo texto contém todos os termos da busca (sem diferenciar acentos).
+        Os que começam pelo primeiro termo vêm primeiro.
+        """
+        termos = dobrar(termo).split()
+        if not termos:
+            return []
+        with self._lock:
+            self._sincronizar()
+            candidatos = None
+            for t in termos:
+                chaves = [t] if len(t) <= 3 else [t[i:i + 3] for i in range(len(t) - 2)]
+                listas = sorted((self._postings.get(g, set()) for g in chaves), key=len)
+                encontrados = set.intersection(*listas) if listas else set()
+                if len(t) > 3:
+                    encontrados = {c for c in encontrados if any(t in texto for texto in self._textos[c])}
+                candidatos = encontrados if candidatos is None else candidatos & encontrados
+                if not candidatos:
+                    return []
+            return sorted(candidatos, key=lambda c: (not self._nomes[c].startswith(termos[0]), self._nomes[c]))
+
+
+insumos = IndiceBusca(
+    lambda: cache_tabelas.ler(COMPRAS),
+    lambda: (storage.DB_PATH, storage.versao_tabela(COMPRAS)),
+)
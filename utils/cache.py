@@ -0,0 +1,68 @@
+# utils/cache.py - CACHE DE TABELAS COM INVALIDAÇÃO POR VERSÃO
+
+# =========================================================
+# FichApp - Cache compartilhado entre sessões, por tabela
+# =========================================================
+import threading
+
+import pandas as pd
+
+from utils import storage
+
+
+class CacheTabelas:
+    """
+    Guarda cada tabela lida do banco junto com a versão em que foi lida.
+    Uma escrita incrementa apenas a versão da tabela tocada; as demais
+    continuam válidas para todas as sessões.
+    """
+
+    def __init__(self, carregar, versao):
+        self._carregar = carregar
+        self._versao = versao
+        self._dados = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def ler(self, tabela: str) -> pd.DataFrame:
+        """Retorna a tabela (compartilhada: não altere o DataFrame in place)."""
+        chave = (storage.DB_PATH, tabela)
+        versao = self._versao(tabela)
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and entrada[0] == versao:
+                self.acertos += 1
+                return entrada[1]
+            self.faltas += 1
+            if entrada is not None:
+                self.descartes += 1
+                del self._dados[chave]
+        df = self._carregar(tabela)
+        with self._lock:
+            self._dados[chave] = (versao, df)
+        return df
+
+    def invalidar(self, tabela: str | None = None):
+        """Descarta uma tabela (ou todas) do cache deste processo."""
+        with self._lock:
+            chaves = [k for k in self._dados if tabela is None or k[1] == tabela]
+            for k in chaves:
+                del self._dados[k]
+            self.descartes += len(chaves)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {
+                "acertos": self.acertos, "faltas": self.faltas, "descartes": self.descartes,
+                "tabelas": sorted(k[1] for k in self._dados),
+            }
+
+
+tabelas = CacheTabelas(storage.ler_tabela, storage.versao_tabela)
+
+
+def carregar_tabela(tabela: str) -> pd.DataFrame:
+    """Lê uma tabela pelo cache compartilhado (recarrega só se a versão mudou)."""
+    return tabelas.ler(tabela)
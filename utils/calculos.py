@@ -0,0 +1,52 @@
+# utils/calculos.py - CÁLCULOS DERIVADOS DAS COMPRAS
+
+# =========================================================
+# FichApp - Fórmulas de custo: um único núcleo para escalares e arrays
+# =========================================================
+# O formulário (pré-visualização e gravação), as importações em lote e o
+# recálculo do histórico usam estas mesmas funções.
+import numpy as np
+
+
+def _dividir(numerador, denominador):
+    numerador = np.asarray(numerador, dtype=float)
+    denominador = np.asarray(denominador, dtype=float)
+    forma = np.broadcast(numerador, denominador).shape
+    return np.divide(numerador, denominador, out=np.zeros(forma), where=denominador > 0)
+
+
+def _saida(valor):
+    """Arrays 0-d (entrada escalar) voltam como float."""
+    return float(valor) if np.ndim(valor) == 0 else valor
+
+
+def qtde_para_custos_auto(un_med, quantidade_compra, fatores: dict):
+    """
+    Quantidade para custos sugerida: quantidade × qtde_padrao da unidade (as
+    unidades inteiras têm fator 1). Aceita um código e uma quantidade ou arrays
+    de mesmo tamanho.
+    """
+    un_med = np.asarray(un_med, dtype=object)
+    fator = np.array([fatores.get(u, 1.0) for u in un_med.ravel()], dtype=float).reshape(un_med.shape)
+    fator = np.where(np.isnan(fator) | (fator <= 0), 1.0, fator)
+    return _saida(np.asarray(quantidade_compra, dtype=float) * fator)
+
+
+def colunas_derivadas(quantidade_compra, qtde_para_custos, valor_total_compra, valor_frete, percentual_perda) -> dict:
+    """
+    Colunas calculadas de compras_insumos, com o mesmo arredondamento gravado pelo
+    formulário de cadastro. Recebe escalares (uma compra, devolve floats) ou
+    arrays (uma posição por compra).
+    """
+    quantidade_compra = np.asarray(quantidade_compra, dtype=float)
+    perda = 1.0 - np.asarray(percentual_perda, dtype=float) / 100.0
+    custo_total_com_frete = np.asarray(valor_total_compra, dtype=float) + np.asarray(valor_frete, dtype=float)
+    quantidade_liquida = np.where(quantidade_compra > 0, quantidade_compra * perda, 0.0)
+    colunas = {
+        "valor_unit_bruto": np.round(_dividir(valor_total_compra, quantidade_compra), 4),
+        "custo_total_com_frete": np.round(custo_total_com_frete, 2),
+        "quantidade_liquida": np.round(quantidade_liquida, 4),
+        "custo_real_unitario": np.round(_dividir(custo_total_com_frete, quantidade_liquida), 6),
+        "valor_unit_para_custos": np.round(_dividir(custo_total_com_frete, np.asarray(qtde_para_custos, dtype=float) * perda), 6),
+    }
+    return {coluna: _saida(valores) for coluna, valores in colunas.items()}
@@ -0,0 +1,103 @@
+# utils/canais.py - PREÇOS POR CANAL DE VENDA (SALÃO, APP, MENUDINO...)
+
+# =========================================================
+# FichApp - Matriz prato × canal com recálculo só do que mudou
+# =========================================================
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.custos import custo_unitario_venda
+from utils.precificacao import LUCRO, PARAMETROS_PRECO, preco_sugerido
+
+# Parâmetros que cada canal define por conta própria
+PARAMETROS_CANAL = ["Taxa Cartão", "Comissão APP", "Cashback Menudino", "Comissão Atendente"]
+METRICAS = {
+    "preco_minimo": "Preço mínimo viável (R$)",
+    "preco_sugerido": "Preço sugerido (R$)",
+    "margem_contribuicao": "Margem de contribuição (R$)",
+}
+
+
+def percentuais_canais(base: pd.Series, perfis: pd.DataFrame) -> pd.DataFrame:
+    """
+    Percentuais completos de cada canal (linhas) nos PARAMETROS_PRECO (colunas):
+    as taxas do perfil do canal substituem as da tabela geral de parâmetros.
+    """
+    if perfis.empty:
+        return pd.DataFrame(columns=PARAMETROS_PRECO, dtype=float)
+    proprios = perfis.pivot_table(index="canal", columns="parametro", values="valor", aggfunc="last")
+    tabela = pd.DataFrame(np.tile(base.reindex(PARAMETROS_PRECO).fillna(0.0).to_numpy(dtype=float), (len(proprios), 1)),
+                          index=proprios.index, columns=PARAMETROS_PRECO)
+    for col in proprios.columns.intersection(PARAMETROS_PRECO):
+        tabela[col] = proprios[col].fillna(tabela[col])
+    return tabela
+
+
+def _bloco(custo: pd.Series, percentuais: pd.DataFrame) -> dict:
+    """Métricas para os pratos × canais informados, em uma conta com broadcasting."""
+    c = custo.to_numpy(dtype=float)[:, None]
+    variaveis = percentuais.drop(columns=[LUCRO]).to_numpy(dtype=float).sum(axis=1)[None, :]
+    total = variaveis + percentuais[LUCRO].to_numpy(dtype=float)[None, :]
+    sugerido = preco_sugerido(c, total)
+    valores = {
+        "preco_minimo": preco_sugerido(c, variaveis),
+        "preco_sugerido": sugerido,
+        "margem_contribuicao": sugerido * (1.0 - variaveis / 100.0) - c,
+    }
+    return {k: pd.DataFrame(v, index=custo.index, columns=percentuais.index) for k, v in valores.items()}
+
+
+def _diferentes(novo: pd.Series | pd.DataFrame, antigo: pd.Series | pd.DataFrame) -> pd.Index:
+    """Rótulos novos ou com valores alterados (NaN igual a NaN)."""
+    comuns = novo.index.intersection(antigo.index)
+    a, b = novo.loc[comuns].to_numpy(dtype=float), antigo.loc[comuns].to_numpy(dtype=float)
+    iguais = np.isclose(a, b, equal_nan=True)
+    if iguais.ndim > 1:
+        iguais = iguais.all(axis=1)
+    return novo.index.difference(antigo.index).append(comuns[~iguais])
+
+
+class MatrizPrecos:
+    """
+    Mantém a última matriz prato × canal. A cada chamada compara custos e perfis
+    com a conta anterior e recalcula apenas as linhas (pratos) e colunas (canais)
+    cujas entradas mudaram. Com os custos gravados (propagacao.custos_atuais), a
+    versão das tabelas de custo diz se algum prato mudou sem comparar linha a linha.
+    """
+
+    def __init__(self):
+        self._custo = pd.Series(dtype=float)
+        self._percentuais = pd.DataFrame(columns=PARAMETROS_PRECO, dtype=float)
+        self._matrizes = {}
+        self._versao = None
+        self._lock = threading.Lock()
+        self.recalculos = {"pratos": 0, "canais": 0}
+
+    def calcular(self, custos: pd.DataFrame, percentuais: pd.DataFrame) -> dict:
+        """Dict métrica -> DataFrame (índice = id da ficha, colunas = canais)."""
+        custo = pd.Series(custo_unitario_venda(custos), index=custos["id"].to_numpy(), dtype=float)
+        versao = custos.attrs.get("versao")
+        with self._lock:
+            if not self._matrizes:
+                pratos, canais = custo.index, percentuais.index
+                matrizes = _bloco(custo, percentuais)
+            else:
+                pratos = custo.index[:0] if versao is not None and versao == self._versao else _diferentes(custo, self._custo)
+                canais = _diferentes(percentuais, self._percentuais)
+                matrizes = {k: m.reindex(index=custo.index, columns=percentuais.index) for k, m in self._matrizes.items()}
+                if len(pratos):
+                    for k, m in _bloco(custo.loc[pratos], percentuais).items():
+                        matrizes[k].loc[pratos, :] = m
+                if len(canais):
+                    for k, m in _bloco(custo, percentuais.loc[canais]).items():
+                        matrizes[k].loc[:, canais] = m
+
+            self.recalculos["pratos"] += len(pratos)
+            self.recalculos["canais"] += len(canais)
+            self._custo, self._percentuais, self._matrizes, self._versao = custo, percentuais.copy(), matrizes, versao
+            return {k: m.copy() for k, m in matrizes.items()}
+
+
+matriz = MatrizPrecos()
@@ -0,0 +1,129 @@
+# utils/catalogo.py - CATÁLOGO DE INSUMOS PARA AS FICHAS TÉCNICAS
+
+# =========================================================
+# FichApp - Lista única de insumos + autocompletar por prefixo
+# =========================================================
+import difflib
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from utils import storage
+from utils.busca import dobrar
+from utils.cache import tabelas as cache_tabelas
+
+ATIVOS = "insumos_ativos"
+PRODUZIDOS = "insumos_produzidos"
+
+# Busca aproximada (erros de digitação): só para termos com este tamanho mínimo e
+# só entre os nomes que mais compartilham trigramas com o termo
+MIN_TERMO_APROXIMADO = 3
+CANDIDATOS_APROXIMADOS = 200
+
+
+def _trigramas(texto: str) -> set[str]:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class CatalogoInsumos:
+    """
+    Insumos disponíveis para as fichas (um por nome, com a unidade da última
+    compra) mais as preparações da casa. É montado uma vez por versão das
+    tabelas (conferida em atualizar()) e consultado por prefixo em listas
+    ordenadas (bisect): pelo início do nome e pelo início de qualquer palavra
+    do nome, sem acentos. A busca aproximada compara o termo só com os nomes
+    que compartilham trigramas com ele (índice invertido montado junto).
+    """
+
+    def __init__(self):
+        self._versao = None
+        self._unidades = {}
+        self._nomes = []
+        self._por_nome = []      # (nome dobrado, nome)
+        self._por_palavra = []   # (palavra dobrada, nome)
+        self._trigramas = {}     # trigrama -> posições em _por_nome
+        self._lock = threading.Lock()
+
+    def atualizar(self):
+        """Confere a versão das tabelas (uma vez por execução da página) e remonta se mudou."""
+        with self._lock:
+            self._montar()
+
+    def _montar(self):
+        versao = (storage.DB_PATH, storage.versao_tabela(ATIVOS), storage.versao_tabela(PRODUZIDOS))
+        if versao == self._versao:
+            return
+        unidades = {}
+        ativos = cache_tabelas.ler(ATIVOS)
+        if not ativos.empty:
+            for nome, un in zip(ativos["insumo_resumo"].astype(str).str.strip(), ativos["un_med"].fillna("").astype(str).str.strip()):
+                if nome:
+                    unidades.setdefault(nome, un)
+        for nome in cache_tabelas.ler(PRODUZIDOS).get("insumo_resumo", []):
+            unidades.setdefault(str(nome).strip(), "")
+
+        self._unidades = unidades
+        self._por_nome = sorted((dobrar(n), n) for n in unidades)
+        self._nomes = [n for _, n in self._por_nome]
+        self._por_palavra = sorted({(p, n) for d, n in self._por_nome for p in d.split()})
+        trigramas = defaultdict(list)
+        for i, (d, _) in enumerate(self._por_nome):
+            for g in _trigramas(d):
+                trigramas[g].append(i)
+        self._trigramas = dict(trigramas)
+        self._versao = versao
+
+    def nomes(self) -> list[str]:
+        with self._lock:
+            if self._versao is None:
+                self._montar()
+            return self._nomes
+
+    def unidade(self, nome: str) -> str:
+        with self._lock:
+            if self._versao is None:
+                self._montar()
+            return self._unidades.get(nome, "")
+
+    @staticmethod
+    def _com_prefixo(indice: list, prefixo: str, limite: int) -> list[str]:
+        achados = []
+        i = bisect_left(indice, (prefixo,))
+        while i < len(indice) and indice[i][0].startswith(prefixo) and len(achados) < limite:
+            achados.append(indice[i][1])
+            i += 1
+        return achados
+
+    def sugerir(self, termo: str, limite: int = 30) -> list[str]:
+        """
+        Até 'limite' insumos para o termo digitado: primeiro os que começam pelo
+        termo, depois os que têm alguma palavra começando por ele e, se ainda
+        faltar, os nomes mais parecidos (erros de digitação).
+        """
+        with self._lock:
+            if self._versao is None:
+                self._montar()
+            termo = dobrar(termo)
+            if not termo:
+                return self._nomes[:limite]
+            sugestoes = dict.fromkeys(self._com_prefixo(self._por_nome, termo, limite))
+            palavras = termo.split()
+            if len(sugestoes) < limite and len(palavras) == 1:
+                for nome in self._com_prefixo(self._por_palavra, termo, limite * 2):
+                    sugestoes.setdefault(nome)
+            if len(sugestoes) < limite and len(termo) >= MIN_TERMO_APROXIMADO:
+                for nome in self._aproximados(termo, limite - len(sugestoes)):
+                    sugestoes.setdefault(nome)
+            return list(sugestoes)[:limite]
+
+    def _aproximados(self, termo: str, limite: int) -> list[str]:
+        """Nomes parecidos com o termo (difflib), entre os que mais compartilham trigramas com ele."""
+        comuns = Counter()
+        for g in _trigramas(termo):
+            comuns.update(self._trigramas.get(g, ()))
+        candidatos = [self._por_nome[i] for i, _ in comuns.most_common(CANDIDATOS_APROXIMADOS)]
+        por_dobrado = dict(candidatos)
+        return [por_dobrado[d] for d in difflib.get_close_matches(termo, list(por_dobrado), n=limite, cutoff=0.6)]
+
+
+insumos = CatalogoInsumos()
@@ -0,0 +1,165 @@
+# utils/custo_historico.py - CUSTO DAS FICHAS EM DATAS PASSADAS E CMV DO PERÍODO
+
+# =========================================================
+# FichApp - Preço vigente por data (merge_asof) + custos dia × ficha em lote
+# =========================================================
+import numpy as np
+import pandas as pd
+
+from utils import storage, vendas
+from utils.cache import tabelas as cache_tabelas
+from utils.custos import converter_quantidades
+from utils.precos import JANELA_COMPRAS, JANELA_DIAS
+from utils.unidades import conversor as conversor_unidades
+
+
+def precos_vigentes(compras: pd.DataFrame, ativos: pd.DataFrame, metodo: str = "ultimo") -> pd.DataFrame:
+    """
+    Uma linha por (insumo, data de compra) com o custo unitário que passa a
+    valer naquela data pelo método escolhido (mesmas regras de utils/precos.py,
+    calculadas de uma vez com somas acumuladas e janelas móveis por insumo).
+    Só entram compras na unidade atual do insumo.
+    """
+    df = compras[["insumo_resumo", "un_med", "data_compra", "valor_unit_para_custos", "qtde_para_custos", "percentual_perda"]].copy()
+    distintas = pd.Series(df["data_compra"].dropna().unique())  # poucas datas distintas: converte só essas
+    df["data"] = df["data_compra"].map(dict(zip(distintas, pd.to_datetime(distintas, format="%d/%m/%Y", errors="coerce")))).astype("datetime64[ns]")
+    df = df[df["data"].notna() & (df["insumo_resumo"].fillna("") != "")]
+    un_atual = ativos.drop_duplicates(subset=["insumo_resumo"], keep="last").set_index("insumo_resumo")["un_med"]
+    df = df[df["un_med"] == df["insumo_resumo"].map(un_atual).fillna(df["un_med"])]
+    df = df.rename(columns={"insumo_resumo": "insumo"}).sort_values(["insumo", "data"], kind="stable").reset_index(drop=True)
+
+    preco = df["valor_unit_para_custos"].fillna(0.0)
+    peso = (df["qtde_para_custos"].fillna(0.0) * (1.0 - df["percentual_perda"].fillna(0.0) / 100.0)).clip(lower=0.0)
+    df["valor"], df["peso"] = preco * peso, peso
+    grupos = df.groupby("insumo", sort=False)
+
+    if metodo == "ultimo":
+        df["preco"] = preco
+    else:
+        if metodo == "medio":
+            valor, soma_peso = grupos["valor"].cumsum(), grupos["peso"].cumsum()
+        elif metodo == "ultimas_compras":
+            valor = grupos["valor"].rolling(JANELA_COMPRAS, min_periods=1).sum().reset_index(level=0, drop=True)
+            soma_peso = grupos["peso"].rolling(JANELA_COMPRAS, min_periods=1).sum().reset_index(level=0, drop=True)
+        elif metodo == "ultimos_dias":
+            por_data = df.set_index("data").groupby("insumo", sort=False)
+            janela = f"{JANELA_DIAS + 1}D"
+            valor = pd.Series(por_data["valor"].rolling(janela).sum().to_numpy(), index=df.index)
+            soma_peso = pd.Series(por_data["peso"].rolling(janela).sum().to_numpy(), index=df.index)
+        else:
+            raise ValueError(f"Método de custo desconhecido: {metodo}")
+        df["preco"] = np.where(soma_peso > 0, valor / soma_peso.where(soma_peso > 0, 1.0), preco)
+
+    # Várias compras no mesmo dia: vale o estado depois da última
+    return df.drop_duplicates(subset=["insumo", "data"], keep="last")[["insumo", "data", "preco"]].sort_values("data", kind="stable")
+
+
+def custos_no_periodo(fichas: pd.DataFrame, ingredientes: pd.DataFrame, compras: pd.DataFrame, ativos: pd.DataFrame,
+                      produzidos: pd.DataFrame | None, inicio, fim, conversor=None, metodo: str = "ultimo") -> pd.DataFrame:
+    """
+    Custo total de cada ficha (colunas = id) em cada dia de [inicio, fim]
+    (linhas). O preço de cada insumo em cada dia é o da última compra até
+    aquela data (merge_asof); as linhas das fichas são somadas em lote sobre a
+    matriz dia × insumo. Preparações da casa usam o custo da própria ficha no
+    mesmo dia. Insumos sem compra até a data entram com custo zero.
+    """
+    datas = pd.date_range(pd.Timestamp(inicio).normalize(), pd.Timestamp(fim).normalize(), freq="D").astype("datetime64[ns]")
+    ids = fichas["id"].to_numpy()
+    if len(datas) == 0 or len(ids) == 0:
+        return pd.DataFrame(index=datas, columns=ids, dtype=float)
+
+    linhas = ingredientes[ingredientes["ficha_id"].isin(ids)]
+    linhas = converter_quantidades(linhas, ativos, conversor)
+    linhas = linhas.assign(quantidade=pd.to_numeric(linhas["quantidade"], errors="coerce").fillna(0.0))
+    insumos = pd.Index(pd.unique(linhas["insumo"].astype(str)))
+
+    # Matriz dia × insumo com o preço vigente
+    grade = pd.DataFrame({"data": np.repeat(datas.to_numpy(), len(insumos)), "insumo": np.tile(insumos.to_numpy(), len(datas))})
+    vigentes = precos_vigentes(compras, ativos, metodo)
+    vigentes = vigentes[vigentes["insumo"].isin(insumos)]
+    grade = pd.merge_asof(grade, vigentes, on="data", by="insumo", direction="backward")
+    precos = grade["preco"].fillna(0.0).to_numpy(dtype=float).reshape(len(datas), len(insumos)).copy()
+
+    # Linhas ordenadas por ficha: custo dia × ficha = soma por blocos (reduceat) de preço × quantidade
+    posicao_ficha = pd.Index(ids).get_indexer(linhas["ficha_id"])
+    ordem = np.argsort(posicao_ficha, kind="stable")
+    posicao_ficha = posicao_ficha[ordem]
+    posicao_insumo = insumos.get_indexer(linhas["insumo"].astype(str))[ordem]
+    quantidade = linhas["quantidade"].to_numpy(dtype=float)[ordem]
+    com_linhas, inicios = np.unique(posicao_ficha, return_index=True)
+
+    # Preparações da casa: custo da ficha / rendimento, resolvido por iteração até estabilizar
+    rendimentos = pd.to_numeric(fichas["rendimento_total"], errors="coerce").to_numpy(dtype=float)
+    producao = []
+    if produzidos is not None and not produzidos.empty:
+        for nome, fid in zip(produzidos["insumo_resumo"], produzidos["ficha_id"]):
+            i, f = insumos.get_indexer([nome])[0], pd.Index(ids).get_indexer([fid])[0]
+            if i >= 0 and f >= 0:
+                producao.append((i, f))
+
+    custos = np.zeros((len(datas), len(ids)))
+    for _ in range(len(producao) + 1):
+        if len(quantidade):
+            custos[:, com_linhas] = np.add.reduceat(precos[:, posicao_insumo] * quantidade, inicios, axis=1)
+        if not producao:
+            break
+        mudou = False
+        for i, f in producao:
+            novo = custos[:, f] / rendimentos[f] if rendimentos[f] > 0 else np.zeros(len(datas))
+            if not np.allclose(novo, precos[:, i]):
+                precos[:, i], mudou = novo, True
+        if not mudou:
+            break
+    return pd.DataFrame(custos, index=datas, columns=ids)
+
+
+def custos_por_unidade_vendida(custos: pd.DataFrame, fichas: pd.DataFrame) -> pd.DataFrame:
+    """Custo por porção (custo total quando a ficha não tem rendimento), como em custos.custo_unitario_venda."""
+    rendimento = pd.to_numeric(fichas.set_index("id")["rendimento_total"], errors="coerce").reindex(custos.columns).to_numpy(dtype=float)
+    divisor = np.where(rendimento > 0, rendimento, 1.0)
+    return custos / divisor[None, :]
+
+
+def cmv(custos_unitarios: pd.DataFrame, dados_vendas: dict, por: str = "mes") -> pd.DataFrame:
+    """
+    CMV do período: cada linha de venda é custeada pelo custo da ficha no dia
+    da venda (consulta direta na matriz dia × ficha) e agregada por mês ou por
+    ficha, ao lado da receita.
+    """
+    datas = custos_unitarios.index
+    dia = (dados_vendas["data"].astype("datetime64[D]") - np.datetime64(datas[0].date(), "D")).astype(np.int64) if len(datas) else np.empty(0, dtype=np.int64)
+    coluna = custos_unitarios.columns.get_indexer(dados_vendas["ficha_id"])
+    validas = (dia >= 0) & (dia < len(datas)) & (coluna >= 0)
+    custo = np.zeros(len(dia))
+    custo[validas] = custos_unitarios.to_numpy(dtype=float)[dia[validas], coluna[validas]] * dados_vendas["quantidade"][validas]
+
+    chave = (dados_vendas["data"].astype("datetime64[M]").astype(str) if por == "mes" else dados_vendas["ficha_id"])
+    grupos, posicao = np.unique(chave, return_inverse=True)
+    resultado = pd.DataFrame({
+        por: grupos,
+        "quantidade": np.bincount(posicao, weights=dados_vendas["quantidade"], minlength=len(grupos)),
+        "receita": np.bincount(posicao, weights=dados_vendas["receita"], minlength=len(grupos)),
+        "cmv": np.bincount(posicao, weights=custo, minlength=len(grupos)),
+        "linhas_sem_custo": np.bincount(posicao, weights=~validas, minlength=len(grupos)).astype(int),
+    })
+    resultado["cmv_percentual"] = np.where(resultado["receita"] > 0, resultado["cmv"] / resultado["receita"].where(resultado["receita"] > 0, 1.0) * 100.0, np.nan)
+    return resultado
+
+
+# =========================================================
+# CONSULTAS A PARTIR DO BANCO
+# =========================================================
+def custos_historicos(inicio, fim) -> pd.DataFrame:
+    """custos_no_periodo com as tabelas atuais, a conversão de unidades e o método de custo em uso."""
+    return custos_no_periodo(
+        cache_tabelas.ler("fichas_tecnicas"), cache_tabelas.ler("ficha_ingredientes"), cache_tabelas.ler("compras_insumos"),
+        cache_tabelas.ler("insumos_ativos"), cache_tabelas.ler("insumos_produzidos"), inicio, fim,
+        conversor_unidades(), storage.metodo_custo(),
+    )
+
+
+def cmv_periodo(inicio, fim, por: str = "mes") -> pd.DataFrame:
+    """CMV e receita do período com os custos de cada dia de venda."""
+    custos = custos_por_unidade_vendida(custos_historicos(inicio, fim), cache_tabelas.ler("fichas_tecnicas"))
+    dados = vendas.historico().ler(inicio, fim, colunas=("ficha_id", "data", "quantidade", "receita"))
+    return cmv(custos, dados, por)
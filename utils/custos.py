@@ -0,0 +1,136 @@
+# utils/custos.py - MOTOR DE CUSTEIO DAS FICHAS TÉCNICAS
+
+# =========================================================
+# FichApp - Custo de todas as fichas em um único passo vetorizado
+# =========================================================
+import numpy as np
+import pandas as pd
+
+
+def _precos_base(ativos: pd.DataFrame) -> pd.Series:
+    """Custo unitário ativo indexado pelo nome do insumo."""
+    precos = ativos.drop_duplicates(subset=["insumo_resumo"], keep="last")
+    return pd.Series(
+        pd.to_numeric(precos["custo_unit_ativo"], errors="coerce").to_numpy(dtype=float),
+        index=precos["insumo_resumo"].to_numpy(), dtype=float,
+    )
+
+
+def converter_quantidades(ingredientes: pd.DataFrame, ativos: pd.DataFrame, conversor) -> pd.DataFrame:
+    """
+    Leva a quantidade de cada linha para a unidade de custo do insumo (ex.: 200 G
+    de um insumo custeado por KG -> 0.2). Linhas com unidade incompatível ficam
+    com quantidade NaN e marcadas em 'unidade_incompativel' (contam como sem custo).
+    """
+    if conversor is None or "un_med" not in ativos.columns or ingredientes.empty:
+        return ingredientes
+    un_med = ativos.drop_duplicates(subset=["insumo_resumo"], keep="last").set_index("insumo_resumo")["un_med"]
+    fator = conversor.fatores_para_custo(ingredientes["unidade"].to_numpy(), ingredientes["insumo"].map(un_med).to_numpy())
+    return ingredientes.assign(
+        quantidade=pd.to_numeric(ingredientes["quantidade"], errors="coerce").to_numpy(dtype=float) * fator,
+        unidade_incompativel=np.isnan(fator),
+    )
+
+
+def custos_subreceitas(fichas: pd.DataFrame, ingredientes: pd.DataFrame, precos: pd.Series,
+                       produzidos: pd.DataFrame) -> tuple[dict, list]:
+    """
+    Custo unitário dos insumos "Produzido no restaurante" que apontam para uma ficha:
+    custo da ficha / rendimento_total, resolvido recursivamente (sub-receitas dentro de
+    sub-receitas). Cada preparação é custeada uma única vez (memoização) e ciclos são
+    detectados: os insumos envolvidos ficam sem custo e o ciclo é devolvido.
+    """
+    if produzidos is None or produzidos.empty:
+        return {}, []
+
+    ficha_do_insumo = dict(zip(produzidos["insumo_resumo"], produzidos["ficha_id"]))
+    rendimentos = dict(zip(fichas["id"], pd.to_numeric(fichas["rendimento_total"], errors="coerce")))
+    usadas = ingredientes[ingredientes["ficha_id"].isin(set(ficha_do_insumo.values()))]
+    linhas_por_ficha = {
+        fid: list(zip(g["insumo"], pd.to_numeric(g["quantidade"], errors="coerce").fillna(0.0)))
+        for fid, g in usadas.groupby("ficha_id")
+    }
+
+    memo, ciclos, caminho = {}, [], []
+
+    def custo_insumo(nome):
+        if nome in memo:
+            return memo[nome]
+        if nome not in ficha_do_insumo:
+            return precos.get(nome, np.nan)
+        if nome in caminho:
+            ciclo = caminho[caminho.index(nome):] + [nome]
+            ciclos.append(ciclo)
+            for n in ciclo:
+                memo[n] = np.nan
+            return np.nan
+
+        caminho.append(nome)
+        fid = ficha_do_insumo[nome]
+        total = 0.0
+        for insumo, qtd in linhas_por_ficha.get(fid, []):
+            c = custo_insumo(insumo)
+            total += qtd * (0.0 if np.isnan(c) else c)
+        caminho.pop()
+
+        if nome not in memo:
+            rendimento = rendimentos.get(fid, np.nan)
+            memo[nome] = total / rendimento if rendimento and rendimento > 0 else np.nan
+        return memo[nome]
+
+    for nome in ficha_do_insumo:
+        custo_insumo(nome)
+    return memo, ciclos
+
+
+def custear_ingredientes(ingredientes: pd.DataFrame, precos: pd.Series) -> pd.DataFrame:
+    """
+    Junta a tabela longa de ingredientes (ficha_ingredientes) com o custo unitário
+    de cada insumo e calcula o custo de cada linha.
+    """
+    precos = precos.rename("custo_unit_ativo").rename_axis("insumo").reset_index()
+    linhas = ingredientes[["ficha_id", "insumo", "quantidade", "unidade"]].merge(precos, on="insumo", how="left")
+    quantidade = pd.to_numeric(linhas["quantidade"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    linhas["custo_linha"] = quantidade * linhas["custo_unit_ativo"].fillna(0.0).to_numpy(dtype=float)
+    return linhas
+
+
+def custear_fichas(fichas: pd.DataFrame, ingredientes: pd.DataFrame, ativos: pd.DataFrame,
+                   produzidos: pd.DataFrame | None = None, conversor=None) -> pd.DataFrame:
+    """
+    Custo de todas as fichas de uma vez: custo total do prato (insumos), custo por
+    porção (usando rendimento_total) e quantos ingredientes estão sem custo ativo.
+    Insumos produzidos no restaurante recebem o custo da sua própria ficha; ciclos
+    encontrados ficam em resultado.attrs["ciclos"]. Com um conversor de unidades
+    (utils.unidades), cada linha é convertida da sua unidade para a unidade de custo.
+    """
+    resultado = pd.DataFrame(index=fichas.index)
+    for col in ("id", "codigo_interno", "nome_prato", "categoria"):
+        resultado[col] = fichas[col] if col in fichas.columns else ""
+    resultado.attrs["ciclos"] = []
+    if fichas.empty:
+        return resultado.assign(custo_total=[], insumos_sem_custo=[], custo_porcao=[])
+
+    precos = _precos_base(ativos)
+    ingredientes = converter_quantidades(ingredientes, ativos, conversor)
+    subreceitas, ciclos = custos_subreceitas(fichas, ingredientes, precos, produzidos)
+    if subreceitas:
+        precos = pd.concat([precos.drop(list(subreceitas), errors="ignore"), pd.Series(subreceitas, dtype=float)])
+    resultado.attrs["ciclos"] = ciclos
+
+    linhas = custear_ingredientes(ingredientes, precos)
+    incompativel = ingredientes["unidade_incompativel"].to_numpy(dtype=bool) if "unidade_incompativel" in ingredientes.columns else False
+    linhas["sem_custo"] = (linhas["custo_unit_ativo"].isna().to_numpy() | incompativel).astype(int)
+    agregado = linhas.groupby("ficha_id")[["custo_linha", "sem_custo"]].sum()
+    resultado["custo_total"] = resultado["id"].map(agregado["custo_linha"]).fillna(0.0).astype(float)
+    resultado["insumos_sem_custo"] = resultado["id"].map(agregado["sem_custo"]).fillna(0).astype(int)
+
+    rendimento = pd.to_numeric(fichas["rendimento_total"], errors="coerce").to_numpy(dtype=float)
+    custo = resultado["custo_total"].to_numpy(dtype=float)
+    resultado["custo_porcao"] = np.divide(custo, rendimento, out=np.full_like(custo, np.nan), where=rendimento > 0)
+    return resultado
+
+
+def custo_unitario_venda(custos: pd.DataFrame) -> np.ndarray:
+    """Custo de uma unidade vendida: custo por porção, ou o custo total se a ficha não tiver rendimento."""
+    return custos["custo_porcao"].fillna(custos["custo_total"]).fillna(0.0).to_numpy(dtype=float)
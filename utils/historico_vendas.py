@@ -0,0 +1,200 @@
+# utils/historico_vendas.py - HISTÓRICO DE VENDAS COLUNAR, PARTICIONADO POR MÊS
+
+# =========================================================
+# FichApp - Uma pasta por mês, um arquivo .npy por coluna
+# =========================================================
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+COLUNAS_VENDAS = {
+    "ficha_id": np.dtype(np.int32),
+    "data": np.dtype("datetime64[D]"),
+    "quantidade": np.dtype(np.float64),
+    "receita": np.dtype(np.float64),
+}
+
+_PADRAO_PARTICAO = re.compile(r"^\d{4}-\d{2}$")
+_PADRAO_ARQUIVO = re.compile(r"^([\w-]+)\.(\w+)\.npy$")
+# Arquivo do segmento compactado com os nomes dos segmentos que ele substitui
+ORIGENS = "origens"
+
+
+def _salvar_npy(caminho: str, valores: np.ndarray):
+    """Grava um .npy de forma atômica (arquivo temporário + os.replace)."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix="~", suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, valores)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, caminho)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class HistoricoVendas:
+    """
+    Linhas de venda guardadas em colunas: pasta/AAAA-MM/<segmento>.<coluna>.npy.
+    Cada importação grava um segmento por mês; a leitura abre só as partições do
+    período e só as colunas pedidas, via np.load(mmap_mode="r").
+    """
+
+    def __init__(self, pasta: str):
+        self.pasta = pasta
+        self._lock = threading.Lock()
+
+    # ---------- estrutura ----------
+    def particoes(self, inicio=None, fim=None) -> list[str]:
+        """Meses (AAAA-MM) com dados, opcionalmente limitados ao período."""
+        if not os.path.isdir(self.pasta):
+            return []
+        meses = sorted(m for m in os.listdir(self.pasta) if _PADRAO_PARTICAO.match(m))
+        if inicio is not None:
+            meses = [m for m in meses if m >= str(inicio)[:7]]
+        if fim is not None:
+            meses = [m for m in meses if m <= str(fim)[:7]]
+        return meses
+
+    def segmentos(self, mes: str) -> list[str]:
+        """
+        Segmentos completos (todas as colunas presentes) de uma partição. Os que um
+        segmento compactado já substitui (arquivo ORIGENS) ficam de fora, mesmo que
+        a compactação tenha sido interrompida antes de apagá-los.
+        """
+        pasta = os.path.join(self.pasta, mes)
+        colunas_por_segmento = {}
+        for nome in os.listdir(pasta):
+            achou = _PADRAO_ARQUIVO.match(nome)
+            if achou:
+                colunas_por_segmento.setdefault(achou.group(1), set()).add(achou.group(2))
+        completos = {s for s, cols in colunas_por_segmento.items() if cols >= set(COLUNAS_VENDAS)}
+        substituidos = set()
+        for s in completos:
+            if ORIGENS in colunas_por_segmento[s]:
+                substituidos.update(np.load(self._arquivo(mes, s, ORIGENS)).tolist())
+        return sorted(completos - substituidos)
+
+    def _arquivo(self, mes: str, segmento: str, coluna: str) -> str:
+        return os.path.join(self.pasta, mes, f"{segmento}.{coluna}.npy")
+
+    # ---------- escrita ----------
+    def gravar(self, linhas: dict, segmento: str) -> list[str]:
+        """
+        Anexa linhas (dict coluna -> array) como um novo segmento em cada mês
+        presente nelas. A coluna de data é gravada por último: um segmento só
+        passa a ser lido quando todas as suas colunas existem.
+        """
+        datas = np.asarray(linhas["data"], dtype=COLUNAS_VENDAS["data"])
+        if datas.size == 0:
+            return []
+        meses = datas.astype("datetime64[M]")
+        ordem = np.argsort(meses, kind="stable")
+        meses_ordenados = meses[ordem]
+        inicios = np.flatnonzero(np.r_[True, meses_ordenados[1:] != meses_ordenados[:-1]])
+        fins = np.r_[inicios[1:], len(ordem)]
+
+        gravados = []
+        with self._lock:
+            for a, b in zip(inicios, fins):
+                mes = str(meses_ordenados[a])
+                idx = ordem[a:b]
+                os.makedirs(os.path.join(self.pasta, mes), exist_ok=True)
+                for coluna in sorted(COLUNAS_VENDAS, key=lambda c: c == "data"):
+                    valores = np.asarray(linhas[coluna])[idx] if coluna != "data" else datas[idx]
+                    _salvar_npy(self._arquivo(mes, segmento, coluna), valores.astype(COLUNAS_VENDAS[coluna], copy=False))
+                gravados.append(mes)
+        return gravados
+
+    def descartar_segmentos(self, prefixo: str):
+        """Remove os segmentos com o prefixo (ex.: restos de uma importação interrompida) de todas as partições."""
+        with self._lock:
+            for mes in self.particoes():
+                pasta = os.path.join(self.pasta, mes)
+                for nome in os.listdir(pasta):
+                    if nome.startswith(prefixo) and _PADRAO_ARQUIVO.match(nome):
+                        os.remove(os.path.join(pasta, nome))
+
+    def _retomar_compactacao(self, mes: str):
+        """
+        Termina uma compactação interrompida: apaga um segmento compactado que não
+        chegou a receber a coluna de data, ou os segmentos que um compactado completo
+        já substitui (e depois a lista deles).
+        """
+        pasta = os.path.join(self.pasta, mes)
+        nomes = [(nome, _PADRAO_ARQUIVO.match(nome)) for nome in os.listdir(pasta)]
+        com_data = {achou.group(1) for _, achou in nomes if achou and achou.group(2) == "data"}
+        for nome, achou in nomes:
+            if achou and achou.group(1).startswith("c") and achou.group(1) not in com_data:
+                os.remove(os.path.join(pasta, nome))
+        for seg in self.segmentos(mes):
+            origens = self._arquivo(mes, seg, ORIGENS)
+            if os.path.exists(origens):
+                substituidos = set(np.load(origens).tolist())
+                for nome, achou in nomes:
+                    if achou and achou.group(1) in substituidos and os.path.exists(os.path.join(pasta, nome)):
+                        os.remove(os.path.join(pasta, nome))
+                os.remove(origens)
+
+    def compactar(self, meses=None):
+        """
+        Junta os segmentos de cada mês em um único segmento. O novo segmento grava
+        a lista dos que substitui e a coluna de data por último: até ela existir
+        valem os antigos; depois, só o novo (segmentos() ignora os substituídos).
+        Os arquivos antigos são apagados só então, e por fim a lista; uma
+        compactação interrompida é terminada na próxima.
+        """
+        with self._lock:
+            for mes in (meses if meses is not None else self.particoes()):
+                self._retomar_compactacao(mes)
+                segs = self.segmentos(mes)
+                if len(segs) <= 1:
+                    continue
+                novo = f"c{time.time_ns()}"
+                _salvar_npy(self._arquivo(mes, novo, ORIGENS), np.array(segs))
+                for coluna in sorted(COLUNAS_VENDAS, key=lambda c: c == "data"):
+                    valores = np.concatenate([np.load(self._arquivo(mes, s, coluna), mmap_mode="r") for s in segs])
+                    _salvar_npy(self._arquivo(mes, novo, coluna), valores)
+                self._retomar_compactacao(mes)
+
+    # ---------- leitura ----------
+    def ler(self, inicio=None, fim=None, colunas=("ficha_id", "quantidade")) -> dict:
+        """
+        Colunas pedidas das linhas com data em [inicio, fim]. Só as partições do
+        período são abertas; meses inteiramente dentro do período dispensam
+        o filtro por data.
+        """
+        colunas = list(colunas)
+        ini = np.datetime64(str(inicio)[:10], "D") if inicio is not None else None
+        fim_d = np.datetime64(str(fim)[:10], "D") if fim is not None else None
+        partes = {c: [] for c in colunas}
+        with self._lock:
+            self._ler_particoes(inicio, fim, ini, fim_d, colunas, partes)
+        return {
+            c: np.concatenate(partes[c]) if partes[c] else np.empty(0, dtype=COLUNAS_VENDAS[c])
+            for c in colunas
+        }
+
+    def _ler_particoes(self, inicio, fim, ini, fim_d, colunas, partes):
+        for mes in self.particoes(inicio, fim):
+            primeiro = np.datetime64(mes, "M").astype("datetime64[D]")
+            ultimo = (np.datetime64(mes, "M") + 1).astype("datetime64[D]") - 1
+            inteiro = (ini is None or ini <= primeiro) and (fim_d is None or fim_d >= ultimo)
+            for seg in self.segmentos(mes):
+                mascara = None
+                if not inteiro:
+                    datas = np.load(self._arquivo(mes, seg, "data"), mmap_mode="r")
+                    mascara = np.ones(len(datas), dtype=bool)
+                    if ini is not None:
+                        mascara &= datas >= ini
+                    if fim_d is not None:
+                        mascara &= datas <= fim_d
+                for c in colunas:
+                    valores = np.load(self._arquivo(mes, seg, c), mmap_mode="r")
+                    partes[c].append(valores[mascara] if mascara is not None else valores)
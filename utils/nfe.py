@@ -0,0 +1,233 @@
+# utils/nfe.py - IMPORTAÇÃO EM LOTE DE NF-e (XML) PARA O HISTÓRICO DE COMPRAS
+
+# =========================================================
+# FichApp - Leitura em fluxo (iterparse) + gravação em uma transação
+# =========================================================
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import pandas as pd
+
+from utils import storage
+from utils.busca import dobrar
+from utils.calculos import colunas_derivadas, qtde_para_custos_auto
+
+NS = "{http://www.portalfiscal.inf.br/nfe}"
+
+# Itens processados por vez (a leitura é em fluxo; a memória fica limitada ao lote)
+TAMANHO_LOTE = 5_000
+
+# Unidades comerciais comuns nas notas -> códigos de unidades_medida
+ALIASES_UNIDADES = {
+    "KGS": "KG", "QUILO": "KG", "GR": "G", "LT": "L", "LTS": "L", "UND": "UN", "UNID": "UN", "UNI": "UN",
+    "PC": "UN", "PÇ": "UN", "PCA": "UN", "PCT": "PAC", "PCTE": "PAC", "BDJ": "BAN", "BJ": "BAN",
+}
+
+
+# =========================================================
+# LEITURA
+# =========================================================
+def _arquivos_xml(origem):
+    """Gera (nome, arquivo binário) para uma pasta, um .zip (caminho ou arquivo aberto) ou um único .xml."""
+    if isinstance(origem, (str, os.PathLike)) and os.path.isdir(origem):
+        for raiz, _, arquivos in os.walk(origem):
+            for nome in sorted(arquivos):
+                if nome.lower().endswith(".xml"):
+                    with open(os.path.join(raiz, nome), "rb") as f:
+                        yield nome, f
+                elif nome.lower().endswith(".zip"):
+                    yield from _arquivos_xml(os.path.join(raiz, nome))
+    elif zipfile.is_zipfile(origem):
+        with zipfile.ZipFile(origem) as z:
+            for nome in sorted(z.namelist()):
+                if nome.lower().endswith(".xml"):
+                    with z.open(nome) as f:
+                        yield nome, f
+    else:
+        if hasattr(origem, "seek"):
+            origem.seek(0)
+        if isinstance(origem, (str, os.PathLike)):
+            with open(origem, "rb") as f:
+                yield os.path.basename(origem), f
+        else:
+            yield getattr(origem, "name", "nfe.xml"), origem
+
+
+def _texto(elem, caminho: str, padrao=None):
+    achado = elem.find("/".join(NS + parte for parte in caminho.split("/")))
+    return achado.text.strip() if achado is not None and achado.text else padrao
+
+
+def _numero(elem, caminho: str) -> float:
+    try:
+        return float(_texto(elem, caminho, "0"))
+    except ValueError:
+        return 0.0
+
+
+def _data_br(texto) -> str | None:
+    """'2025-03-10T10:00:00-03:00' ou '2025-03-10' -> '10/03/2025'."""
+    try:
+        return datetime.strptime(str(texto)[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
+    except (TypeError, ValueError):
+        return None
+
+
+def ler_itens(*origens):
+    """
+    Gera um dict por item (det) de cada nota, lendo os XMLs em fluxo: cada infNFe
+    é descartada da memória assim que seus itens são emitidos.
+    """
+    arquivos = ((nome, f) for origem in origens for nome, f in _arquivos_xml(origem))
+    for nome_arquivo, arquivo in arquivos:
+        try:
+            for _, elem in ET.iterparse(arquivo, events=("end",)):
+                if elem.tag != NS + "infNFe":
+                    continue
+                chave = (elem.get("Id") or "").removeprefix("NFe")
+                emitente = elem.find(NS + "emit")
+                cabecalho = {
+                    "arquivo": nome_arquivo,
+                    "chave": chave,
+                    "numero": _texto(elem, "ide/nNF", ""),
+                    "data_compra": _data_br(_texto(elem, "ide/dhEmi") or _texto(elem, "ide/dEmi")),
+                    "cnpj_emitente": _texto(emitente, "CNPJ") or _texto(emitente, "CPF") or "",
+                    "fornecedor": _texto(emitente, "xFant") or _texto(emitente, "xNome") or "",
+                    "fone_fornecedor": _texto(emitente, "enderEmit/fone") or "",
+                }
+                for det in elem.iter(NS + "det"):
+                    prod = det.find(NS + "prod")
+                    yield {
+                        **cabecalho,
+                        "item": int(det.get("nItem") or 0),
+                        "codigo_produto": _texto(prod, "cProd", ""),
+                        "descricao": _texto(prod, "xProd", ""),
+                        "unidade_nota": (_texto(prod, "uCom", "") or "").upper(),
+                        "quantidade_compra": _numero(prod, "qCom"),
+                        "valor_total_compra": _numero(prod, "vProd") - _numero(prod, "vDesc") + _numero(prod, "vOutro"),
+                        "valor_frete": _numero(prod, "vFrete"),
+                    }
+                elem.clear()
+        except ET.ParseError as e:
+            yield {"arquivo": nome_arquivo, "erro": f"XML inválido: {e}"}
+
+
+# =========================================================
+# MAPEAMENTO ITEM -> INSUMO
+# =========================================================
+def _mapear(itens: pd.DataFrame, conn) -> pd.Series:
+    """
+    insumo_resumo de cada item: primeiro pelo mapeamento aprendido (CNPJ + código
+    do produto), depois pela descrição igual (sem acentos) ao nome completo ou
+    resumido de um insumo já comprado.
+    """
+    mapa = pd.read_sql_query("SELECT cnpj_emitente, codigo_produto, insumo_resumo FROM mapeamento_nfe", conn)
+    por_codigo = dict(zip(zip(mapa["cnpj_emitente"], mapa["codigo_produto"]), mapa["insumo_resumo"]))
+    conhecidos = pd.read_sql_query(
+        "SELECT DISTINCT insumo_resumo, insumo_completo FROM compras_insumos WHERE insumo_resumo <> ''", conn)
+    por_nome = {}
+    for resumo, completo in zip(conhecidos["insumo_resumo"], conhecidos["insumo_completo"]):
+        por_nome.setdefault(dobrar(resumo), resumo)
+        if completo:
+            por_nome.setdefault(dobrar(completo), resumo)
+
+    insumo = pd.Series(list(zip(itens["cnpj_emitente"], itens["codigo_produto"])), index=itens.index).map(por_codigo)
+    return insumo.fillna(itens["descricao"].map(lambda d: por_nome.get(dobrar(d))))
+
+
+def salvar_mapeamentos(df: pd.DataFrame):
+    """Guarda (CNPJ, código do produto) -> insumo_resumo para as próximas importações."""
+    df = df.dropna(subset=["insumo_resumo"])
+    df = df[df["insumo_resumo"].astype(str).str.strip() != ""]
+    with storage.conectar() as conn:
+        conn.executemany(
+            "INSERT INTO mapeamento_nfe (cnpj_emitente, codigo_produto, insumo_resumo) VALUES (?, ?, ?) "
+            "ON CONFLICT(cnpj_emitente, codigo_produto) DO UPDATE SET insumo_resumo = excluded.insumo_resumo",
+            list(df[["cnpj_emitente", "codigo_produto"]].astype(str)
+                 .assign(insumo_resumo=df["insumo_resumo"].astype(str).str.strip()).itertuples(index=False, name=None)),
+        )
+
+
+# =========================================================
+# IMPORTAÇÃO DO LOTE
+# =========================================================
+def importar_nfe(*origens, tamanho_lote: int = TAMANHO_LOTE) -> dict:
+    """
+    Importa todas as notas das origens (pastas, .zip ou XMLs) em uma transação,
+    processando os itens em lotes de até 'tamanho_lote' (memória limitada mesmo
+    com milhares de notas). Itens já importados (inclusive repetidos na própria
+    remessa, ex.: o mesmo XML na pasta e no .zip) são ignorados; itens sem insumo
+    correspondente voltam em 'pendentes' (para mapear e importar de novo).
+    """
+    resumo = {"itens": 0, "importados": 0, "ja_importados": 0, "erros": [],
+              "pendentes": pd.DataFrame(), "insumos_alterados": []}
+    pendentes, alterados, lote = [], {}, []
+    with storage.conectar() as conn:
+        for item in ler_itens(*origens):
+            if "erro" in item:
+                resumo["erros"].append(item)
+                continue
+            lote.append(item)
+            if len(lote) >= tamanho_lote:
+                _importar_lote(conn, pd.DataFrame(lote), resumo, pendentes, alterados)
+                lote = []
+        if lote:
+            _importar_lote(conn, pd.DataFrame(lote), resumo, pendentes, alterados)
+    if pendentes:
+        resumo["pendentes"] = pd.concat(pendentes, ignore_index=True)
+    resumo["insumos_alterados"] = list(alterados)
+    return resumo
+
+
+def _importar_lote(conn, itens: pd.DataFrame, resumo: dict, pendentes: list, alterados: dict):
+    """
+    Grava um lote na transação recebida: as colunas derivadas são calculadas para
+    o lote inteiro e os insumos ativos são atualizados uma vez por insumo. Os
+    itens gravados entram em itens_nfe_importados na mesma transação, então os
+    lotes seguintes já os enxergam como importados.
+    """
+    resumo["itens"] += len(itens)
+    unicos = itens.drop_duplicates(["chave", "item"])
+    vistos = pd.read_sql_query(
+        "SELECT chave, item FROM itens_nfe_importados WHERE chave IN (SELECT value FROM json_each(?))",
+        conn, params=(pd.Series(unicos["chave"].unique()).to_json(orient="values"),),
+    )
+    ja = pd.MultiIndex.from_frame(vistos) if not vistos.empty else pd.MultiIndex.from_tuples([], names=["chave", "item"])
+    novos = unicos[~pd.MultiIndex.from_frame(unicos[["chave", "item"]]).isin(ja)].copy()
+    resumo["ja_importados"] += len(itens) - len(novos)
+    itens = novos
+
+    itens["insumo_resumo"] = _mapear(itens, conn)
+    pendente = itens["insumo_resumo"].isna() | itens["data_compra"].isna()
+    pendentes.append(itens.loc[pendente, ["arquivo", "numero", "fornecedor", "cnpj_emitente", "codigo_produto",
+                                          "descricao", "unidade_nota", "quantidade_compra", "valor_total_compra"]])
+    itens = itens[~pendente]
+    if itens.empty:
+        return
+
+    unidades = pd.read_sql_query("SELECT codigo, qtde_padrao FROM unidades_medida", conn)
+    fatores = dict(zip(unidades["codigo"], unidades["qtde_padrao"]))
+    ativos = pd.read_sql_query("SELECT insumo_resumo, grupo, un_med FROM insumos_ativos", conn).set_index("insumo_resumo")
+
+    un = itens["unidade_nota"].replace(ALIASES_UNIDADES)
+    itens["un_med"] = un.where(un.isin(list(fatores)), itens["insumo_resumo"].map(ativos["un_med"])).fillna("UN")
+    itens["grupo"] = itens["insumo_resumo"].map(ativos["grupo"]).fillna("Outros")
+    itens["qtde_para_custos"] = qtde_para_custos_auto(itens["un_med"].to_numpy(), itens["quantidade_compra"].to_numpy(), fatores)
+    itens["percentual_perda"] = 0.0
+    for coluna, valores in colunas_derivadas(itens["quantidade_compra"], itens["qtde_para_custos"], itens["valor_total_compra"],
+                                             itens["valor_frete"], itens["percentual_perda"]).items():
+        itens[coluna] = valores
+
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    itens = itens.assign(
+        insumo_completo=itens["descricao"], marca="", tipo="Comprado", representante="", observacao="",
+        documento="NF-e " + itens["numero"].astype(str) + " (" + itens["chave"] + ")", atualizado_em=agora,
+    )
+    alterados.update(dict.fromkeys(storage.gravar_compras_lote(conn, itens.to_dict("records"))))
+    conn.executemany(
+        "INSERT OR IGNORE INTO itens_nfe_importados (chave, item, importado_em) VALUES (?, ?, ?)",
+        [(c, int(i), agora) for c, i in zip(itens["chave"], itens["item"])],
+    )
+    resumo["importados"] += len(itens)
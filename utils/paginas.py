@@ -0,0 +1,57 @@
+# utils/paginas.py - REGISTRO DE PÁGINAS PRÉ-COMPILADAS
+
+# =========================================================
+# FichApp - Cada página é compilada uma vez, em módulo próprio
+# =========================================================
+import importlib.util
+import os
+import re
+import sys
+import threading
+
+from utils.nav import MENU_PAGES
+
+
+class RegistroPaginas:
+    """
+    Carrega cada arquivo de página como um módulo isolado (sem poluir o globals()
+    do streamlit_app) e o mantém em memória. O arquivo só é recompilado quando
+    sua data de modificação no disco muda.
+    """
+
+    def __init__(self, paginas: dict, pasta: str = "."):
+        self._arquivos = set(paginas.values())
+        self._pasta = pasta
+        self._modulos = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, arquivo: str) -> bool:
+        return arquivo in self._arquivos
+
+    def _nome_modulo(self, arquivo: str) -> str:
+        base = os.path.splitext(os.path.basename(arquivo))[0]
+        return "fichapp_pagina_" + re.sub(r"\W", "_", base)
+
+    def modulo(self, arquivo: str):
+        """Retorna o módulo da página, recompilando apenas se o arquivo mudou."""
+        caminho = os.path.join(self._pasta, arquivo)
+        carimbo = os.stat(caminho).st_mtime_ns
+        with self._lock:
+            entrada = self._modulos.get(arquivo)
+            if entrada is not None and entrada[0] == carimbo:
+                return entrada[1]
+
+            nome = self._nome_modulo(arquivo)
+            spec = importlib.util.spec_from_file_location(nome, caminho)
+            modulo = importlib.util.module_from_spec(spec)
+            sys.modules[nome] = modulo
+            try:
+                spec.loader.exec_module(modulo)
+            except Exception:
+                sys.modules.pop(nome, None)
+                raise
+            self._modulos[arquivo] = (carimbo, modulo)
+            return modulo
+
+
+registro = RegistroPaginas(MENU_PAGES)
@@ -0,0 +1,150 @@
+# utils/planilha.py - IMPORTAÇÃO DE COMPRAS POR PLANILHA (CSV/XLSX)
+
+# =========================================================
+# FichApp - Validação vetorizada + gravação em uma única transação
+# =========================================================
+import hashlib
+import json
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from utils import storage
+from utils.busca import dobrar
+from utils.calculos import colunas_derivadas, qtde_para_custos_auto
+
+# Cabeçalhos aceitos (comparados sem acento/maiúsculas) -> coluna de compras_insumos
+ALIASES_COLUNAS = {
+    "data_compra": ["data_compra", "data", "data da compra"],
+    "grupo": ["grupo"],
+    "insumo_resumo": ["insumo_resumo", "nome resumido", "nome_resumido", "insumo"],
+    "insumo_completo": ["insumo_completo", "nome completo", "nome_completo", "descricao"],
+    "marca": ["marca"],
+    "tipo": ["tipo"],
+    "un_med": ["un_med", "unidade", "unidade de medida", "un"],
+    "quantidade_compra": ["quantidade_compra", "quantidade", "qtde", "qtd", "quantidade comprada"],
+    "qtde_para_custos": ["qtde_para_custos", "quantidade para custos"],
+    "valor_total_compra": ["valor_total_compra", "valor total", "valor_total", "valor"],
+    "valor_frete": ["valor_frete", "frete"],
+    "percentual_perda": ["percentual_perda", "perda", "% de perda", "% perda"],
+    "fornecedor": ["fornecedor"],
+    "fone_fornecedor": ["fone_fornecedor", "fone", "telefone"],
+    "representante": ["representante"],
+    "documento": ["documento", "nota fiscal", "nf"],
+    "observacao": ["observacao", "obs"],
+}
+NUMERICAS = ["quantidade_compra", "qtde_para_custos", "valor_total_compra", "valor_frete", "percentual_perda"]
+# Campos que identificam uma compra da planilha (a impressão gravada em linhas_planilha_importadas)
+CAMPOS_IMPRESSAO = ["data_compra", "insumo_resumo", "un_med", "quantidade_compra", "valor_total_compra",
+                    "valor_frete", "percentual_perda", "fornecedor", "documento"]
+
+
+def ler_planilha(arquivo, nome: str = "") -> pd.DataFrame:
+    """Lê um CSV ou XLSX (openpyxl necessário para .xlsx) e renomeia os cabeçalhos conhecidos."""
+    nome = (nome or getattr(arquivo, "name", "") or str(arquivo)).lower()
+    if nome.endswith((".xlsx", ".xlsm", ".xls")):
+        try:
+            df = pd.read_excel(arquivo, dtype=str)
+        except ImportError as e:
+            raise ValueError("Para importar .xlsx instale o pacote openpyxl (ou salve a planilha como CSV).") from e
+    else:
+        df = pd.read_csv(arquivo, sep=None, engine="python", dtype=str, encoding="utf-8-sig")
+
+    destino = {dobrar(alias): coluna for coluna, aliases in ALIASES_COLUNAS.items() for alias in aliases}
+    df = df.rename(columns={c: destino[dobrar(c)] for c in df.columns if dobrar(c) in destino})
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def _numero(serie: pd.Series) -> pd.Series:
+    """Aceita '1.234,56', '1234,56' e '1234.56'."""
+    texto = serie.astype(str).str.strip().str.replace("R$", "", regex=False).str.strip()
+    brasileiro = texto.str.contains(",", regex=False)
+    texto = texto.where(~brasileiro, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(texto, errors="coerce")
+
+
+def validar(df: pd.DataFrame, unidades: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Valida todas as linhas de uma vez com as mesmas regras do formulário (nome
+    resumido, quantidade > 0, valor total > 0) mais unidade conhecida e data
+    válida. Retorna (compras válidas com colunas derivadas, relatório de erros
+    com o número da linha na planilha).
+    """
+    df = df.reindex(columns=list(ALIASES_COLUNAS)).copy()
+    for col in NUMERICAS:
+        df[col] = _numero(df[col].fillna(""))
+    for col in ("valor_frete", "percentual_perda"):
+        df[col] = df[col].fillna(0.0)
+    texto = [c for c in ALIASES_COLUNAS if c not in NUMERICAS]
+    df[texto] = df[texto].fillna("").astype(str).apply(lambda s: s.str.strip())
+    df["un_med"] = df["un_med"].str.upper()
+    df["insumo_completo"] = df["insumo_completo"].where(df["insumo_completo"] != "", df["insumo_resumo"])
+    df["grupo"] = df["grupo"].where(df["grupo"] != "", "Outros")
+    df["tipo"] = df["tipo"].where(df["tipo"] != "", "Comprado")
+
+    datas = pd.to_datetime(df["data_compra"], dayfirst=True, errors="coerce")
+    sem_data = df["data_compra"] == ""
+    df["data_compra"] = datas.dt.strftime("%d/%m/%Y").where(~sem_data, date.today().strftime("%d/%m/%Y"))
+
+    regras = [
+        (df["insumo_resumo"] == "", "nome resumido vazio"),
+        (~(df["quantidade_compra"] > 0), "quantidade deve ser maior que zero"),
+        (~(df["valor_total_compra"] > 0), "valor total deve ser maior que zero"),
+        (~df["un_med"].isin(unidades["codigo"]), "unidade de medida desconhecida"),
+        (datas.isna() & ~sem_data, "data inválida (use dd/mm/aaaa)"),
+        (~df["percentual_perda"].between(0, 100), "% de perda fora de 0–100"),
+    ]
+    mensagens = np.full(len(df), "", dtype=object)
+    for mascara, texto_erro in regras:
+        m = mascara.to_numpy()
+        mensagens[m] = mensagens[m] + np.where(mensagens[m] == "", "", "; ") + texto_erro
+    invalida = mensagens != ""
+
+    erros = pd.DataFrame({
+        "linha": df.index[invalida] + 2,  # cabeçalho = linha 1
+        "insumo_resumo": df.loc[invalida, "insumo_resumo"].to_numpy(),
+        "erros": mensagens[invalida],
+    })
+
+    validas = df[~invalida].copy()
+    fatores = dict(zip(unidades["codigo"], pd.to_numeric(unidades["qtde_padrao"], errors="coerce")))
+    auto = qtde_para_custos_auto(validas["un_med"].to_numpy(), validas["quantidade_compra"].to_numpy(), fatores)
+    validas["qtde_para_custos"] = np.where(validas["qtde_para_custos"] > 0, validas["qtde_para_custos"], auto)
+    for coluna, valores in colunas_derivadas(validas["quantidade_compra"], validas["qtde_para_custos"], validas["valor_total_compra"],
+                                             validas["valor_frete"], validas["percentual_perda"]).items():
+        validas[coluna] = valores
+    validas["atualizado_em"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return validas, erros
+
+
+def impressoes(validas: pd.DataFrame) -> pd.Series:
+    """
+    Impressão de cada linha: hash dos campos da compra mais a ocorrência da mesma
+    compra dentro da planilha, para que duas linhas iguais no mesmo arquivo
+    continuem sendo duas compras e reenviar o arquivo não grave nenhuma delas de novo.
+    """
+    campos = validas[CAMPOS_IMPRESSAO].astype(str)
+    ocorrencia = campos.groupby(CAMPOS_IMPRESSAO, sort=False).cumcount()
+    return pd.Series([hashlib.sha256(json.dumps(linha + [int(n)], ensure_ascii=False).encode()).hexdigest()
+                      for linha, n in zip(campos.to_numpy().tolist(), ocorrencia)], index=validas.index)
+
+
+def importar_compras(validas: pd.DataFrame) -> dict:
+    """
+    Grava em uma transação as compras válidas que ainda não foram importadas
+    (mesma impressão de linha) e registra as impressões gravadas. Retorna quantas
+    foram gravadas, quantas já estavam no histórico e os insumos cujo custo ativo mudou.
+    """
+    chaves = impressoes(validas)
+    with storage.conectar() as conn:
+        vistas = {r[0] for r in conn.execute(
+            "SELECT impressao FROM linhas_planilha_importadas WHERE impressao IN (SELECT value FROM json_each(?))",
+            (json.dumps(chaves.tolist()),),
+        )}
+        novas = ~chaves.isin(vistas)
+        alterados = storage.gravar_compras_lote(conn, validas[novas].to_dict("records")) if novas.any() else []
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.executemany("INSERT OR IGNORE INTO linhas_planilha_importadas (impressao, importado_em) VALUES (?, ?)",
+                         [(c, agora) for c in chaves[novas]])
+    return {"gravadas": int(novas.sum()), "ja_importadas": int((~novas).sum()), "insumos_alterados": alterados}
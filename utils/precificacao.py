@@ -0,0 +1,60 @@
+# utils/precificacao.py - MOTOR DE PRECIFICAÇÃO (RATEIO DOS PARÂMETROS FINANCEIROS)
+
+# =========================================================
+# FichApp - Preço sugerido de todo o cardápio em um passo vetorizado
+# =========================================================
+import numpy as np
+import pandas as pd
+
+from utils.custos import custo_unitario_venda
+
+# Percentuais aplicados sobre o preço de venda (ordem de exibição do rateio)
+PARAMETROS_PRECO = [
+    "Lucro Desejado", "Taxa Cartão", "Simples", "Comissão APP", "Cashback Menudino",
+    "Comissão Atendente", "Outros (1)", "Outros (2)",
+]
+LUCRO = "Lucro Desejado"
+
+
+def ler_parametros(parametros: pd.DataFrame) -> pd.Series:
+    """Percentuais de parametros_financeiros na ordem de PARAMETROS_PRECO (ausentes valem 0)."""
+    if parametros.empty:
+        return pd.Series(0.0, index=PARAMETROS_PRECO)
+    valores = pd.to_numeric(parametros.set_index("parametro")["valor"], errors="coerce")
+    return valores.reindex(PARAMETROS_PRECO).fillna(0.0).astype(float)
+
+
+def preco_sugerido(custo, percentual_total):
+    """
+    Preço pelo divisor de markup: custo / (1 - Σ%/100). Aceita escalares ou arrays
+    (com broadcasting). Percentual total >= 100% não tem preço viável e vira NaN.
+    """
+    divisor = 1.0 - np.asarray(percentual_total, dtype=float) / 100.0
+    custo = np.asarray(custo, dtype=float)
+    forma = np.broadcast(custo, divisor).shape
+    return np.divide(custo, divisor, out=np.full(forma, np.nan), where=divisor > 0)
+
+
+def precificar_fichas(custos: pd.DataFrame, percentuais: pd.Series) -> pd.DataFrame:
+    """
+    Para cada ficha (saída de custear_fichas): preço sugerido, valor de cada
+    parcela do rateio e margem de contribuição (preço - custo - custos variáveis).
+    """
+    resultado = custos[["id", "codigo_interno", "nome_prato", "categoria"]].copy()
+    custo = custo_unitario_venda(custos)
+    p = percentuais.to_numpy(dtype=float)
+    preco = preco_sugerido(custo, p.sum())
+
+    resultado["custo_unitario"] = custo
+    resultado["preco_sugerido"] = preco
+    parcelas = np.outer(preco, p / 100.0)
+    for j, nome in enumerate(percentuais.index):
+        resultado[nome] = parcelas[:, j]
+
+    variaveis = parcelas.sum(axis=1) - resultado[LUCRO].to_numpy() if LUCRO in percentuais.index else parcelas.sum(axis=1)
+    resultado["margem_contribuicao"] = preco - custo - variaveis
+    resultado["margem_percentual"] = np.divide(
+        resultado["margem_contribuicao"].to_numpy(), preco,
+        out=np.full_like(preco, np.nan), where=preco > 0,
+    ) * 100.0
+    return resultado
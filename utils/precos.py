@@ -0,0 +1,85 @@
+# utils/precos.py - HISTÓRICO DE PREÇOS E MÉTODOS DE CUSTO DOS INSUMOS
+
+# =========================================================
+# FichApp - Somas acumuladas por insumo, atualizadas a cada compra
+# =========================================================
+from bisect import insort
+from datetime import date, timedelta
+
+# Janelas das médias móveis (fixas: mudar o método não exige reler o histórico)
+JANELA_COMPRAS = 5
+JANELA_DIAS = 90
+
+METODOS_CUSTO = {
+    "ultimo": "Último preço pago",
+    "medio": "Custo médio ponderado (todas as compras)",
+    "ultimas_compras": f"Média das últimas {JANELA_COMPRAS} compras",
+    "ultimos_dias": f"Média dos últimos {JANELA_DIAS} dias",
+}
+METODO_PADRAO = "ultimo"
+
+# Coluna de precos_insumos que guarda o custo de cada método
+COLUNA_METODO = {
+    "ultimo": "preco_ultimo",
+    "medio": "preco_medio",
+    "ultimas_compras": "preco_media_compras",
+    "ultimos_dias": "preco_media_dias",
+}
+
+
+def novo_estado(un_med: str) -> dict:
+    return {"un_med": un_med, "data_ultima_iso": None, "preco_ultimo": None,
+            "soma_valor": 0.0, "soma_peso": 0.0, "compras": 0, "janela": []}
+
+
+def _inicio_janela(data_iso: str) -> str:
+    return (date.fromisoformat(data_iso) - timedelta(days=JANELA_DIAS)).isoformat()
+
+
+def acumular(estado: dict | None, data_iso: str, un_med: str, preco: float, peso: float) -> dict:
+    """
+    Incorpora uma compra ao estado do insumo em tempo constante: somas para o
+    custo médio ponderado e uma janela curta, ordenada por data, para as médias
+    das últimas compras e dos últimos dias. O peso é a quantidade para custos
+    já descontada a perda.
+
+    Uma compra mais recente em outra unidade recomeça o histórico (os preços
+    deixam de ser comparáveis); compras antigas em outra unidade são ignoradas.
+    """
+    if estado is None or (un_med != estado["un_med"] and data_iso >= (estado["data_ultima_iso"] or "")):
+        estado = novo_estado(un_med)
+    elif un_med != estado["un_med"]:
+        return estado
+
+    estado["compras"] += 1
+    if peso > 0:
+        estado["soma_valor"] += preco * peso
+        estado["soma_peso"] += peso
+    if estado["data_ultima_iso"] is None or data_iso >= estado["data_ultima_iso"]:
+        estado["data_ultima_iso"], estado["preco_ultimo"] = data_iso, preco
+
+    janela = estado["janela"]
+    insort(janela, [data_iso, preco, peso])
+    inicio = _inicio_janela(estado["data_ultima_iso"])
+    estado["janela"] = [c for i, c in enumerate(janela) if i >= len(janela) - JANELA_COMPRAS or c[0] >= inicio]
+    return estado
+
+
+def _media(compras: list, reserva: float | None) -> float | None:
+    peso = sum(c[2] for c in compras if c[2] > 0)
+    if peso <= 0:
+        return reserva
+    return sum(c[1] * c[2] for c in compras if c[2] > 0) / peso
+
+
+def precos(estado: dict) -> dict:
+    """Custo unitário do insumo em cada método (coluna de precos_insumos -> valor)."""
+    ultimo = estado["preco_ultimo"]
+    janela = estado["janela"]
+    inicio = _inicio_janela(estado["data_ultima_iso"]) if estado["data_ultima_iso"] else ""
+    return {
+        "preco_ultimo": ultimo,
+        "preco_medio": estado["soma_valor"] / estado["soma_peso"] if estado["soma_peso"] > 0 else ultimo,
+        "preco_media_compras": _media(janela[-JANELA_COMPRAS:], ultimo),
+        "preco_media_dias": _media([c for c in janela if c[0] >= inicio], ultimo),
+    }
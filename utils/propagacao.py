@@ -0,0 +1,177 @@
+# utils/propagacao.py - PROPAGAÇÃO DE CUSTOS PELO GRAFO DE DEPENDÊNCIAS
+
+# =========================================================
+# FichApp - insumos -> fichas -> preços
+# =========================================================
+# Quando o custo ativo de um insumo muda, apenas as fichas que o usam (arestas
+# em ficha_ingredientes, consultadas pelo índice por insumo) ficam "sujas" e são
+# recalculadas. Se uma ficha suja prepara um insumo produzido no restaurante, as
+# fichas que usam esse insumo também ficam sujas (propagação transitiva).
+# O resultado fica em custos_fichas (base para os preços) e cada mudança de custo
+# é registrada em variacoes_custos.
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from utils import storage
+from utils.cache import tabelas as cache_tabelas
+from utils.custos import custear_fichas, custos_subreceitas
+from utils.unidades import conversor as conversor_unidades
+
+TOLERANCIA = 1e-9
+
+
+def fichas_dependentes(conn, insumos) -> list[int]:
+    """Fichas que usam, direta ou indiretamente (via sub-receitas), os insumos informados."""
+    sujas, fronteira = set(), set(insumos)
+    while fronteira:
+        novas = {r[0] for r in conn.execute(
+            "SELECT DISTINCT ficha_id FROM ficha_ingredientes WHERE insumo IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(fronteira)),),
+        )} - sujas
+        sujas |= novas
+        fronteira = {r[0] for r in conn.execute(
+            "SELECT insumo_resumo FROM insumos_produzidos WHERE ficha_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(novas)),),
+        )}
+    return sorted(sujas)
+
+
+def _fechamento_subreceitas(conn, ficha_ids) -> list[int]:
+    """Inclui as fichas das sub-receitas usadas (necessárias para custear as fichas sujas)."""
+    todas, fronteira = set(ficha_ids), set(ficha_ids)
+    while fronteira:
+        fronteira = {r[0] for r in conn.execute(
+            "SELECT p.ficha_id FROM ficha_ingredientes i JOIN insumos_produzidos p ON p.insumo_resumo = i.insumo "
+            "WHERE i.ficha_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(fronteira)),),
+        )} - todas
+        todas |= fronteira
+    return sorted(todas)
+
+
+def _ler_subgrafo(conn, ficha_ids):
+    ids = json.dumps(_fechamento_subreceitas(conn, [int(i) for i in ficha_ids]))
+    fichas = pd.read_sql_query(
+        f"SELECT {', '.join(storage.COLUNAS['fichas_tecnicas'])} FROM fichas_tecnicas "
+        "WHERE id IN (SELECT value FROM json_each(?))", conn, params=(ids,),
+    )
+    ingredientes = pd.read_sql_query(
+        f"SELECT {', '.join(storage.COLUNAS['ficha_ingredientes'])} FROM ficha_ingredientes "
+        "WHERE ficha_id IN (SELECT value FROM json_each(?))", conn, params=(ids,),
+    )
+    ativos = pd.read_sql_query(
+        "SELECT insumo_resumo, custo_unit_ativo, un_med FROM insumos_ativos "
+        "WHERE insumo_resumo IN (SELECT DISTINCT insumo FROM ficha_ingredientes "
+        "WHERE ficha_id IN (SELECT value FROM json_each(?)))", conn, params=(ids,),
+    )
+    produzidos = pd.read_sql_query(
+        "SELECT insumo_resumo, ficha_id FROM insumos_produzidos WHERE ficha_id IN (SELECT value FROM json_each(?))",
+        conn, params=(ids,),
+    )
+    return fichas, ingredientes, ativos, produzidos
+
+
+def recalcular_fichas(conn, ficha_ids, origem: str | None = None) -> pd.DataFrame:
+    """
+    Recalcula apenas as fichas informadas, grava custos_fichas e registra as
+    fichas cujo custo mudou. Retorna as variações (ficha, custo anterior, novo, diferença).
+    """
+    colunas = ["ficha_id", "codigo_interno", "nome_prato", "custo_anterior", "custo_novo", "variacao"]
+    if not ficha_ids:
+        return pd.DataFrame(columns=colunas)
+
+    fichas, ingredientes, ativos, produzidos = _ler_subgrafo(conn, ficha_ids)
+    custos = custear_fichas(fichas, ingredientes, ativos, produzidos, conversor_unidades())
+    custos = custos[custos["id"].isin([int(i) for i in ficha_ids])].copy()
+    anteriores = dict(conn.execute(
+        "SELECT ficha_id, custo_total FROM custos_fichas WHERE ficha_id IN (SELECT value FROM json_each(?))",
+        (json.dumps([int(i) for i in ficha_ids]),),
+    ).fetchall())
+
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany(
+        "INSERT INTO custos_fichas (ficha_id, custo_total, custo_porcao, insumos_sem_custo, atualizado_em) "
+        "VALUES (?, ?, ?, ?, ?) ON CONFLICT(ficha_id) DO UPDATE SET custo_total = excluded.custo_total, "
+        "custo_porcao = excluded.custo_porcao, insumos_sem_custo = excluded.insumos_sem_custo, atualizado_em = excluded.atualizado_em",
+        [
+            (int(r.id), float(r.custo_total), None if pd.isna(r.custo_porcao) else float(r.custo_porcao), int(r.insumos_sem_custo), agora)
+            for r in custos.itertuples()
+        ],
+    )
+
+    custos["custo_anterior"] = custos["id"].map(anteriores)
+    custos["variacao"] = custos["custo_total"] - custos["custo_anterior"]
+    mudaram = custos[custos["custo_anterior"].notna() & (custos["variacao"].abs() > TOLERANCIA)]
+    if not mudaram.empty:
+        conn.executemany(
+            "INSERT INTO variacoes_custos (ficha_id, insumo_origem, custo_anterior, custo_novo, variacao, registrado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(int(r.id), origem, float(r.custo_anterior), float(r.custo_total), float(r.variacao), agora) for r in mudaram.itertuples()],
+        )
+    return mudaram.rename(columns={"id": "ficha_id", "custo_total": "custo_novo"})[colunas].reset_index(drop=True)
+
+
+def propagar_insumos(insumos) -> pd.DataFrame:
+    """Marca como sujas as fichas que usam os insumos alterados e recalcula só elas."""
+    insumos = [i for i in insumos if i]
+    with storage.conectar() as conn:
+        sujas = fichas_dependentes(conn, insumos)
+        return recalcular_fichas(conn, sujas, origem=", ".join(insumos))
+
+
+def atualizar_fichas(ficha_ids) -> pd.DataFrame:
+    """Recalcula fichas novas ou alteradas (ex.: após salvar uma ficha)."""
+    with storage.conectar() as conn:
+        return recalcular_fichas(conn, list(ficha_ids))
+
+
+def recalcular_todas() -> pd.DataFrame:
+    """Recalcula o custo de todas as fichas (reparo ou primeira carga)."""
+    with storage.conectar() as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM fichas_tecnicas").fetchall()]
+        return recalcular_fichas(conn, ids, origem="recalculo completo")
+
+
+def custos_atuais() -> pd.DataFrame:
+    """
+    Custos gravados em custos_fichas no formato de custos.custear_fichas (id,
+    codigo_interno, nome_prato, categoria, custo_total, insumos_sem_custo,
+    custo_porcao), para as páginas de preço e de cardápio. Fichas ainda sem custo
+    gravado (bancos anteriores à tabela) são custeadas aqui, uma única vez.
+    Ciclos entre sub-receitas ficam em resultado.attrs["ciclos"] e as versões das
+    tabelas lidas em resultado.attrs["versao"] (usada por canais.MatrizPrecos).
+    """
+    with storage.conectar() as conn:
+        faltando = [r[0] for r in conn.execute("SELECT id FROM fichas_tecnicas WHERE id NOT IN (SELECT ficha_id FROM custos_fichas)")]
+        if faltando:
+            recalcular_fichas(conn, faltando)
+
+    versao = (storage.DB_PATH, storage.versao_tabela("fichas_tecnicas"), storage.versao_tabela("custos_fichas"))
+    fichas = cache_tabelas.ler("fichas_tecnicas")
+    gravados = cache_tabelas.ler("custos_fichas").set_index("ficha_id")
+    resultado = fichas[["id", "codigo_interno", "nome_prato", "categoria"]].copy()
+    resultado["custo_total"] = resultado["id"].map(gravados["custo_total"]).fillna(0.0).astype(float)
+    resultado["insumos_sem_custo"] = resultado["id"].map(gravados["insumos_sem_custo"]).fillna(0).astype(int)
+    resultado["custo_porcao"] = resultado["id"].map(gravados["custo_porcao"]).astype(float)
+
+    produzidos = cache_tabelas.ler("insumos_produzidos")
+    resultado.attrs["ciclos"] = custos_subreceitas(fichas, cache_tabelas.ler("ficha_ingredientes"), pd.Series(dtype=float),
+                                                   produzidos)[1] if not produzidos.empty else []
+    resultado.attrs["versao"] = versao
+    return resultado
+
+
+def ultimas_variacoes(limite: int = 20) -> pd.DataFrame:
+    """Últimas mudanças de custo registradas pela propagação."""
+    with storage.conectar() as conn:
+        return pd.read_sql_query(
+            """
+            SELECT v.registrado_em, f.codigo_interno, f.nome_prato, v.insumo_origem,
+                   v.custo_anterior, v.custo_novo, v.variacao
+            FROM variacoes_custos v JOIN fichas_tecnicas f ON f.id = v.ficha_id
+            ORDER BY v.id DESC LIMIT ?
+            """,
+            conn, params=(limite,),
+        )
@@ -0,0 +1,71 @@
+# utils/simulacao.py - SIMULADOR DE CENÁRIOS DOS PARÂMETROS FINANCEIROS
+
+# =========================================================
+# FichApp - Grade de cenários × pratos em uma única conta com broadcasting
+# =========================================================
+import numpy as np
+import pandas as pd
+
+from utils.precificacao import LUCRO
+from utils.vendas import CATEGORIAS, categorias_cardapio, margem_contribuicao
+
+LIMITE_CENARIOS = 50_000
+
+
+def faixa(minimo: float, maximo: float, passo: float) -> np.ndarray:
+    """Valores de um parâmetro de minimo a maximo (inclusive) em passos de 'passo'."""
+    if passo <= 0 or maximo <= minimo:
+        return np.array([float(minimo)])
+    return np.round(np.arange(minimo, maximo + passo / 2, passo), 6)
+
+
+def grade_cenarios(percentuais: pd.Series, faixas: dict) -> pd.DataFrame:
+    """Produto cartesiano das faixas; os parâmetros fora das faixas ficam no valor atual."""
+    malha = np.meshgrid(*[np.asarray(v, dtype=float) for v in faixas.values()], indexing="ij")
+    total = malha[0].size if malha else 1
+    if total > LIMITE_CENARIOS:
+        raise ValueError(f"{total} cenários excedem o limite de {LIMITE_CENARIOS}. Aumente os passos ou reduza as faixas.")
+    cenarios = pd.DataFrame(np.tile(percentuais.to_numpy(dtype=float), (total, 1)), columns=list(percentuais.index))
+    for nome, valores in zip(faixas, malha):
+        cenarios[nome] = valores.ravel()
+    return cenarios
+
+
+def simular(cenarios: pd.DataFrame, custo: np.ndarray, preco: np.ndarray, base: pd.Series,
+            quantidade: np.ndarray | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Margem de contribuição de cada prato (preço mantido) em cada cenário, calculada
+    como uma matriz cenários × pratos. Resume a distribuição das margens por cenário
+    e, havendo vendas (quantidade), quantos pratos mudam de categoria em relação aos
+    parâmetros atuais (base). A categoria é a da Engenharia do Cardápio
+    (vendas.categorias_cardapio): pratos sem venda ficam de fora.
+    """
+    variaveis = [c for c in cenarios.columns if c != LUCRO]
+    custo = np.asarray(custo, dtype=float)
+    preco = np.asarray(preco, dtype=float)
+
+    taxa = cenarios[variaveis].to_numpy(dtype=float).sum(axis=1)                # (k,)
+    margem = margem_contribuicao(preco[None, :], custo[None, :], taxa[:, None])  # (k, n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margem_pct = np.where(preco[None, :] > 0, margem / preco[None, :] * 100.0, np.nan)
+
+    resumo = cenarios.copy()
+    resumo["margem_media_pct"] = np.nanmean(margem_pct, axis=1)
+    resumo["margem_p10_pct"], resumo["margem_mediana_pct"], resumo["margem_p90_pct"] = np.nanpercentile(margem_pct, [10, 50, 90], axis=1)
+    resumo["pratos_margem_negativa"] = (margem < 0).sum(axis=1)
+
+    pratos = pd.DataFrame({
+        "margem_min": margem.min(axis=0),
+        "margem_max": margem.max(axis=0),
+    })
+
+    if quantidade is not None and np.nansum(quantidade) > 0:
+        categoria_base = categorias_cardapio(quantidade, margem_contribuicao(preco, custo, base[variaveis].sum()))  # (n,)
+        categorias = categorias_cardapio(quantidade, margem)                     # (k, n)
+        mudou = categorias != categoria_base[None, :]
+        resumo["pratos_mudam_categoria"] = mudou.sum(axis=1)
+        pratos["categoria_atual"] = np.where(categoria_base >= 0, np.asarray(CATEGORIAS)[categoria_base], "Sem vendas")
+        pratos["cenarios_com_mudanca"] = mudou.sum(axis=0)
+        pratos["pct_cenarios_com_mudanca"] = mudou.mean(axis=0) * 100.0
+
+    return resumo, pratos
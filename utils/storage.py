@@ -0,0 +1,1080 @@
+# utils/storage.py - CAMADA DE ARMAZENAMENTO EM SQLITE (WAL)
+
+# =========================================================
+# FichApp - Banco embarcado que substitui os CSVs por tabela
+# =========================================================
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils import calculos, precos
+
+DATA_DIR = "data"
+DB_PATH = os.path.join(DATA_DIR, "fichapp.db")
+
+# Intervalo (s) entre compactações do journal (WAL) em segundo plano
+INTERVALO_COMPACTACAO = 300
+
+# Painel da home: insumo sem compra há mais que isso tem preço desatualizado; base das tendências
+DIAS_PRECO_DESATUALIZADO = 90
+DIAS_TENDENCIA = 30
+
+# =========================================================
+# COLUNAS PÚBLICAS DE CADA TABELA (mesma ordem dos antigos CSVs)
+# =========================================================
+COMPRAS_DTYPE = {
+    "quantidade_compra": float, "qtde_para_custos": float,
+    "valor_total_compra": float, "valor_frete": float, "percentual_perda": float,
+    "valor_unit_bruto": float, "custo_total_com_frete": float, "quantidade_liquida": float,
+    "custo_real_unitario": float, "valor_unit_para_custos": float,
+}
+
+COLUNAS = {
+    "compras_insumos": list(COMPRAS_DTYPE.keys()) + [
+        "data_compra", "grupo", "insumo_resumo", "insumo_completo", "marca", "tipo", "un_med",
+        "fornecedor", "fone_fornecedor", "representante", "documento", "observacao", "atualizado_em",
+    ],
+    "insumos_ativos": ["insumo_resumo", "grupo", "un_med", "custo_unit_ativo", "data_ultima_compra"],
+    "grupos_insumos": ["grupo"],
+    "unidades_medida": ["codigo", "descricao", "qtde_padrao"],
+    "fichas_tecnicas": [
+        "id", "nome_prato", "codigo_interno", "codigo_sistema", "codigo_pdv", "categoria",
+        "rendimento_total", "peso_por_porcao", "responsavel", "atualizado_em",
+    ],
+    "ficha_ingredientes": ["ficha_id", "ordem", "insumo", "quantidade", "unidade", "obs"],
+    "insumos_produzidos": ["insumo_resumo", "ficha_id"],
+    "custos_fichas": ["ficha_id", "custo_total", "custo_porcao", "insumos_sem_custo", "atualizado_em"],
+    "variacoes_custos": ["ficha_id", "insumo_origem", "custo_anterior", "custo_novo", "variacao", "registrado_em"],
+    "importacoes_vendas": ["arquivo_hash", "arquivo", "linhas", "linhas_sem_ficha", "importado_em"],
+    "parametros_financeiros": ["parametro", "valor", "observacao"],
+    "perfis_canais": ["canal", "parametro", "valor"],
+    "mapeamento_nfe": ["cnpj_emitente", "codigo_produto", "insumo_resumo"],
+    "itens_nfe_importados": ["chave", "item", "importado_em"],
+    "linhas_planilha_importadas": ["impressao", "importado_em"],
+    "precos_insumos": [
+        "insumo_resumo", "un_med", "data_ultima_iso", "compras",
+        "preco_ultimo", "preco_medio", "preco_media_compras", "preco_media_dias",
+    ],
+}
+
+# =========================================================
+# VALORES PADRÃO (antes espalhados pelas páginas)
+# =========================================================
+GRUPOS_PADRAO = ["Embalagem","Peixe","Carne","Hortifruti","Bebida","Frios","Molhos e Temperos","Grãos e Cereais","Higiene","Limpeza","Outros"]
+
+UNIDADES_PADRAO = [("KG","Quilograma", 1.0), ("G","Grama", 1000.0), ("L","Litro", 1.0), ("ML","Mililitro", 1000.0), ("UN","Unidade", 1.0), ("DZ","Dúzia", 12.0), ("MIL","Milheiro", 1000.0), ("CT","Cento", 100.0), ("CX","Caixa", 1.0), ("FD","Fardo", 1.0), ("PAC","Pacote", 1.0), ("BAN","Bandeja", 1.0), ("PAR","Par", 2.0), ("POR","Porção", 1.0),]
+
+# Dimensão e tamanho na unidade base (g, ml, un) das unidades conversíveis entre si.
+# Nas de contagem o tamanho vem da qtde_padrao cadastrada; as demais unidades só
+# convertem para elas mesmas.
+DIMENSOES_UNIDADES = {
+    "KG": ("massa", 1000.0), "G": ("massa", 1.0),
+    "L": ("volume", 1000.0), "ML": ("volume", 1.0),
+    "UN": ("contagem", 1.0), "DZ": ("contagem", 12.0), "CT": ("contagem", 100.0), "MIL": ("contagem", 1000.0), "PAR": ("contagem", 2.0),
+}
+UNIDADES_BASE = {"massa": "G", "volume": "ML", "contagem": "UN"}
+
+PARAMETROS_PADRAO = [
+    {"parametro": "Margem de Contribuição", "valor": 50.43, "observacao": "Cálculo: Faturamento - Custo Produção - Taxa Cartão - Simples - Comissão"},
+    {"parametro": "Lucro Desejado", "valor": 20.0, "observacao": "Percentual de lucro desejado sobre o custo final."},
+    {"parametro": "Comissão APP", "valor": 0.0, "observacao": "Percentual de comissão do aplicativo de delivery."},
+    {"parametro": "Simples", "valor": 5.0, "observacao": "Percentual de imposto Simples Nacional."},
+    {"parametro": "Cashback Menudino", "valor": 1.0, "observacao": "Percentual destinado a cashback em campanhas do Menudino."},
+    {"parametro": "Comissão Atendente", "valor": 1.0, "observacao": "Percentual de comissão repassado ao atendente."},
+    {"parametro": "Taxa Cartão", "valor": 5.0, "observacao": "Taxa média cobrada pelas operadoras de cartão."},
+    {"parametro": "Outros (1)", "valor": 1.0, "observacao": "Outros custos eventuais."},
+    {"parametro": "Outros (2)", "valor": 1.0, "observacao": "Outros custos adicionais."}
+]
+
+# Taxas próprias de cada canal de venda (os demais parâmetros vêm de parametros_financeiros)
+PERFIS_CANAIS_PADRAO = [
+    ("Salão", "Taxa Cartão", 5.0), ("Salão", "Comissão APP", 0.0),
+    ("Salão", "Cashback Menudino", 0.0), ("Salão", "Comissão Atendente", 1.0),
+    ("APP", "Taxa Cartão", 3.2), ("APP", "Comissão APP", 27.0),
+    ("APP", "Cashback Menudino", 0.0), ("APP", "Comissão Atendente", 0.0),
+    ("Menudino", "Taxa Cartão", 5.0), ("Menudino", "Comissão APP", 0.0),
+    ("Menudino", "Cashback Menudino", 1.0), ("Menudino", "Comissão Atendente", 0.0),
+]
+
+# =========================================================
+# ESQUEMA
+# =========================================================
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS compras_insumos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    quantidade_compra REAL, qtde_para_custos REAL, valor_total_compra REAL, valor_frete REAL,
+    percentual_perda REAL, valor_unit_bruto REAL, custo_total_com_frete REAL, quantidade_liquida REAL,
+    custo_real_unitario REAL, valor_unit_para_custos REAL,
+    data_compra TEXT, data_compra_iso TEXT, grupo TEXT, insumo_resumo TEXT, insumo_completo TEXT,
+    marca TEXT, tipo TEXT, un_med TEXT, fornecedor TEXT, fone_fornecedor TEXT, representante TEXT,
+    documento TEXT, observacao TEXT, atualizado_em TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_compras_insumo_data ON compras_insumos(insumo_resumo, data_compra_iso);
+CREATE INDEX IF NOT EXISTS idx_compras_data ON compras_insumos(data_compra_iso);
+CREATE INDEX IF NOT EXISTS idx_compras_fornecedor ON compras_insumos(fornecedor, insumo_resumo);
+
+CREATE TABLE IF NOT EXISTS insumos_ativos (
+    insumo_resumo TEXT PRIMARY KEY, grupo TEXT, un_med TEXT, custo_unit_ativo REAL,
+    data_ultima_compra TEXT, data_ultima_compra_iso TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ativos_grupo ON insumos_ativos(grupo);
+
+CREATE TABLE IF NOT EXISTS grupos_insumos (grupo TEXT PRIMARY KEY);
+
+CREATE TABLE IF NOT EXISTS unidades_medida (codigo TEXT PRIMARY KEY, descricao TEXT, qtde_padrao REAL);
+
+CREATE TABLE IF NOT EXISTS fichas_tecnicas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome_prato TEXT, codigo_interno TEXT, codigo_sistema TEXT, codigo_pdv TEXT, categoria TEXT,
+    rendimento_total REAL, peso_por_porcao REAL, responsavel TEXT, atualizado_em TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fichas_codigo ON fichas_tecnicas(codigo_interno);
+CREATE INDEX IF NOT EXISTS idx_fichas_categoria ON fichas_tecnicas(categoria, codigo_interno);
+
+CREATE TABLE IF NOT EXISTS ficha_ingredientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ficha_id INTEGER NOT NULL REFERENCES fichas_tecnicas(id) ON DELETE CASCADE,
+    ordem INTEGER, insumo TEXT NOT NULL, quantidade REAL, unidade TEXT, obs TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ficha_ingredientes_insumo ON ficha_ingredientes(insumo, ficha_id);
+CREATE INDEX IF NOT EXISTS idx_ficha_ingredientes_ficha ON ficha_ingredientes(ficha_id);
+
+CREATE TABLE IF NOT EXISTS insumos_produzidos (
+    insumo_resumo TEXT PRIMARY KEY,
+    ficha_id INTEGER NOT NULL REFERENCES fichas_tecnicas(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_insumos_produzidos_ficha ON insumos_produzidos(ficha_id);
+
+CREATE TABLE IF NOT EXISTS custos_fichas (
+    ficha_id INTEGER PRIMARY KEY REFERENCES fichas_tecnicas(id) ON DELETE CASCADE,
+    custo_total REAL, custo_porcao REAL, insumos_sem_custo INTEGER, atualizado_em TEXT
+);
+
+CREATE TABLE IF NOT EXISTS variacoes_custos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ficha_id INTEGER REFERENCES fichas_tecnicas(id) ON DELETE CASCADE,
+    insumo_origem TEXT, custo_anterior REAL, custo_novo REAL, variacao REAL, registrado_em TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_variacoes_ficha ON variacoes_custos(ficha_id, registrado_em);
+
+CREATE TABLE IF NOT EXISTS importacoes_vendas (
+    arquivo_hash TEXT PRIMARY KEY, arquivo TEXT, linhas INTEGER, linhas_sem_ficha INTEGER, importado_em TEXT
+);
+
+CREATE TABLE IF NOT EXISTS parametros_financeiros (parametro TEXT PRIMARY KEY, valor REAL, observacao TEXT);
+CREATE TABLE IF NOT EXISTS mapeamento_nfe (
+    cnpj_emitente TEXT NOT NULL, codigo_produto TEXT NOT NULL, insumo_resumo TEXT NOT NULL,
+    PRIMARY KEY (cnpj_emitente, codigo_produto)
+);
+CREATE TABLE IF NOT EXISTS itens_nfe_importados (chave TEXT NOT NULL, item INTEGER NOT NULL, importado_em TEXT, PRIMARY KEY (chave, item));
+CREATE TABLE IF NOT EXISTS linhas_planilha_importadas (impressao TEXT PRIMARY KEY, importado_em TEXT);
+CREATE TABLE IF NOT EXISTS perfis_canais (canal TEXT NOT NULL, parametro TEXT NOT NULL, valor REAL, PRIMARY KEY (canal, parametro));
+
+CREATE TABLE IF NOT EXISTS precos_insumos (
+    insumo_resumo TEXT PRIMARY KEY, un_med TEXT, data_ultima_iso TEXT, compras INTEGER,
+    soma_valor REAL, soma_peso REAL, janela TEXT,
+    preco_ultimo REAL, preco_medio REAL, preco_media_compras REAL, preco_media_dias REAL
+);
+
+CREATE TABLE IF NOT EXISTS metadados (chave TEXT PRIMARY KEY, valor TEXT);
+
+CREATE INDEX IF NOT EXISTS idx_ativos_data ON insumos_ativos(data_ultima_compra_iso);
+
+CREATE TABLE IF NOT EXISTS resumo_painel (
+    id INTEGER PRIMARY KEY CHECK (id = 1), fichas INTEGER NOT NULL DEFAULT 0,
+    insumos INTEGER NOT NULL DEFAULT 0, soma_custo REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO resumo_painel (id) VALUES (1);
+CREATE TABLE IF NOT EXISTS resumo_painel_diario (data_iso TEXT PRIMARY KEY, fichas INTEGER, insumos INTEGER, soma_custo REAL);
+
+CREATE TABLE IF NOT EXISTS versoes_tabelas (tabela TEXT PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0);
+"""
+
+# Resumo da home mantido por gatilhos: cada linha gravada em fichas_tecnicas ou
+# insumos_ativos soma/subtrai a sua parte, qualquer que seja o caminho da escrita
+# (páginas, importações, linha de comando). O retrato do dia guarda a base das tendências.
+SCHEMA_RESUMO = """
+CREATE TRIGGER IF NOT EXISTS trg_resumo_fichas_insert AFTER INSERT ON fichas_tecnicas
+BEGIN UPDATE resumo_painel SET fichas = fichas + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_resumo_fichas_delete AFTER DELETE ON fichas_tecnicas
+BEGIN UPDATE resumo_painel SET fichas = fichas - 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_resumo_ativos_insert AFTER INSERT ON insumos_ativos
+BEGIN UPDATE resumo_painel SET insumos = insumos + 1, soma_custo = soma_custo + COALESCE(new.custo_unit_ativo, 0) WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_resumo_ativos_delete AFTER DELETE ON insumos_ativos
+BEGIN UPDATE resumo_painel SET insumos = insumos - 1, soma_custo = soma_custo - COALESCE(old.custo_unit_ativo, 0) WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_resumo_ativos_update AFTER UPDATE OF custo_unit_ativo ON insumos_ativos
+BEGIN UPDATE resumo_painel SET soma_custo = soma_custo - COALESCE(old.custo_unit_ativo, 0) + COALESCE(new.custo_unit_ativo, 0) WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_resumo_diario AFTER UPDATE ON resumo_painel
+BEGIN
+    INSERT INTO resumo_painel_diario (data_iso, fichas, insumos, soma_custo)
+    VALUES (date('now', 'localtime'), new.fichas, new.insumos, new.soma_custo)
+    ON CONFLICT(data_iso) DO UPDATE SET fichas = excluded.fichas, insumos = excluded.insumos, soma_custo = excluded.soma_custo;
+END;
+"""
+
+
+def _schema_versoes(tabelas) -> str:
+    """
+    Contador de versão por tabela, incrementado por gatilhos em toda escrita.
+    Permite que o cache invalide só a tabela alterada, inclusive quando a escrita
+    vem de outro processo (linha de comando, importações).
+    """
+    partes = []
+    for t in tabelas:
+        partes.append(f"INSERT OR IGNORE INTO versoes_tabelas (tabela, versao) VALUES ('{t}', 0);")
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            partes.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_versao_{t}_{op.lower()} AFTER {op} ON {t} "
+                f"BEGIN UPDATE versoes_tabelas SET versao = versao + 1 WHERE tabela = '{t}'; END;"
+            )
+    return "\n".join(partes)
+
+# Arquivos CSV legados -> tabela de destino (importados uma única vez)
+CSV_LEGADOS = {
+    "compras_insumos": "compras_insumos.csv",
+    "insumos_ativos": "insumos_ativos.csv",
+    "grupos_insumos": "grupos_insumos.csv",
+    "unidades_medida": "unidades_medida.csv",
+    "fichas_tecnicas": "fichas_tecnicas.csv",
+    "parametros_financeiros": "parametros_financeiros.csv",
+}
+
+_bancos_prontos = set()
+_lock_init = threading.Lock()
+_compactador = None
+_ultima_compactacao = {}
+
+
+# =========================================================
+# CONEXÃO
+# =========================================================
+def usar_banco(caminho: str):
+    """Aponta a camada de armazenamento para outro arquivo de banco (ex.: benchmarks)."""
+    global DB_PATH
+    DB_PATH = caminho
+
+
+def _abrir(caminho: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    # Cada commit é anexado ao WAL e sincronizado em disco (fsync) antes de retornar
+    conn.execute("PRAGMA synchronous = FULL")
+    return conn
+
+
+@contextmanager
+def conectar():
+    """
+    Abre uma conexão curta com o banco (uma por operação, segura entre threads do Streamlit).
+    Faz commit ao final do bloco ou rollback em caso de erro.
+    """
+    caminho = DB_PATH
+    _garantir_banco(caminho)
+    conn = _abrir(caminho)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _garantir_banco(caminho: str):
+    """Cria o esquema, ativa o WAL, popula os padrões e importa os CSVs legados (uma vez por processo)."""
+    if caminho in _bancos_prontos:
+        return
+    with _lock_init:
+        if caminho in _bancos_prontos:
+            return
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        conn = _abrir(caminho)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            conn.executescript(_schema_versoes(COLUNAS.keys()))
+            conn.executescript(SCHEMA_RESUMO)
+            _migrar_ingredientes_json(conn)
+            if _ler_metadado(conn, "csv_importado") is None:
+                importar_csvs(conn, pasta or DATA_DIR)
+            _popular_padroes(conn)
+            _migrar_unidades_ingredientes(conn)
+            if _ler_metadado(conn, "precos_insumos") is None:
+                reconstruir_precos(conn)
+            if _ler_metadado(conn, "resumo_painel") is None:
+                reconstruir_resumo_painel(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        _bancos_prontos.add(caminho)
+
+
+def _ler_metadado(conn, chave):
+    row = conn.execute("SELECT valor FROM metadados WHERE chave = ?", (chave,)).fetchone()
+    return row[0] if row else None
+
+
+def _gravar_metadado(conn, chave, valor):
+    conn.execute(
+        "INSERT INTO metadados (chave, valor) VALUES (?, ?) "
+        "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor",
+        (chave, str(valor)),
+    )
+
+
+def _popular_padroes(conn):
+    if conn.execute("SELECT COUNT(*) FROM grupos_insumos").fetchone()[0] == 0:
+        conn.executemany("INSERT INTO grupos_insumos (grupo) VALUES (?)", [(g,) for g in GRUPOS_PADRAO])
+    if conn.execute("SELECT COUNT(*) FROM unidades_medida").fetchone()[0] == 0:
+        conn.executemany("INSERT INTO unidades_medida (codigo, descricao, qtde_padrao) VALUES (?, ?, ?)", UNIDADES_PADRAO)
+    if conn.execute("SELECT COUNT(*) FROM parametros_financeiros").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO parametros_financeiros (parametro, valor, observacao) VALUES (:parametro, :valor, :observacao)",
+            PARAMETROS_PADRAO,
+        )
+    if conn.execute("SELECT COUNT(*) FROM perfis_canais").fetchone()[0] == 0:
+        conn.executemany("INSERT INTO perfis_canais (canal, parametro, valor) VALUES (?, ?, ?)", PERFIS_CANAIS_PADRAO)
+
+
+# =========================================================
+# CONVERSÕES
+# =========================================================
+def data_iso(data_br) -> str | None:
+    """Converte 'dd/mm/aaaa' em 'aaaa-mm-dd' (formato ordenável usado nos índices)."""
+    try:
+        return datetime.strptime(str(data_br).strip(), "%d/%m/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def _limpar(valor):
+    """Converte NaN/NaT do pandas em NULL."""
+    if valor is None:
+        return None
+    try:
+        if pd.isna(valor):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return valor
+
+
+def _registro_para_linha(tabela: str, registro: dict) -> dict:
+    linha = {c: _limpar(registro.get(c)) for c in COLUNAS[tabela]}
+    if tabela == "compras_insumos":
+        linha["data_compra_iso"] = data_iso(linha["data_compra"])
+    elif tabela == "insumos_ativos":
+        linha["data_ultima_compra_iso"] = data_iso(linha["data_ultima_compra"])
+    return linha
+
+
+def _sql_insert(tabela: str, colunas: list[str]) -> str:
+    return f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join(':' + c for c in colunas)})"
+
+
+# =========================================================
+# LEITURA
+# =========================================================
+def ler_tabela(tabela: str) -> pd.DataFrame:
+    """Lê uma tabela inteira com as mesmas colunas (e ordem de inserção) dos antigos CSVs."""
+    colunas = COLUNAS[tabela]
+    with conectar() as conn:
+        df = pd.read_sql_query(f"SELECT {', '.join(colunas)} FROM {tabela} ORDER BY rowid", conn)
+    if tabela == "compras_insumos":
+        df = df.astype(COMPRAS_DTYPE)
+    return df
+
+
+# Ordenações aceitas no relatório de insumos ativos (nunca vêm direto da interface para o SQL)
+ORDEM_ATIVOS = {
+    "insumo_resumo": "insumo_resumo COLLATE NOCASE",
+    "grupo": "grupo COLLATE NOCASE",
+    "custo_unit_ativo": "custo_unit_ativo",
+    "data_ultima_compra": "data_ultima_compra_iso",
+}
+
+
+def _filtro_ativos(grupo, fornecedor, insumos) -> tuple[str, list]:
+    condicoes, params = [], []
+    if grupo:
+        condicoes.append("grupo = ?")
+        params.append(grupo)
+    if fornecedor:
+        condicoes.append("insumo_resumo IN (SELECT insumo_resumo FROM compras_insumos WHERE fornecedor = ?)")
+        params.append(fornecedor)
+    if insumos is not None:
+        condicoes.append("insumo_resumo IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(insumos)))
+    return (f"WHERE {' AND '.join(condicoes)}" if condicoes else ""), params
+
+
+def contar_ativos(grupo: str | None = None, fornecedor: str | None = None, insumos: list[str] | None = None) -> int:
+    """Quantos insumos ativos atendem aos filtros do relatório."""
+    where, params = _filtro_ativos(grupo, fornecedor, insumos)
+    with conectar() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM insumos_ativos {where}", params).fetchone()[0]
+
+
+def consultar_ativos(grupo: str | None = None, fornecedor: str | None = None, insumos: list[str] | None = None,
+                     ordenar_por: str = "insumo_resumo", decrescente: bool = False,
+                     limite: int = 50, deslocamento: int = 0) -> pd.DataFrame:
+    """
+    Uma página do relatório de insumos ativos, com filtro e ordenação feitos no
+    banco. 'insumos' restringe a uma lista de nomes (ex.: resultado da busca).
+    """
+    where, params = _filtro_ativos(grupo, fornecedor, insumos)
+    ordem = f"{ORDEM_ATIVOS[ordenar_por]} {'DESC' if decrescente else 'ASC'}, insumo_resumo"
+    with conectar() as conn:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(COLUNAS['insumos_ativos'])} FROM insumos_ativos {where} ORDER BY {ordem} LIMIT ? OFFSET ?",
+            conn, params=[*params, int(limite), int(deslocamento)],
+        )
+
+
+def opcoes_filtros_ativos() -> tuple[list[str], list[str]]:
+    """Grupos e fornecedores distintos para os filtros do relatório (lidos pelos índices)."""
+    with conectar() as conn:
+        grupos = [r[0] for r in conn.execute(
+            "SELECT DISTINCT grupo FROM insumos_ativos WHERE grupo IS NOT NULL AND grupo <> '' ORDER BY grupo")]
+        fornecedores = [r[0] for r in conn.execute(
+            "SELECT DISTINCT fornecedor FROM compras_insumos WHERE fornecedor IS NOT NULL AND fornecedor <> '' ORDER BY fornecedor")]
+    return grupos, fornecedores
+
+
+def versao_tabela(tabela: str) -> int:
+    """Versão atual da tabela (muda a cada escrita)."""
+    with conectar() as conn:
+        row = conn.execute("SELECT versao FROM versoes_tabelas WHERE tabela = ?", (tabela,)).fetchone()
+    return row[0] if row else 0
+
+
+# =========================================================
+# ESCRITA (uma linha por operação)
+# =========================================================
+def inserir_linha(tabela: str, registro: dict):
+    """Insere um único registro (um INSERT indexado, sem reescrever a tabela)."""
+    linha = _registro_para_linha(tabela, registro)
+    with conectar() as conn:
+        conn.execute(_sql_insert(tabela, list(linha.keys())), linha)
+
+
+def inserir_compra(registro: dict):
+    """Registra uma nova compra no histórico (sem tocar na tabela de insumos ativos)."""
+    inserir_linha("compras_insumos", registro)
+
+
+# =========================================================
+# INSUMOS ATIVOS (custo da compra mais recente de cada insumo)
+# =========================================================
+SQL_UPSERT_ATIVO = """
+INSERT INTO insumos_ativos (insumo_resumo, grupo, un_med, custo_unit_ativo, data_ultima_compra, data_ultima_compra_iso)
+VALUES (:insumo_resumo, :grupo, :un_med, :custo_unit_ativo, :data_ultima_compra, :data_ultima_compra_iso)
+ON CONFLICT(insumo_resumo) DO UPDATE SET
+    grupo = excluded.grupo, un_med = excluded.un_med, custo_unit_ativo = excluded.custo_unit_ativo,
+    data_ultima_compra = excluded.data_ultima_compra, data_ultima_compra_iso = excluded.data_ultima_compra_iso
+WHERE insumos_ativos.data_ultima_compra_iso IS NULL
+   OR excluded.data_ultima_compra_iso >= insumos_ativos.data_ultima_compra_iso
+"""
+
+
+def atualizar_insumo_ativo(conn: sqlite3.Connection, compra: dict) -> bool:
+    """
+    Atualiza o histórico de preços do insumo da compra e faz o upsert da linha
+    ativa (dados da compra somente se ela for a mais recente; custo pelo método
+    escolhido). Retorna True se a linha mudou.
+    """
+    return bool(_atualizar_ativos(conn, [compra]))
+
+
+def registrar_compra(compra: dict) -> bool:
+    """
+    Grava a compra e atualiza o insumo ativo correspondente na mesma transação.
+    O custo é constante: um INSERT, um upsert nas somas de preço e um por chave primária.
+    """
+    linha = _registro_para_linha("compras_insumos", compra)
+    with conectar() as conn:
+        conn.execute(_sql_insert("compras_insumos", list(linha.keys())), linha)
+        return atualizar_insumo_ativo(conn, compra)
+
+
+def gravar_compras_lote(conn: sqlite3.Connection, compras: list[dict]) -> list[str]:
+    """
+    Grava um lote de compras na transação recebida e atualiza insumos_ativos uma
+    única vez por insumo (com a compra mais recente do lote). Retorna os insumos
+    cujo custo ativo mudou.
+    """
+    if not compras:
+        return []
+    linhas = [_registro_para_linha("compras_insumos", c) for c in compras]
+    conn.executemany(_sql_insert("compras_insumos", list(linhas[0].keys())), linhas)
+    return _atualizar_ativos(conn, compras)
+
+
+def _atualizar_ativos(conn: sqlite3.Connection, compras: list[dict]) -> list[str]:
+    linhas = [_registro_para_linha("compras_insumos", c) for c in compras]
+    linhas = [l for l in linhas if l["insumo_resumo"] and l["data_compra_iso"]]
+    if not linhas:
+        return []
+    custos = _acumular_precos(conn, linhas)
+    coluna = precos.COLUNA_METODO[metodo_custo(conn)]
+
+    ultimas = {}
+    for linha in linhas:
+        nome = linha["insumo_resumo"]
+        if nome not in ultimas or linha["data_compra_iso"] >= ultimas[nome]["data_compra_iso"]:
+            ultimas[nome] = linha
+    alterados = []
+    for nome, linha in ultimas.items():
+        custo = custos[nome][coluna]
+        custo = (linha["valor_unit_para_custos"] or 0.0) if custo is None else custo
+        mudou = conn.execute(SQL_UPSERT_ATIVO, {
+            "insumo_resumo": nome, "grupo": linha["grupo"], "un_med": linha["un_med"], "custo_unit_ativo": custo,
+            "data_ultima_compra": linha["data_compra"], "data_ultima_compra_iso": linha["data_compra_iso"],
+        }).rowcount > 0
+        if not mudou:
+            # Compra antiga: os dados da linha ativa ficam, mas as médias podem ter mudado
+            mudou = conn.execute(
+                "UPDATE insumos_ativos SET custo_unit_ativo = ? WHERE insumo_resumo = ? AND ABS(COALESCE(custo_unit_ativo, 0) - ?) > 1e-9",
+                (custo, nome, custo),
+            ).rowcount > 0
+        if mudou:
+            alterados.append(nome)
+    return alterados
+
+
+# =========================================================
+# HISTÓRICO DE PREÇOS (somas acumuladas por insumo, utils/precos.py)
+# =========================================================
+def _peso(linha: dict) -> float:
+    return (linha.get("qtde_para_custos") or 0.0) * (1.0 - (linha.get("percentual_perda") or 0.0) / 100.0)
+
+
+def _gravar_precos(conn: sqlite3.Connection, estados: dict) -> dict:
+    custos = {nome: precos.precos(e) for nome, e in estados.items()}
+    conn.executemany(
+        "INSERT OR REPLACE INTO precos_insumos (insumo_resumo, un_med, data_ultima_iso, compras, soma_valor, soma_peso, janela, "
+        "preco_ultimo, preco_medio, preco_media_compras, preco_media_dias) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (nome, e["un_med"], e["data_ultima_iso"], e["compras"], e["soma_valor"], e["soma_peso"], json.dumps(e["janela"]),
+             *(custos[nome][c] for c in ("preco_ultimo", "preco_medio", "preco_media_compras", "preco_media_dias")))
+            for nome, e in estados.items()
+        ],
+    )
+    return custos
+
+
+def _acumular_precos(conn: sqlite3.Connection, linhas: list[dict]) -> dict:
+    """Soma as compras às estatísticas dos seus insumos (uma leitura e uma escrita por lote)."""
+    nomes = sorted({l["insumo_resumo"] for l in linhas})
+    estados = {}
+    for nome, un_med, data, ultimo, compras, soma_valor, soma_peso, janela in conn.execute(
+        "SELECT insumo_resumo, un_med, data_ultima_iso, preco_ultimo, compras, soma_valor, soma_peso, janela FROM precos_insumos "
+        "WHERE insumo_resumo IN (SELECT value FROM json_each(?))", (json.dumps(nomes),),
+    ):
+        estados[nome] = {"un_med": un_med, "data_ultima_iso": data, "preco_ultimo": ultimo, "compras": compras,
+                         "soma_valor": soma_valor, "soma_peso": soma_peso, "janela": json.loads(janela or "[]")}
+    for linha in sorted(linhas, key=lambda l: l["data_compra_iso"]):
+        nome = linha["insumo_resumo"]
+        estados[nome] = precos.acumular(estados.get(nome), linha["data_compra_iso"], linha["un_med"] or "",
+                                        linha["valor_unit_para_custos"] or 0.0, _peso(linha))
+    return _gravar_precos(conn, {n: estados[n] for n in nomes})
+
+
+def reconstruir_precos(conn: sqlite3.Connection) -> int:
+    """Refaz precos_insumos a partir de todo o histórico (migração e reparos)."""
+    df = pd.read_sql_query(
+        "SELECT insumo_resumo, un_med, data_compra_iso, valor_unit_para_custos, qtde_para_custos, percentual_perda "
+        "FROM compras_insumos WHERE insumo_resumo IS NOT NULL AND insumo_resumo <> '' AND data_compra_iso IS NOT NULL "
+        "ORDER BY data_compra_iso, id", conn,
+    )
+    pesos = df["qtde_para_custos"].fillna(0.0) * (1.0 - df["percentual_perda"].fillna(0.0) / 100.0)
+    estados = {}
+    for nome, un_med, data, preco, peso in zip(df["insumo_resumo"], df["un_med"].fillna(""), df["data_compra_iso"],
+                                               df["valor_unit_para_custos"].fillna(0.0), pesos):
+        estados[nome] = precos.acumular(estados.get(nome), data, un_med, float(preco), float(peso))
+    conn.execute("DELETE FROM precos_insumos")
+    _gravar_precos(conn, estados)
+    _gravar_metadado(conn, "precos_insumos", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return len(estados)
+
+
+def metodo_custo(conn: sqlite3.Connection | None = None) -> str:
+    """Método de custo em uso (chave de precos.METODOS_CUSTO)."""
+    if conn is None:
+        with conectar() as conn:
+            return metodo_custo(conn)
+    metodo = _ler_metadado(conn, "metodo_custo")
+    return metodo if metodo in precos.METODOS_CUSTO else precos.METODO_PADRAO
+
+
+def _aplicar_metodo(conn: sqlite3.Connection, metodo: str) -> list[str]:
+    """Copia o custo do método para insumos_ativos; retorna os insumos cujo custo mudou."""
+    coluna = precos.COLUNA_METODO[metodo]
+    custo = f"COALESCE(p.{coluna}, p.preco_ultimo)"
+    alterados = [r[0] for r in conn.execute(
+        f"SELECT a.insumo_resumo FROM insumos_ativos a JOIN precos_insumos p ON p.insumo_resumo = a.insumo_resumo "
+        f"WHERE {custo} IS NOT NULL AND ABS(COALESCE(a.custo_unit_ativo, 0) - {custo}) > 1e-9"
+    )]
+    conn.execute(
+        f"UPDATE insumos_ativos SET custo_unit_ativo = (SELECT {custo} FROM precos_insumos p "
+        f"WHERE p.insumo_resumo = insumos_ativos.insumo_resumo) WHERE insumo_resumo IN (SELECT value FROM json_each(?))",
+        (json.dumps(alterados),),
+    )
+    return alterados
+
+
+def definir_metodo_custo(metodo: str) -> list[str]:
+    """
+    Troca o método de custo de todos os insumos. Os valores de cada método já
+    estão em precos_insumos: a troca é um UPDATE, sem reler o histórico.
+    Retorna os insumos cujo custo ativo mudou (para propagar às fichas).
+    """
+    if metodo not in precos.METODOS_CUSTO:
+        raise ValueError(f"Método de custo desconhecido: {metodo}")
+    with conectar() as conn:
+        _gravar_metadado(conn, "metodo_custo", metodo)
+        return _aplicar_metodo(conn, metodo)
+
+
+def historico_precos(insumo: str) -> pd.DataFrame:
+    """Série de preços do insumo (data, custo unitário p/ custos, quantidade), em ordem de data."""
+    with conectar() as conn:
+        return pd.read_sql_query(
+            "SELECT data_compra_iso AS data, valor_unit_para_custos AS preco, qtde_para_custos AS quantidade, un_med, fornecedor "
+            "FROM compras_insumos WHERE insumo_resumo = ? AND data_compra_iso IS NOT NULL ORDER BY data_compra_iso, id",
+            conn, params=(insumo,), parse_dates=["data"],
+        )
+
+
+SQL_RECONSTRUIR_ATIVOS = """
+INSERT INTO insumos_ativos (insumo_resumo, grupo, un_med, custo_unit_ativo, data_ultima_compra, data_ultima_compra_iso)
+SELECT insumo_resumo, grupo, un_med, COALESCE(valor_unit_para_custos, 0.0), data_compra, data_compra_iso
+FROM (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY insumo_resumo ORDER BY data_compra_iso DESC, id DESC
+    ) AS ordem
+    FROM compras_insumos
+    WHERE insumo_resumo IS NOT NULL AND insumo_resumo <> '' AND data_compra_iso IS NOT NULL
+)
+WHERE ordem = 1
+"""
+
+
+def _reconstruir_a_partir_do_historico(conn: sqlite3.Connection):
+    """Refaz insumos_ativos, precos_insumos (com o método em uso) e o resumo da home a partir das compras."""
+    conn.execute("DELETE FROM insumos_ativos")
+    conn.execute(SQL_RECONSTRUIR_ATIVOS)
+    reconstruir_precos(conn)
+    _aplicar_metodo(conn, metodo_custo(conn))
+    reconstruir_resumo_painel(conn)
+
+
+def reconstruir_insumos_ativos() -> int:
+    """Reconstrói a tabela de insumos ativos a partir de todo o histórico (uso em reparos)."""
+    with conectar() as conn:
+        _reconstruir_a_partir_do_historico(conn)
+        return conn.execute("SELECT COUNT(*) FROM insumos_ativos").fetchone()[0]
+
+
+def recalcular_derivadas() -> dict:
+    """
+    Recalcula as colunas derivadas de todo o histórico de compras com o núcleo de
+    utils.calculos (uma passada vetorizada), regrava só as linhas que mudaram e
+    refaz os insumos ativos na mesma transação. Retorna quantas compras foram
+    lidas e corrigidas e os insumos cujo custo ativo mudou.
+    """
+    derivadas = ["valor_unit_bruto", "custo_total_com_frete", "quantidade_liquida", "custo_real_unitario", "valor_unit_para_custos"]
+    with conectar() as conn:
+        df = pd.read_sql_query(
+            "SELECT id, quantidade_compra, qtde_para_custos, valor_total_compra, valor_frete, percentual_perda, "
+            + ", ".join(derivadas) + " FROM compras_insumos", conn,
+        )
+        entradas = df[["quantidade_compra", "qtde_para_custos", "valor_total_compra", "valor_frete", "percentual_perda"]].fillna(0.0)
+        novas = calculos.colunas_derivadas(*(entradas[c].to_numpy() for c in entradas.columns))
+        atuais = df[derivadas].to_numpy(dtype=float)
+        calculadas = np.column_stack([novas[c] for c in derivadas])
+        mudou = ~np.isclose(atuais, calculadas, rtol=0.0, atol=1e-9).all(axis=1)
+        if mudou.any():
+            conn.executemany(
+                f"UPDATE compras_insumos SET {', '.join(f'{c} = ?' for c in derivadas)} WHERE id = ?",
+                [(*map(float, linha), int(i)) for linha, i in zip(calculadas[mudou], df["id"].to_numpy()[mudou])],
+            )
+
+        antes = dict(conn.execute("SELECT insumo_resumo, custo_unit_ativo FROM insumos_ativos").fetchall())
+        _reconstruir_a_partir_do_historico(conn)
+        depois = dict(conn.execute("SELECT insumo_resumo, custo_unit_ativo FROM insumos_ativos").fetchall())
+    alterados = [nome for nome, custo in depois.items() if nome not in antes or not np.isclose(antes[nome] or 0.0, custo or 0.0)]
+    return {"compras": len(df), "corrigidas": int(mudou.sum()), "insumos_alterados": alterados}
+
+
+# =========================================================
+# RESUMO DA HOME (mantido pelos gatilhos de SCHEMA_RESUMO)
+# =========================================================
+def reconstruir_resumo_painel(conn: sqlite3.Connection):
+    """Recalcula o resumo do zero (migração e reparos; zera o acúmulo de arredondamento)."""
+    conn.execute(
+        "UPDATE resumo_painel SET fichas = (SELECT COUNT(*) FROM fichas_tecnicas), "
+        "insumos = (SELECT COUNT(*) FROM insumos_ativos), "
+        "soma_custo = (SELECT COALESCE(SUM(custo_unit_ativo), 0) FROM insumos_ativos) WHERE id = 1"
+    )
+    _gravar_metadado(conn, "resumo_painel", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def resumo_painel(hoje: date | None = None) -> dict:
+    """
+    Indicadores da home: total de fichas, custo médio dos insumos ativos, as
+    variações de ambos desde o retrato de DIAS_TENDENCIA dias atrás (None sem
+    retrato tão antigo) e quantos insumos estão sem compra há mais de
+    DIAS_PRECO_DESATUALIZADO dias. Leituras por chave e um intervalo de índice,
+    sem percorrer as tabelas.
+    """
+    hoje = hoje or date.today()
+    with conectar() as conn:
+        fichas, insumos, soma = conn.execute("SELECT fichas, insumos, soma_custo FROM resumo_painel WHERE id = 1").fetchone()
+        base = conn.execute(
+            "SELECT fichas, insumos, soma_custo FROM resumo_painel_diario WHERE data_iso <= ? ORDER BY data_iso DESC LIMIT 1",
+            ((hoje - timedelta(days=DIAS_TENDENCIA)).isoformat(),),
+        ).fetchone()
+        desatualizados = conn.execute(
+            "SELECT COUNT(*) FROM insumos_ativos WHERE data_ultima_compra_iso < ?",
+            ((hoje - timedelta(days=DIAS_PRECO_DESATUALIZADO)).isoformat(),),
+        ).fetchone()[0]
+    custo_medio = soma / insumos if insumos else 0.0
+    custo_base = (base[2] / base[1] if base[1] else 0.0) if base else None
+    return {
+        "fichas": fichas,
+        "fichas_variacao": fichas - base[0] if base else None,
+        "insumos": insumos,
+        "custo_medio": custo_medio,
+        "custo_medio_variacao": custo_medio - custo_base if base else None,
+        "custo_medio_variacao_pct": (custo_medio / custo_base - 1.0) * 100.0 if custo_base else None,
+        "precos_desatualizados": desatualizados,
+    }
+
+
+def substituir_tabela(tabela: str, df: pd.DataFrame):
+    """Substitui todo o conteúdo de uma tabela em uma única transação (uso em reconstruções)."""
+    linhas = [_registro_para_linha(tabela, r) for r in df.to_dict("records")]
+    with conectar() as conn:
+        conn.execute(f"DELETE FROM {tabela}")
+        if linhas:
+            conn.executemany(_sql_insert(tabela, list(linhas[0].keys())), linhas)
+
+
+def salvar_parametros(df: pd.DataFrame):
+    """Atualiza os parâmetros financeiros linha a linha (upsert por nome do parâmetro)."""
+    linhas = [_registro_para_linha("parametros_financeiros", r) for r in df.to_dict("records")]
+    with conectar() as conn:
+        conn.executemany(
+            "INSERT INTO parametros_financeiros (parametro, valor, observacao) VALUES (:parametro, :valor, :observacao) "
+            "ON CONFLICT(parametro) DO UPDATE SET valor = excluded.valor, observacao = excluded.observacao",
+            linhas,
+        )
+
+
+def salvar_perfis_canais(df: pd.DataFrame, remover: list[str] | None = None):
+    """Upsert das taxas por canal (canal, parametro, valor); canais em 'remover' são apagados."""
+    linhas = [_registro_para_linha("perfis_canais", r) for r in df.to_dict("records")]
+    with conectar() as conn:
+        if remover:
+            conn.execute("DELETE FROM perfis_canais WHERE canal IN (SELECT value FROM json_each(?))", (json.dumps(remover),))
+        conn.executemany(
+            "INSERT INTO perfis_canais (canal, parametro, valor) VALUES (:canal, :parametro, :valor) "
+            "ON CONFLICT(canal, parametro) DO UPDATE SET valor = excluded.valor",
+            linhas,
+        )
+
+
+# =========================================================
+# FICHAS TÉCNICAS (cabeçalho + ingredientes normalizados)
+# =========================================================
+def ingredientes_do_json(texto) -> list[dict]:
+    """Lê o antigo campo ingredientes_json (lista de dicts); valores inválidos viram lista vazia."""
+    try:
+        itens = json.loads(texto) if isinstance(texto, str) and texto else []
+    except ValueError:
+        return []
+    return [i for i in itens if isinstance(i, dict)] if isinstance(itens, list) else []
+
+
+def _inserir_ficha(conn: sqlite3.Connection, cabecalho: dict, ingredientes: list[dict]) -> int:
+    linha = _registro_para_linha("fichas_tecnicas", cabecalho)
+    linha.pop("id", None)
+    ficha_id = conn.execute(_sql_insert("fichas_tecnicas", list(linha.keys())), linha).lastrowid
+    _inserir_ingredientes(conn, ficha_id, ingredientes)
+    return ficha_id
+
+
+def _inserir_ingredientes(conn: sqlite3.Connection, ficha_id: int, ingredientes: list[dict]):
+    linhas = []
+    for ordem, item in enumerate(ingredientes, start=1):
+        insumo = str(item.get("insumo") or "").strip()
+        if not insumo:
+            continue
+        linhas.append({
+            "ficha_id": ficha_id, "ordem": ordem, "insumo": insumo,
+            "quantidade": _limpar(item.get("quantidade")) or 0.0,
+            "unidade": _limpar(item.get("unidade")), "obs": _limpar(item.get("obs")),
+        })
+    if linhas:
+        conn.executemany(_sql_insert("ficha_ingredientes", COLUNAS["ficha_ingredientes"]), linhas)
+
+
+def salvar_ficha(cabecalho: dict, ingredientes: list[dict]) -> int:
+    """Grava o cabeçalho da ficha e suas linhas de ingredientes na mesma transação. Retorna o id."""
+    with conectar() as conn:
+        return _inserir_ficha(conn, cabecalho, ingredientes)
+
+
+def vincular_insumo_produzido(insumo: str, ficha_id: int):
+    """Liga um insumo "Produzido no restaurante" à ficha técnica que o prepara."""
+    with conectar() as conn:
+        conn.execute(
+            "INSERT INTO insumos_produzidos (insumo_resumo, ficha_id) VALUES (?, ?) "
+            "ON CONFLICT(insumo_resumo) DO UPDATE SET ficha_id = excluded.ficha_id",
+            (insumo.strip(), int(ficha_id)),
+        )
+
+
+def fichas_que_usam(insumo: str) -> pd.DataFrame:
+    """Fichas que usam o insumo (consulta pelo índice insumo -> ficha)."""
+    with conectar() as conn:
+        return pd.read_sql_query(
+            """
+            SELECT f.id, f.codigo_interno, f.nome_prato, f.categoria, i.quantidade, i.unidade
+            FROM ficha_ingredientes i JOIN fichas_tecnicas f ON f.id = i.ficha_id
+            WHERE i.insumo = ?
+            ORDER BY f.codigo_interno
+            """,
+            conn, params=(insumo,),
+        )
+
+
+def _migrar_ingredientes_json(conn: sqlite3.Connection):
+    """Separa a antiga coluna ingredientes_json em linhas de ficha_ingredientes e remove a coluna."""
+    colunas = [r[1] for r in conn.execute("PRAGMA table_info(fichas_tecnicas)")]
+    if "ingredientes_json" not in colunas:
+        return
+    for ficha_id, texto in conn.execute("SELECT id, ingredientes_json FROM fichas_tecnicas").fetchall():
+        _inserir_ingredientes(conn, ficha_id, ingredientes_do_json(texto))
+    conn.execute("ALTER TABLE fichas_tecnicas DROP COLUMN ingredientes_json")
+
+
+def _migrar_unidades_ingredientes(conn: sqlite3.Connection):
+    """
+    Nas fichas antigas a linha herdava a unidade de compra (ex.: DZ), mas a
+    quantidade já estava na unidade de custo do insumo (ex.: UN). Regrava essas
+    linhas com a unidade de custo quando ela tem código cadastrado, para que toda
+    linha possa ser convertida pela unidade informada. Roda uma única vez por banco.
+    """
+    from utils.unidades import ConversorUnidades  # utils.unidades importa este módulo
+
+    if _ler_metadado(conn, "unidades_ingredientes") is not None:
+        return
+    conversor = ConversorUnidades(pd.read_sql_query("SELECT codigo, qtde_padrao FROM unidades_medida", conn))
+    for codigo in conversor.codigos:
+        custo = conversor.unidade_custo(codigo)
+        if custo != codigo and custo in conversor.codigos:
+            conn.execute(
+                "UPDATE ficha_ingredientes SET unidade = ? WHERE unidade = ? "
+                "AND insumo IN (SELECT insumo_resumo FROM insumos_ativos WHERE un_med = ?)",
+                (custo, codigo, codigo),
+            )
+    _gravar_metadado(conn, "unidades_ingredientes", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+# =========================================================
+# JOURNAL (WAL) E COMPACTAÇÃO
+# =========================================================
+# Cada compra é um registro anexado ao WAL (journal somente-anexação) e sincronizado
+# em disco no commit. As leituras do SQLite já combinam o arquivo base com a cauda do
+# WAL; a compactação periódica dobra o WAL no arquivo base e gera uma cópia ordenada
+# do histórico em CSV, sempre por arquivo temporário + os.replace (nunca fica truncado).
+def exportar_csv(df: pd.DataFrame, caminho: str):
+    """Grava um CSV de forma atômica: escreve em arquivo temporário, fsync e renomeia."""
+    pasta = os.path.dirname(caminho) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=".csv", dir=pasta)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, caminho)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def compactar(exportar: bool = True) -> dict:
+    """
+    Dobra o journal (WAL) no arquivo base do banco e, se houver compras novas desde a
+    última compactação, reescreve data/compras_insumos.csv ordenado por data de compra.
+    """
+    caminho = DB_PATH
+    with conectar() as conn:
+        ocupado, paginas_wal, paginas_copiadas = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        estado = conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM compras_insumos").fetchone()
+        exportado = False
+        if exportar and estado != _ultima_compactacao.get(caminho):
+            colunas = COLUNAS["compras_insumos"]
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(colunas)} FROM compras_insumos ORDER BY data_compra_iso, id", conn
+            )
+            exportar_csv(df, os.path.join(os.path.dirname(caminho) or DATA_DIR, CSV_LEGADOS["compras_insumos"]))
+            _ultima_compactacao[caminho] = estado
+            exportado = True
+    return {"ocupado": bool(ocupado), "paginas_wal": paginas_wal, "paginas_copiadas": paginas_copiadas, "csv_exportado": exportado}
+
+
+def iniciar_compactacao(intervalo: float = INTERVALO_COMPACTACAO):
+    """Inicia (uma vez por processo) a thread que compacta o journal periodicamente."""
+    global _compactador
+    if _compactador is not None and _compactador.is_alive():
+        return
+
+    def _laco():
+        while True:
+            time.sleep(intervalo)
+            try:
+                compactar()
+            except Exception:
+                # Banco ocupado ou disco indisponível: tenta de novo no próximo ciclo
+                pass
+
+    _compactador = threading.Thread(target=_laco, name="fichapp-compactador", daemon=True)
+    _compactador.start()
+
+
+# =========================================================
+# IMPORTAÇÃO ÚNICA DOS CSVs LEGADOS
+# =========================================================
+# Chave das tabelas de cadastro (o CSV atualiza a linha existente)
+CHAVES_CSV = {"insumos_ativos": "insumo_resumo", "grupos_insumos": "grupo", "unidades_medida": "codigo",
+              "parametros_financeiros": "parametro"}
+
+# Campos que identificam uma compra do CSV (o arquivo não guarda o id do banco)
+CHAVE_COMPRA = ["data_compra", "insumo_resumo", "un_med", "quantidade_compra", "valor_total_compra",
+                "valor_frete", "percentual_perda", "fornecedor", "documento"]
+
+
+def _chave_compra(linha) -> tuple:
+    return tuple(
+        float(v) if c in COMPRAS_DTYPE and v is not None else ("" if v is None else str(v))
+        for c, v in zip(CHAVE_COMPRA, linha)
+    )
+
+
+def _compras_novas(conn: sqlite3.Connection, linhas: list[dict]) -> list[dict]:
+    """
+    Descarta as linhas do CSV que já estão no histórico (mesma chave). Compras
+    iguais são contadas: se o banco tem duas e o arquivo três, entra uma.
+    """
+    existentes = Counter(_chave_compra(r) for r in conn.execute(f"SELECT {', '.join(CHAVE_COMPRA)} FROM compras_insumos"))
+    novas = []
+    for linha in linhas:
+        chave = _chave_compra(_limpar(linha[c]) for c in CHAVE_COMPRA)
+        if existentes[chave] > 0:
+            existentes[chave] -= 1
+        else:
+            novas.append(linha)
+    return novas
+
+
+def importar_csvs(conn: sqlite3.Connection, data_dir: str = DATA_DIR) -> dict:
+    """
+    Copia o conteúdo dos CSVs antigos (se existirem) para o banco. Reimportar é
+    seguro: compras e fichas que já estão no banco não entram de novo (o CSV de
+    compras é o que compactar() exporta do próprio banco). Os arquivos originais
+    são mantidos como cópia de segurança.
+    """
+    importados = {}
+    for tabela, arquivo in CSV_LEGADOS.items():
+        caminho = os.path.join(data_dir, arquivo)
+        if not os.path.exists(caminho) or os.stat(caminho).st_size == 0:
+            continue
+        try:
+            df = pd.read_csv(caminho, dtype=COMPRAS_DTYPE if tabela == "compras_insumos" else None)
+        except Exception:
+            continue
+        if df.empty:
+            continue
+        if tabela == "fichas_tecnicas":
+            existentes = set(conn.execute("SELECT COALESCE(codigo_interno, ''), COALESCE(nome_prato, '') FROM fichas_tecnicas"))
+            novas = [r for r in df.to_dict("records")
+                     if (str(_limpar(r.get("codigo_interno")) or ""), str(_limpar(r.get("nome_prato")) or "")) not in existentes]
+            for r in novas:
+                _inserir_ficha(conn, r, ingredientes_do_json(r.get("ingredientes_json")))
+            importados[tabela] = len(novas)
+            continue
+        linhas = [_registro_para_linha(tabela, r) for r in df.to_dict("records")]
+        if tabela == "compras_insumos":
+            linhas = _compras_novas(conn, linhas)
+            if not linhas:
+                importados[tabela] = 0
+                continue
+        sql = _sql_insert(tabela, list(linhas[0].keys()))
+        if tabela in CHAVES_CSV:
+            # UPSERT, não OR REPLACE: o REPLACE apaga a linha antiga sem disparar os
+            # gatilhos de DELETE e o resumo da home ficaria somando as duas
+            chave = CHAVES_CSV[tabela]
+            demais = [c for c in linhas[0] if c != chave]
+            sql += f" ON CONFLICT({chave}) " + (
+                "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in demais) if demais else "DO NOTHING")
+        conn.executemany(sql, linhas)
+        importados[tabela] = len(linhas)
+    reconstruir_resumo_painel(conn)
+    _gravar_metadado(conn, "csv_importado", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return importados
+
+
+# =========================================================
+# LINHA DE COMANDO
+# =========================================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ferramentas do banco do FichApp")
+    parser.add_argument("comando", choices=["importar", "compactar", "reconstruir-ativos", "recalcular-derivadas"],
+                        help="importar: recarrega os CSVs legados de data/; compactar: dobra o journal e exporta o CSV ordenado; "
+                             "reconstruir-ativos: refaz a tabela de insumos ativos a partir do histórico; "
+                             "recalcular-derivadas: recalcula as colunas derivadas de todas as compras")
+    parser.add_argument("--banco", default=DB_PATH)
+    parser.add_argument("--forcar", action="store_true", help="importa mesmo que a importação já tenha sido feita")
+    args = parser.parse_args()
+
+    usar_banco(args.banco)
+    if args.comando == "importar":
+        with conectar() as conn:
+            feito_em = _ler_metadado(conn, "csv_importado")
+            if feito_em and not args.forcar:
+                print(f"CSVs já importados em {feito_em}. Use --forcar para importar novamente.")
+            else:
+                print(importar_csvs(conn, os.path.dirname(args.banco) or DATA_DIR))
+                # O CSV de insumos ativos pode ser mais antigo que o histórico: tudo que
+                # deriva das compras é refeito a partir delas
+                _reconstruir_a_partir_do_historico(conn)
+        if not feito_em or args.forcar:
+            from utils import propagacao
+            print(f"{len(propagacao.recalcular_todas())} ficha(s) com custo alterado.")
+    elif args.comando == "compactar":
+        print(compactar())
+    elif args.comando == "reconstruir-ativos":
+        print(f"{reconstruir_insumos_ativos()} insumos ativos.")
+    elif args.comando == "recalcular-derivadas":
+        resultado = recalcular_derivadas()
+        print(f"{resultado['corrigidas']} de {resultado['compras']} compras corrigidas; "
+              f"{len(resultado['insumos_alterados'])} insumos com custo ativo alterado.")
@@ -0,0 +1,122 @@
+# utils/unidades.py - CONVERSÃO DE UNIDADES DE MEDIDA
+
+# =========================================================
+# FichApp - Matriz de conversão pré-calculada a partir de unidades_medida
+# =========================================================
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import storage
+from utils.cache import tabelas as cache_tabelas
+from utils.calculos import qtde_para_custos_auto
+
+UNIDADES = "unidades_medida"
+
+
+class ConversorUnidades:
+    """
+    Conversões entre as unidades cadastradas, agrupadas por dimensão (massa,
+    volume, contagem). A matriz n × n guarda quantas unidades da coluna cabem em
+    uma unidade da linha (NaN entre dimensões diferentes); as consultas em lote
+    são só índices nessa matriz.
+
+    A unidade de custo de um insumo é aquela em que valor_unit_para_custos é
+    expresso. Como qtde_para_custos = quantidade × qtde_padrao (utils.calculos),
+    ela é 1/qtde_padrao da unidade de compra: a própria unidade com qtde_padrao 1,
+    UN para DZ (12), e uma fração sem código próprio nos demais casos (CX com
+    qtde_padrao 12 -> "CX/12", G com 1000 -> "G/1000").
+    """
+
+    def __init__(self, unidades: pd.DataFrame):
+        codigos = unidades["codigo"].astype(str).str.strip().str.upper().to_numpy()
+        qtde_padrao = pd.to_numeric(unidades["qtde_padrao"], errors="coerce").fillna(1.0).to_numpy(dtype=float)
+        qtde_padrao = np.where(qtde_padrao > 0, qtde_padrao, 1.0)
+        dimensoes, tamanhos = [], []
+        for codigo, qtde in zip(codigos, qtde_padrao):
+            dimensao, tamanho = storage.DIMENSOES_UNIDADES.get(codigo, (f"própria:{codigo}", 1.0))
+            if dimensao == "contagem":
+                tamanho = qtde
+            dimensoes.append(dimensao)
+            tamanhos.append(tamanho)
+
+        self.codigos = pd.Index(codigos)
+        self._dimensoes = np.array(dimensoes, dtype=object)
+        tamanhos = np.array(tamanhos, dtype=float)
+        mesma = self._dimensoes[:, None] == self._dimensoes[None, :]
+        self.matriz = np.where(mesma, tamanhos[:, None] / tamanhos[None, :], np.nan)
+        self._fatores_compra = dict(zip(codigos, qtde_padrao))
+
+        # Unidade cadastrada da mesma dimensão com o tamanho de 1/qtde_padrao da unidade de compra
+        custo = {}
+        for i, (codigo, qtde) in enumerate(zip(codigos, qtde_padrao)):
+            iguais = [j for j in np.flatnonzero(mesma[i]) if np.isclose(tamanhos[j], tamanhos[i] / qtde)]
+            if qtde == 1.0:
+                custo[codigo] = codigo
+            elif iguais:
+                custo[codigo] = codigos[iguais[0]]
+            else:
+                custo[codigo] = f"{codigo}/{qtde:g}"
+        self._unidade_custo = custo
+
+    def unidade_custo(self, un_med: str) -> str:
+        un_med = str(un_med or "").strip().upper()
+        return self._unidade_custo.get(un_med, un_med)
+
+    def unidades_linha(self, un_med: str) -> list[str]:
+        """Unidades aceitas numa linha de ficha de um insumo comprado em un_med (a de custo primeiro, se cadastrada)."""
+        opcoes = self.compativeis(un_med)
+        custo = self.unidade_custo(un_med)
+        return [custo] + [c for c in opcoes if c != custo] if custo in opcoes else opcoes
+
+    def compativeis(self, codigo: str) -> list[str]:
+        """Unidades da mesma dimensão (a própria primeiro)."""
+        codigo = str(codigo or "").strip().upper()
+        i = self.codigos.get_indexer([codigo])[0]
+        if i < 0:
+            return [codigo] if codigo else []
+        outras = [c for c in self.codigos[self._dimensoes == self._dimensoes[i]] if c != codigo]
+        return [codigo] + outras
+
+    def fatores(self, de, para) -> np.ndarray:
+        """Fator de cada par (de -> para); NaN se as unidades não forem compatíveis."""
+        de = pd.Series(de, dtype=object).fillna("").astype(str).str.strip().str.upper().to_numpy()
+        para = pd.Series(para, dtype=object).fillna("").astype(str).str.strip().str.upper().to_numpy()
+        i, j = self.codigos.get_indexer(de), self.codigos.get_indexer(para)
+        achadas = (i >= 0) & (j >= 0)
+        fator = np.full(len(de), np.nan)
+        fator[achadas] = self.matriz[i[achadas], j[achadas]]
+        fator[de == para] = 1.0
+        return fator
+
+    def fatores_para_custo(self, unidade_linha, un_med_compra) -> np.ndarray:
+        """
+        Fator que leva a quantidade de cada linha de ficha para a unidade de custo
+        do insumo: converte para a unidade de compra e multiplica pela qtde_padrao
+        dela, como qtde_para_custos faz com a compra. Linhas sem unidade, ou de
+        insumos sem unidade de compra (preparações da casa), ficam com fator 1.
+        """
+        compra = pd.Series(un_med_compra, dtype=object).fillna("").astype(str).str.strip().str.upper().to_numpy()
+        linha = pd.Series(unidade_linha, dtype=object).fillna("").astype(str).str.strip().to_numpy()
+        fator = self.fatores(linha, compra) * qtde_para_custos_auto(compra, np.ones(len(compra)), self._fatores_compra)
+        fator[(linha == "") | (compra == "")] = 1.0
+        return fator
+
+    def qtde_para_custos(self, un_med, quantidade_compra):
+        """Quantidade para custos sugerida para uma compra (escalar ou arrays)."""
+        return qtde_para_custos_auto(un_med, quantidade_compra, self._fatores_compra)
+
+
+_conversor = {"versao": None, "valor": None}
+_lock = threading.Lock()
+
+
+def conversor() -> ConversorUnidades:
+    """Conversor da tabela de unidades atual (remontado só quando a tabela muda)."""
+    versao = (storage.DB_PATH, storage.versao_tabela(UNIDADES))
+    with _lock:
+        if _conversor["versao"] != versao:
+            _conversor["valor"] = ConversorUnidades(cache_tabelas.ler(UNIDADES))
+            _conversor["versao"] = versao
+        return _conversor["valor"]
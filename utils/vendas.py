@@ -0,0 +1,257 @@
+# utils/vendas.py - IMPORTAÇÃO DE VENDAS DO PDV E ENGENHARIA DO CARDÁPIO
+
+# =========================================================
+# FichApp - Importação em blocos + classificação vetorizada
+# =========================================================
+import csv
+import hashlib
+import os
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils import storage
+from utils.custos import custo_unitario_venda
+from utils.historico_vendas import HistoricoVendas
+
+TAMANHO_BLOCO = 50_000
+
+# Nomes aceitos para cada coluna da exportação do PDV (comparados sem acento/maiúsculas)
+ALIASES_COLUNAS = {
+    "codigo": ["codigo", "codigo_pdv", "cod", "cod_produto", "codigo_produto", "produto_codigo", "sku"],
+    "quantidade": ["quantidade", "qtd", "qtde", "quant"],
+    "receita": ["valor_total", "total", "valor", "receita", "vl_total"],
+    "data": ["data", "data_venda", "dt_venda", "data_hora", "emissao"],
+}
+
+CATEGORIAS = ["🌟 Estrela", "🐴 Burro de Carga", "🧩 Desafio", "🐶 Cão"]
+
+
+def _normalizar_nome(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return texto.strip().lower().replace(" ", "_")
+
+
+def _mapear_colunas(colunas) -> dict:
+    """Descobre quais colunas do arquivo correspondem a código, quantidade, receita e data."""
+    normalizadas = {_normalizar_nome(c): c for c in colunas}
+    mapa = {}
+    for destino, aliases in ALIASES_COLUNAS.items():
+        for alias in aliases:
+            if alias in normalizadas:
+                mapa[normalizadas[alias]] = destino
+                break
+    faltando = set(ALIASES_COLUNAS) - set(mapa.values())
+    if faltando:
+        raise ValueError(f"Colunas não encontradas no arquivo de vendas: {', '.join(sorted(faltando))}.")
+    return mapa
+
+
+def _codigo_normalizado(serie: pd.Series) -> pd.Series:
+    return serie.astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+
+
+def mapa_codigos_fichas(fichas: pd.DataFrame) -> dict:
+    """Código do PDV (ou, na falta, código do sistema) -> id da ficha."""
+    mapa = {}
+    for col in ("codigo_sistema", "codigo_pdv"):  # codigo_pdv tem prioridade (sobrescreve)
+        if col in fichas.columns:
+            validos = fichas[fichas[col].notna() & (fichas[col].astype(str).str.strip() != "")]
+            mapa.update(zip(_codigo_normalizado(validos[col]), validos["id"]))
+    return mapa
+
+
+def _datas(serie: pd.Series) -> pd.Series:
+    """Converte as datas do PDV interpretando só os valores distintos (poucos por bloco)."""
+    distintas = pd.Series(serie.dropna().unique())
+    convertidas = pd.to_datetime(distintas.str.slice(0, 10), dayfirst=True, errors="coerce")
+    return serie.map(dict(zip(distintas, convertidas)))
+
+
+def _hash_arquivo(origem) -> str:
+    h = hashlib.sha256()
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloco)
+    else:
+        pos = origem.tell()
+        for bloco in iter(lambda: origem.read(1 << 20), b""):
+            h.update(bloco)
+        origem.seek(pos)
+    return h.hexdigest()
+
+
+def _detectar_separador(origem) -> str:
+    """Olha só o início do arquivo para decidir entre ';', ',' ou tab (leitor C do pandas)."""
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, "rb") as f:
+            amostra = f.read(8192)
+    else:
+        pos = origem.tell()
+        amostra = origem.read(8192)
+        origem.seek(pos)
+    texto = amostra.decode("utf-8", errors="ignore")
+    try:
+        return csv.Sniffer().sniff(texto.splitlines()[0] if texto else "", delimiters=";,\t|").delimiter
+    except csv.Error:
+        return ","
+
+
+# =========================================================
+# HISTÓRICO (colunar, ao lado do banco)
+# =========================================================
+_historicos = {}
+
+
+def historico() -> HistoricoVendas:
+    """Histórico de vendas da base em uso (pasta 'vendas' ao lado do fichapp.db)."""
+    pasta = os.path.join(os.path.dirname(storage.DB_PATH) or ".", "vendas")
+    if pasta not in _historicos:
+        _historicos[pasta] = HistoricoVendas(pasta)
+        _migrar_vendas_diarias(_historicos[pasta])
+    return _historicos[pasta]
+
+
+def _migrar_vendas_diarias(hist: HistoricoVendas):
+    """Bases antigas guardavam o acumulado diário numa tabela SQLite: vira um segmento do histórico."""
+    with storage.conectar() as conn:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vendas_diarias'").fetchone():
+            return
+        antigas = pd.read_sql_query("SELECT ficha_id, data_venda, quantidade, receita FROM vendas_diarias", conn)
+        hist.gravar({
+            "ficha_id": antigas["ficha_id"].to_numpy(),
+            "data": pd.to_datetime(antigas["data_venda"]).to_numpy(dtype="datetime64[D]"),
+            "quantidade": antigas["quantidade"].to_numpy(),
+            "receita": antigas["receita"].to_numpy(),
+        }, segmento="legado")
+        conn.execute("DROP TABLE vendas_diarias")
+
+
+# =========================================================
+# IMPORTAÇÃO EM BLOCOS
+# =========================================================
+def importar_vendas(origem, nome_arquivo: str = "", tamanho_bloco: int = TAMANHO_BLOCO, sep=None) -> dict:
+    """
+    Lê a exportação de vendas do PDV em blocos (memória constante), casa cada linha
+    com uma ficha pelo codigo_pdv/codigo_sistema e grava as linhas no histórico
+    colunar (um segmento por bloco e mês, compactados ao final). Um mesmo arquivo
+    não é importado duas vezes.
+    """
+    assinatura = _hash_arquivo(origem)
+    with storage.conectar() as conn:
+        if conn.execute("SELECT 1 FROM importacoes_vendas WHERE arquivo_hash = ?", (assinatura,)).fetchone():
+            return {"linhas": 0, "linhas_sem_ficha": 0, "ja_importado": True}
+        fichas = pd.read_sql_query("SELECT id, codigo_pdv, codigo_sistema FROM fichas_tecnicas", conn)
+    codigos = mapa_codigos_fichas(fichas)
+    hist = historico()
+    prefixo = "i" + assinatura[:16]
+    hist.descartar_segmentos(prefixo)  # restos de uma importação interrompida deste arquivo
+    meses = set()
+
+    total, sem_ficha, sem_codigo = 0, 0, {}
+    leitor = pd.read_csv(origem, chunksize=tamanho_bloco, sep=sep or _detectar_separador(origem), dtype=str)
+    for n, bloco in enumerate(leitor):
+        bloco = bloco.rename(columns=_mapear_colunas(bloco.columns))
+        ficha_id = _codigo_normalizado(bloco["codigo"]).map(codigos)
+        quantidade = pd.to_numeric(bloco["quantidade"].str.replace(",", ".", regex=False), errors="coerce").fillna(0.0)
+        receita = pd.to_numeric(bloco["receita"].str.replace(",", ".", regex=False), errors="coerce").fillna(0.0)
+        data = _datas(bloco["data"])
+
+        total += len(bloco)
+        sem_match = ficha_id.isna() | data.isna()
+        sem_ficha += int(sem_match.sum())
+        for cod, ocorrencias in _codigo_normalizado(bloco.loc[ficha_id.isna(), "codigo"]).value_counts().items():
+            sem_codigo[cod] = sem_codigo.get(cod, 0) + int(ocorrencias)
+
+        ok = ~sem_match.to_numpy()
+        meses.update(hist.gravar({
+            "ficha_id": ficha_id.to_numpy()[ok],
+            "data": data.to_numpy(dtype="datetime64[D]")[ok],
+            "quantidade": quantidade.to_numpy()[ok],
+            "receita": receita.to_numpy()[ok],
+        }, segmento=f"{prefixo}-{n:05d}"))
+
+    with storage.conectar() as conn:
+        conn.execute(
+            "INSERT INTO importacoes_vendas (arquivo_hash, arquivo, linhas, linhas_sem_ficha, importado_em) VALUES (?, ?, ?, ?, ?)",
+            (assinatura, nome_arquivo or str(origem), total, sem_ficha, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+    hist.compactar(sorted(meses))
+    return {"linhas": total, "linhas_sem_ficha": sem_ficha, "codigos_sem_ficha": sem_codigo, "ja_importado": False}
+
+
+def vendas_periodo(inicio, fim) -> pd.DataFrame:
+    """Quantidade e receita por ficha no período [inicio, fim] (só os meses e colunas necessários)."""
+    dados = historico().ler(inicio, fim, colunas=("ficha_id", "quantidade", "receita"))
+    if dados["ficha_id"].size == 0:
+        return pd.DataFrame(columns=["ficha_id", "quantidade", "receita"])
+    ids, posicao = np.unique(dados["ficha_id"], return_inverse=True)
+    return pd.DataFrame({
+        "ficha_id": ids,
+        "quantidade": np.bincount(posicao, weights=dados["quantidade"]),
+        "receita": np.bincount(posicao, weights=dados["receita"]),
+    })
+
+
+# =========================================================
+# CLASSIFICAÇÃO (Kasavana & Smith)
+# =========================================================
+def codigo_categoria(popular: np.ndarray, lucrativo: np.ndarray) -> np.ndarray:
+    """Índice em CATEGORIAS (0 Estrela, 1 Burro de Carga, 2 Desafio, 3 Cão); aceita arrays de qualquer forma."""
+    return np.where(popular, 0, 2) + np.where(lucrativo, 0, 1)
+
+
+def margem_contribuicao(preco, custo, percentual_variavel=0.0):
+    """Margem de contribuição unitária: preço menos as taxas variáveis sobre o preço (%) menos o custo (arrays com broadcasting)."""
+    return np.asarray(preco, dtype=float) * (1.0 - np.asarray(percentual_variavel, dtype=float) / 100.0) - np.asarray(custo, dtype=float)
+
+
+def categorias_cardapio(quantidade, margem) -> np.ndarray:
+    """
+    Índice em CATEGORIAS de cada item, considerando só os N itens vendidos
+    (quantidade > 0; os demais ficam com -1):
+    - popularidade alta: participação >= 70% da participação média (1/N);
+    - margem alta: margem de contribuição unitária >= média ponderada pelas vendas.
+    'margem' pode ter uma linha por cenário (forma k × itens).
+    """
+    q = np.nan_to_num(np.asarray(quantidade, dtype=float))
+    margem = np.asarray(margem, dtype=float)
+    codigos = np.full(margem.shape, -1)
+    vendido = q > 0
+    if not vendido.any():
+        return codigos
+    q, m = q[vendido], margem[..., vendido]
+    popular = q / q.sum() >= 0.7 / len(q)
+    lucrativo = m >= (m * q).sum(axis=-1, keepdims=True) / q.sum()
+    codigos[..., vendido] = codigo_categoria(popular, lucrativo)
+    return codigos
+
+
+def classificar_cardapio(vendas: pd.DataFrame, custos: pd.DataFrame, percentual_variavel: float = 0.0) -> pd.DataFrame:
+    """
+    Classifica todos os itens vendidos no período de uma vez (categorias_cardapio).
+    Custo unitário = custo por porção da ficha (ou custo total, se não houver
+    rendimento); a margem desconta as taxas variáveis sobre o preço (percentual_variavel),
+    como no simulador de cenários.
+    """
+    colunas = ["ficha_id", "codigo_interno", "nome_prato", "quantidade", "receita", "preco_medio",
+               "custo_unitario", "margem_unitaria", "margem_total", "participacao", "categoria"]
+    vendas = vendas[vendas["quantidade"] > 0]
+    if vendas.empty:
+        return pd.DataFrame(columns=colunas)
+
+    base = vendas.merge(
+        custos[["id", "codigo_interno", "nome_prato", "custo_total", "custo_porcao"]].rename(columns={"id": "ficha_id"}),
+        on="ficha_id", how="left",
+    )
+    qtd = base["quantidade"].to_numpy(dtype=float)
+    base["preco_medio"] = base["receita"].to_numpy(dtype=float) / qtd
+    base["custo_unitario"] = custo_unitario_venda(base)
+    base["margem_unitaria"] = margem_contribuicao(base["preco_medio"], base["custo_unitario"], percentual_variavel)
+    base["margem_total"] = base["margem_unitaria"] * qtd
+    base["participacao"] = qtd / qtd.sum()
+    base["categoria"] = np.asarray(CATEGORIAS)[categorias_cardapio(qtd, base["margem_unitaria"])]
+    return base[colunas].sort_values("margem_total", ascending=False).reset_index(drop=True)